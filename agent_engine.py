@@ -3,9 +3,9 @@ Agent Engine - LangGraph with Structured Reasoning and Memory
 """
 
 import os
-import csv
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from typing import TypedDict, List, Dict, Any
 from datetime import datetime, timedelta
 from langgraph.graph import StateGraph, END
@@ -13,11 +13,26 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 
+import clock
+import config_lock
+import fallback
+import feedback
+import lease
+import retries
+import routing
+import shadow
 import tools
+import tracing
+import txn_store
 
 # Load environment variables
 load_dotenv()
 
+# LLM calls run here so reason can stop waiting at its deadline. Each call also
+# carries the remaining budget as its request timeout, so an abandoned call ends
+# about when reason stops waiting for it and cannot hold a worker past that.
+_llm_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='llm')
+
 # Global variable to store reasoning details for UI
 last_reasoning = {
     'timestamp': None,
@@ -37,38 +52,62 @@ class AgentState(TypedDict):
     reasoning_details: Any
     actions: List[str]
     feedback: Dict[str, Any]
+    deadline: float  # time.monotonic() by which the cycle should finish
 
 
-def create_llm():
-    """Create Groq LLM client - Fast and free tier friendly."""
+def _llm_settings() -> tuple:
+    """(base_url, model, api_key) from env / global_config.llm."""
+    llm_config = tools.get_config().get('global_config', {}).get('llm', {})
+    base_url = os.getenv("LLM_BASE_URL") or llm_config.get('base_url')
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
-        raise ValueError("GROQ_API_KEY not set in .env file. Get one free at https://console.groq.com/keys")
+        if not base_url:
+            raise ValueError("GROQ_API_KEY not set in .env file. Get one free at https://console.groq.com/keys")
+        api_key = "offline"
+    return base_url, llm_config.get('model', "llama-3.1-8b-instant"), api_key
+
+
+def create_llm():
+    """
+    Create Groq LLM client - Fast and free tier friendly.
     
+    LLM_BASE_URL (or global_config.llm.base_url) points the client at another
+    Groq/OpenAI-compatible endpoint, e.g. the offline stand-in in mock_llm.py;
+    no API key is needed then.
+    """
+    base_url, model, api_key = _llm_settings()
     return ChatGroq(
-        model="llama-3.1-8b-instant",
+        model=model,
         groq_api_key=api_key,
+        base_url=base_url,
         temperature=0.4,
-        max_retries=3
+        # reason_node retries within its budget; client retries would outlive the per-call timeout
+        max_retries=0
     )
 
 
+_llm_cache: Dict[tuple, Any] = {}
+
+
+def get_llm():
+    """create_llm(), reused while the endpoint/model/key stay the same (keeps connections warm)."""
+    settings = _llm_settings()
+    llm = _llm_cache.get(settings)
+    if llm is None:
+        _llm_cache.clear()
+        llm = _llm_cache[settings] = create_llm()
+    return llm
+
+
 def observe_node(state: AgentState) -> AgentState:
     """
     Observe Node: Read transactions and compute advanced metrics.
-    Looking for: Success Rate, Latency, Error Codes, Retry Counts
+    Looking for: Success Rate, Latency, Error Codes, Retry Counts, Failure Hotspots
     """
     print("📊 Observe: Reading transactions...")
     
-    transactions = []
-    try:
-        with open('transactions.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            all_txns = list(reader)
-            transactions = all_txns[-30:]  # Last 30 transactions for better sample
-    except Exception as e:
-        print(f"Error reading CSV: {e}")
-        transactions = []
+    # Last 30 transactions for better sample (tail read, not a full scan)
+    transactions = txn_store.get_store().recent(30)
     
     if not transactions:
         state['observations'] = {
@@ -97,11 +136,13 @@ def observe_node(state: AgentState) -> AgentState:
                 'fail': 0,
                 'total_latency': 0,
                 'error_codes': {},
-                'high_latency_count': 0
+                'high_latency_count': 0,
+                'attempts': 0
             }
         
         metrics = bank_metrics[bank]
         metrics['count'] += 1
+        metrics['attempts'] += 1 + int(float(txn.get('retry_count') or 0))
         latency = float(txn.get('latency_ms', 0))
         metrics['total_latency'] += latency
         
@@ -120,15 +161,40 @@ def observe_node(state: AgentState) -> AgentState:
         if metrics['count'] > 0:
             metrics['avg_latency'] = metrics['total_latency'] / metrics['count']
             metrics['success_rate'] = metrics['success'] / metrics['count']
+            metrics['retry_amplification'] = metrics['attempts'] / metrics['count']
+    
+    # Failure hotspots over the last hour (bank/method/error combos)
+    hotspots = txn_store.failure_breakdown(60, group_by=('bank', 'method', 'error_code'))[:5]
+    
+    # Circuit breaker states persisted by the router
+    breakers = {
+        b['name']: b.get('circuit_breaker', {}).get('state', 'closed')
+        for b in tools.get_all_banks()
+    }
+    
+    # Live routing state published by the simulator's router
+    live = routing.read_metrics().get('simulator', {})
+    hedging = live.get('hedging', {})
+    rules = tools.get_config().get('routing_rules', {})
+    strategy = {
+        'strategy': rules.get('strategy', 'weighted'),
+        'p2c': dict(routing.P2C_DEFAULTS, **rules.get('p2c', {})),
+        'ewma_ms': live.get('ewma_ms', {}),
+    }
     
     observations = {
+        'failure_hotspots': hotspots,
+        'hedging': hedging,
+        'routing_strategy': strategy,
+        'circuit_breakers': breakers,
         'total_count': total,
         'success_count': successful,
         'fail_count': total - successful,
         'success_rate': successful / total if total > 0 else 0,
         'avg_latency': avg_latency,
+        'retry_amplification': retries.amplification(transactions),
         'bank_metrics': bank_metrics,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': clock.now().isoformat()
     }
     
     state['observations'] = observations
@@ -144,28 +210,38 @@ def reason_node(state: AgentState) -> AgentState:
     obs = state['observations']
     
     # Load Memory (Recent Actions)
-    history = tools.get_agent_history(5)
+    # Measured effects get their own section below
+    history = [h for h in tools.get_agent_history(10) if h['action'] != 'action_feedback'][-5:]
     formatted_history = []
     for h in history:
         # Simplify history for prompt
         time_diff = "recently"
         try:
             ts = datetime.fromisoformat(h['timestamp'])
-            mins = (datetime.now() - ts).total_seconds() / 60
+            mins = (clock.now() - ts).total_seconds() / 60
             time_diff = f"{mins:.1f} mins ago"
         except:
             pass
         formatted_history.append(f"- [{time_diff}] {h['action']} ({h['details']})")
     
+    measured_effects = feedback.recent_effects(5)
+    
     # Format bank observations
     bank_details = []
     for bank, m in obs['bank_metrics'].items():
         errors = ", ".join([f"{k}:{v}" for k,v in m['error_codes'].items()])
+        breaker = obs.get('circuit_breakers', {}).get(bank, 'closed')
         bank_details.append(
             f"  - {bank}: {m['success_rate']*100:.0f}% SR, {m['avg_latency']:.0f}ms LATENCY. "
-            f"({m['high_latency_count']} slow txns). Errors: {errors or 'None'}"
+            f"({m['high_latency_count']} slow txns). Errors: {errors or 'None'}. Breaker: {breaker}. "
+            f"Retry amplification: x{m.get('retry_amplification', 1.0):.2f}"
         )
     
+    hotspot_lines = [
+        f"  - {h['bank']} / {h['method']} / {h['error_code'] or 'UNKNOWN'}: {h['count']} failures"
+        for h in obs.get('failure_hotspots', [])
+    ]
+    
     system_prompt = f"""You are Payment Sentinel, an autonomous AI reliability engineer.
     
 CONTEXT:
@@ -173,13 +249,21 @@ You manage a payment router connected to banks (HDFC, SBI, ICICI, etc.).
 Your goal: Maximize Success Rate (>95%) and minimize Latency (<300ms).
 
 CURRENT OBSERVATIONS (Last 30 txns):
-- System SR: {obs['success_rate']*100:.1f}% | Avg Latency: {obs['avg_latency']:.0f}ms
+- System SR: {obs['success_rate']*100:.1f}% | Avg Latency: {obs['avg_latency']:.0f}ms | Retry amplification: x{obs.get('retry_amplification', 1.0):.2f} attempts/txn
+- Routing strategy: {obs.get('routing_strategy', {}).get('strategy', 'weighted')} (p2c params: {obs.get('routing_strategy', {}).get('p2c', {})}; live EWMA ms: {obs.get('routing_strategy', {}).get('ewma_ms', {})})
+- Hedging: {obs.get('hedging', {}).get('hedge_rate', 0)*100:.1f}% of payments hedged | p99 {obs.get('hedging', {}).get('p99_ms', 0):.0f}ms (saved {obs.get('hedging', {}).get('p99_saved_ms', 0):.0f}ms)
 - Detailed Bank Status:
 {chr(10).join(bank_details)}
 
+FAILURE HOTSPOTS (Last 60 min, bank / method / error):
+{chr(10).join(hotspot_lines) if hotspot_lines else "  None"}
+
 RECENT AGENT ACTIONS (Memory):
 {chr(10).join(formatted_history) if formatted_history else "No recent actions."}
 
+MEASURED EFFECTS OF PAST ACTIONS (learn from these; rolled-back actions made things worse):
+{chr(10).join(measured_effects) if measured_effects else "None measured yet."}
+
 TASK:
 Analyze the data. Identify specific failure patterns (e.g. "HDFC TIMEOUTS", "SBI GATEWAY_ERROR").
 Decide if intervention is needed.
@@ -193,7 +277,7 @@ OUTPUT FORMAT (JSON ONLY):
     "decision": "NO_ACTION" or "INTERVENE",
     "actions": [
         {{
-            "type": "reroute_traffic" or "set_retry_policy" or "toggle_chaos",
+            "type": "reroute_traffic" or "optimize_weights" or "set_retry_policy" or "set_routing_strategy" or "toggle_chaos",
             "params": {{ ...args... }}
         }}
     ],
@@ -205,19 +289,38 @@ RULES:
 2. If we just intervened <1 min ago for the same issue, be cautious (don't flap).
 3. "reroute_traffic" params: "bank", "target" (valid: hdfc, sbi, icici, axis, bob, idfc, pnb).
 4. "set_retry_policy" params: "bank", "level" (low, normal, high).
+5. "optimize_weights" params (all optional): "min_share" 0-1, "max_share" 0-1, "latency_weight" (SR traded per second of p95).
+   Recomputes every bank's weight at once from recent SR/latency; prefer it over several reroute_traffic steps.
+6. "set_routing_strategy" params: "strategy" ("weighted", "p2c_ewma" or "thompson"), optional "params":
+   p2c_ewma: {{"ewma_alpha": 0-1, "failure_penalty_ms": ms, "inflight_weight": n}}
+   thompson: {{"weights_as": "prior"|"cap"|"none", "latency_penalty_per_s": n, "decay": 0-1, "per_method": true|false}}
+   Prefer p2c_ewma when latency varies between banks faster than you can reroute, and thompson when
+   success rates shift; tune them instead of hand-editing weights.
 """
 
+    config = tools.get_config()
+    deadline = fallback.node_deadline('reason', state.get('deadline'), config, reserve=['act', 'feedback'])
+    
     max_attempts = 3
+    last_error = None
     for attempt in range(max_attempts):
         try:
-            llm = create_llm()
+            llm = get_llm()
             messages = [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content="Analyze status and output JSON.")
             ]
             
-            response = llm.invoke(messages)
+            # Bounded wait: a hung call is abandoned at the deadline, not awaited
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return _use_fallback(state, config, "reason budget exhausted")
+            try:
+                response = _llm_executor.submit(llm.invoke, messages, timeout=remaining).result(timeout=remaining)
+            except FuturesTimeout:
+                return _use_fallback(state, config, f"LLM did not answer within {remaining:.1f}s")
             content = response.content
+            _trace_token_usage(response)
             
             # Clean markdown json if present
             if "```json" in content:
@@ -237,19 +340,52 @@ RULES:
             
         except Exception as e:
             error_str = str(e)
-            if '429' in error_str and attempt < max_attempts - 1:
+            if '429' in error_str:
                 wait_time = (attempt + 1) * 10  # 10s, 20s, 30s
+                if attempt == max_attempts - 1 or time.monotonic() + wait_time >= deadline:
+                    return _use_fallback(state, config, "LLM rate limited past the reason budget")
                 print(f"  ⚠️ Rate limited. Retrying in {wait_time}s... (Attempt {attempt + 1}/{max_attempts})")
+                tracing.add('retries')
+                tracing.add('sleep_ms', wait_time * 1000)
                 time.sleep(wait_time)
                 continue
             print(f"  ✗ Reasoning Error: {e}")
-            state['reasoning'] = f"Error generating reasoning: {e}"
-            state['structured_response'] = {}
-            state['reasoning_details'] = {'error': error_str}
+            last_error = error_str
+    
+    # Every attempt failed (e.g. malformed JSON each time): don't leave the cycle without a decision
+    return _use_fallback(state, config, f"LLM gave no usable answer in {max_attempts} attempts ({last_error})")
+
+
+def _use_fallback(state: AgentState, config: Dict[str, Any], reason: str) -> AgentState:
+    """Replace the LLM decision with the deterministic fallback policy."""
+    if not fallback.rules(config)['fallback']['enabled']:
+        print(f"  ✗ Reasoning skipped: {reason} (fallback disabled)")
+        state['reasoning'] = f"Error generating reasoning: {reason}"
+        state['structured_response'] = {}
+        state['reasoning_details'] = {'error': reason}
+        return state
     
+    print(f"  ⏱️ {reason}; using deterministic fallback policy")
+    tracing.add('fallbacks')
+    structured = fallback.policy(state['observations'], config.get('banks', []), config, reason)
+    state['reasoning'] = f"**FALLBACK ({reason}):** {structured['hypothesis']}\n\n**ANALYSIS:** {structured['analysis']}\n\n**DECISION:** {structured['decision']}"
+    state['structured_response'] = structured
+    state['reasoning_details'] = structured
     return state
 
 
+def _trace_token_usage(response) -> None:
+    """Report prompt/completion tokens of an LLM response to the active trace span."""
+    usage = getattr(response, 'usage_metadata', None) or {}
+    if usage:
+        tracing.add('prompt_tokens', usage.get('input_tokens', 0))
+        tracing.add('completion_tokens', usage.get('output_tokens', 0))
+        return
+    token_usage = (getattr(response, 'response_metadata', None) or {}).get('token_usage', {})
+    tracing.add('prompt_tokens', token_usage.get('prompt_tokens', 0))
+    tracing.add('completion_tokens', token_usage.get('completion_tokens', 0))
+
+
 def act_node(state: AgentState) -> AgentState:
     """
     Act Node: Execute structured actions with Guardrails.
@@ -261,10 +397,13 @@ def act_node(state: AgentState) -> AgentState:
     actions_to_run = response.get('actions', [])
     
     actions_taken = []
+    applied = []
+    before = None
+    changes = []
     
     if decision == "INTERVENE" and actions_to_run:
         # GUARDRAIL: Check if we are flapping
-        history = tools.get_agent_history(1)
+        history = [h for h in tools.get_agent_history(10) if h['action'] != 'action_feedback'][-1:]
         last_time = None
         if history:
             try:
@@ -277,59 +416,213 @@ def act_node(state: AgentState) -> AgentState:
         safe_mode = config.get('global_config', {}).get('safe_mode', False)
         
         # Cooldown: 20 seconds between actions
-        if last_time and (datetime.now() - last_time).total_seconds() < 20:
+        if last_time and (clock.now() - last_time).total_seconds() < 20:
             print("  ⚠️ GUARDRAIL: Action skipped (Cooldown Active)")
             actions_taken.append("SKIPPED: Cooldown active (20s)")
         elif safe_mode:
             print(f"  🛡️ GUARDRAIL: Safe Mode Active. Would have executed: {actions_to_run}")
             actions_taken.append(f"DRY RUN (Safe Mode): {actions_to_run}")
         else:
-            for action in actions_to_run:
-                try:
-                    atype = action.get('type')
-                    params = action.get('params', {})
-                    
-                    res = None
-                    if atype == 'reroute_traffic':
-                        res = tools.reroute_traffic(params.get('bank'), params.get('target'))
-                    elif atype == 'set_retry_policy':
-                        res = tools.set_retry_policy(params.get('bank'), params.get('level'))
-                    elif atype == 'toggle_chaos':
-                        res = tools.toggle_chaos_mode(params.get('enabled'), 0.3)
-                    
-                    if res and res.get('success'):
+            # GUARDRAIL: Shadow evaluation - replay recent traffic under the proposed config
+            shadow_rules = config.get('global_config', {}).get('shadow_eval', {})
+            if shadow_rules.get('enabled', shadow.SHADOW_DEFAULTS['enabled']):
+                actions_to_run, rejected = shadow_filter(actions_to_run, config)
+                actions_taken.extend(rejected)
+            
+            # Baseline for the feedback node: recent traffic before acting
+            feedback_rules = dict(feedback.FEEDBACK_DEFAULTS, **config.get('global_config', {}).get('feedback', {}))
+            if actions_to_run and feedback_rules['enabled']:
+                before = feedback.snapshot(feedback_rules['window_minutes'])
+            
+            # One validated, atomic config commit for the whole plan
+            if actions_to_run:
+                batch = tools.apply_actions(actions_to_run)
+                if batch['success']:
+                    changes = batch['changes']
+                    for action in actions_to_run:
+                        atype, params = action.get('type'), action.get('params', {})
+                        applied.append({'type': atype, 'params': params})
                         actions_taken.append(f"{atype}({params})")
                         print(f"  ✓ Executed: {atype} {params}")
-                    else:
-                        print(f"  ✗ Failed: {atype} - {res}")
-                        
-                except Exception as e:
-                    print(f"  ✗ Execution Exception: {e}")
-                    actions_taken.append(f"Error: {e}")
+                else:
+                    print(f"  ✗ Failed: {batch['error']} - plan not applied")
+                    actions_taken.append(f"FAILED (nothing applied): {batch['error']}")
     
     if not actions_taken:
         actions_taken = ["NONE"]
     
     state['actions'] = actions_taken
     state['feedback'] = {'status': 'done'}
+    if applied and before is not None:
+        state['feedback'] = {
+            'status': 'pending',
+            'applied': applied,
+            'before': before,
+            'changes': changes
+        }
     return state
 
 
+def feedback_node(state: AgentState) -> AgentState:
+    """
+    Feedback Node: Queue measurement of this cycle's actions, then measure
+    earlier actions whose post-action window is complete (auto-rollback if worse).
+    """
+    print("🔁 Feedback: Measuring action impact...")
+    
+    result = dict(state.get('feedback') or {})
+    try:
+        if result.get('status') == 'pending':
+            with config_lock.locked(tools.CONFIG_FILE):
+                config = tools.get_config()
+                feedback.begin(config, result['applied'], result['before'], result['changes'])
+                queued = tools.save_config(config)
+            result = {'status': 'queued' if queued else 'error', 'applied': result['applied']}
+            if not queued:
+                result['error'] = 'could not write config; actions will not be measured'
+                print(f"  ✗ Feedback Error: {result['error']}")
+        
+        # Past the cycle deadline: measuring earlier actions can wait for the next cycle
+        deadline = state.get('deadline')
+        if deadline is not None and time.monotonic() >= deadline:
+            print("  ⏱️ Cycle deadline reached; deferring evaluation of earlier actions")
+            result['deferred'] = True
+        else:
+            evaluated = feedback.evaluate_due()
+            for entry in evaluated:
+                d = entry['details']
+                print(f"  📏 {d['actions']}: {d['effect']} -> {d['verdict']}"
+                      f"{' (ROLLED BACK)' if d['rolled_back'] else ''}"
+                      f"{' (stale, not rolled back)' if d.get('stale') else ''}")
+            result['evaluated'] = [e['details'] for e in evaluated]
+    except Exception as e:
+        print(f"  ✗ Feedback Error: {e}")
+        result['error'] = str(e)
+    
+    result.setdefault('status', 'done')
+    state['feedback'] = result
+    return state
+
+
+def shadow_filter(actions: List[Dict[str, Any]], config: Dict[str, Any]):
+    """
+    Shadow-evaluate the action plan (and each action on its own when there are
+    several) and drop actions predicted to make SR or latency worse.
+    
+    Returns:
+        (actions to run, descriptions of rejected actions)
+    """
+    candidates = {'plan': actions}
+    if len(actions) > 1:
+        candidates.update({f'action_{i}': [a] for i, a in enumerate(actions)})
+    
+    try:
+        evaluation = shadow.evaluate(candidates, config)
+    except Exception as e:
+        print(f"  ⚠️ Shadow evaluation failed: {e}")
+        return actions, []
+    
+    verdicts = evaluation['verdicts']
+    print(f"  🔬 Shadow evaluation ({evaluation['elapsed_ms']:.0f}ms): plan {verdicts['plan']['reason']}")
+    if verdicts['plan']['accepted']:
+        return actions, []
+    
+    # Whole plan predicted worse: keep only the actions that help on their own
+    keep, rejected = [], []
+    for i, action in enumerate(actions):
+        verdict = verdicts.get(f'action_{i}', verdicts['plan'])
+        if len(actions) > 1 and verdict['accepted']:
+            keep.append((i, action))
+        else:
+            print(f"  🛡️ GUARDRAIL: Shadow rejected {action.get('type')} ({verdict['reason']})")
+            rejected.append(f"REJECTED (shadow: {verdict['reason']}): {action.get('type')}({action.get('params', {})})")
+    
+    # Actions that are good alone can still be worse together: only apply a
+    # combination shadow has accepted, else the single best action
+    if 1 < len(keep) < len(actions):
+        subset = [action for _, action in keep]
+        try:
+            subset_verdict = shadow.evaluate({'subset': subset}, config)['verdicts']['subset']
+        except Exception as e:
+            subset_verdict = {'accepted': False, 'reason': f'evaluation failed: {e}'}
+        print(f"  🔬 Shadow evaluation: remaining {len(subset)} actions {subset_verdict['reason']}")
+        if subset_verdict['accepted']:
+            return subset, rejected
+    if len(keep) > 1:
+        best = max(keep, key=lambda kept: _predicted_rank(verdicts[f'action_{kept[0]}']))
+        for i, action in keep:
+            if i != best[0]:
+                print(f"  🛡️ GUARDRAIL: Shadow rejected {action.get('type')} (worse combined with the other actions)")
+                rejected.append(f"REJECTED (shadow: worse in combination): {action.get('type')}({action.get('params', {})})")
+        keep = [best]
+    return [action for _, action in keep], rejected
+
+
+def _predicted_rank(verdict: Dict[str, Any]) -> tuple:
+    """Sort key for accepted shadow verdicts: higher predicted SR, then lower latency."""
+    predicted = verdict.get('predicted')
+    if not predicted:
+        return (0, float('-inf'), float('-inf'))
+    return (1, predicted['success_rate'], -predicted['avg_latency_ms'])
+
+
 def build_graph() -> StateGraph:
     workflow = StateGraph(AgentState)
-    workflow.add_node("observe", observe_node)
-    workflow.add_node("reason", reason_node)
-    workflow.add_node("act", act_node)
+    # Each node records a span (wall/CPU time, rows, tokens, config I/O) in agent_trace.jsonl
+    workflow.add_node("observe", tracing.traced("observe")(observe_node))
+    workflow.add_node("reason", tracing.traced("reason")(reason_node))
+    workflow.add_node("act", tracing.traced("act")(act_node))
+    workflow.add_node("feedback", tracing.traced("feedback")(feedback_node))
     
     workflow.set_entry_point("observe")
     workflow.add_edge("observe", "reason")
     workflow.add_edge("reason", "act")
-    workflow.add_edge("act", END)
+    workflow.add_edge("act", "feedback")
+    workflow.add_edge("feedback", END)
     
     return workflow.compile()
 
 
+_graph = None
+
+
+def get_graph():
+    """The compiled graph, built once per process."""
+    global _graph
+    if _graph is None:
+        _graph = build_graph()
+    return _graph
+
+
 def run_agent_cycle() -> Dict[str, Any]:
+    """
+    Run one agent cycle. If a cycle is already running (this process, another
+    process or another host sharing the coordination db), wait for it and
+    return its result instead of starting a duplicate.
+    """
+    global last_reasoning
+    
+    rules = tools.get_config().get('global_config', {}).get('coordination', {})
+    if not rules.get('enabled', lease.COORDINATION_DEFAULTS['enabled']):
+        return _run_agent_cycle()
+    
+    result = lease.single_flight('agent_cycle', _run_agent_cycle, rules)
+    if result.get('shared'):
+        print("🤝 Agent cycle already in flight elsewhere - using its result")
+        last_reasoning = result
+    elif result.get('success') is False:
+        print(f"✗ Agent cycle not run: {result['error']}")
+        result = {
+            'timestamp': clock.now().isoformat(),
+            'reasoning': f"Error: {result['error']}",
+            'reasoning_details': None,
+            'actions': [],
+            'feedback': {'status': 'error'}
+        }
+    return result
+
+
+def _run_agent_cycle() -> Dict[str, Any]:
     global last_reasoning
     
     print("\n" + "="*60)
@@ -346,12 +639,19 @@ def run_agent_cycle() -> Dict[str, Any]:
         'feedback': {}
     }
     
+    config = tools.get_config()
+    initial_state['deadline'] = fallback.cycle_deadline(config)
+    
+    # Workers start while the LLM reasons, so shadow evaluation fits its budget
+    shadow.warm_up(config.get('global_config', {}).get('shadow_eval', {}).get('workers'))
+    
     try:
-        graph = build_graph()
-        result = graph.invoke(initial_state)
+        graph = get_graph()
+        with tracing.cycle():
+            result = graph.invoke(initial_state)
         
         last_reasoning = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': clock.now().isoformat(),
             'reasoning': result.get('reasoning', ''),
             'reasoning_details': result.get('reasoning_details'),
             'actions': result.get('actions', []),
@@ -374,7 +674,7 @@ def run_agent_cycle() -> Dict[str, Any]:
     except Exception as e:
         print(f"✗ Error in agent cycle: {e}")
         error_result = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': clock.now().isoformat(),
             'reasoning': f'Error: {str(e)}',
             'reasoning_details': None,
             'actions': [],
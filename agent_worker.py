@@ -0,0 +1,322 @@
+"""
+Agent Worker - Long-running agent process with a local IPC trigger API
+
+Runs agent cycles in a dedicated process that keeps the LangGraph graph, the
+LLM client (and its HTTP connection pool) and the shadow-evaluation pool
+warm between cycles, so the dashboard does not import LangChain or block a
+Streamlit thread for the length of a cycle.
+
+Clients talk to it over localhost TCP, one JSON object per line and one
+request per connection. Every request carries the shared key; the worker
+never unpickles anything it receives:
+
+    agent_worker.trigger()         queue a cycle now; returns at once
+    agent_worker.trigger(wait=True) run a cycle and return its result
+    agent_worker.latest()          latest result + whether a cycle is running
+                                   (falls back to agent_state.json when no
+                                   worker is up)
+
+Cycles go through agent_engine.run_agent_cycle, so they are single-flight
+with sentinel_loop.py and any other worker. Triggers that arrive while a
+cycle is running are coalesced into one follow-up cycle.
+
+    python agent_worker.py                 # on demand only
+    python agent_worker.py --interval 60   # also run every 60s (replaces sentinel_loop.py)
+
+Address: global_config.agent_worker (host, port) or AGENT_WORKER_ADDRESS
+("host:port"). Key: AGENT_WORKER_AUTHKEY, else a random key generated into
+agent_worker.key (mode 0600) next to the config and read by both ends. A key
+file readable by other users is refused.
+"""
+
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import stat
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+CONFIG_FILE = "shared_config.json"
+STATE_FILE = "agent_state.json"
+KEY_FILE = "agent_worker.key"
+MAX_MESSAGE_BYTES = 1024 * 1024
+
+# Defaults for global_config.agent_worker
+WORKER_DEFAULTS = {
+    'host': '127.0.0.1',
+    'port': 6390,
+    'interval_seconds': 0,      # 0 = only run when triggered
+    'request_timeout_seconds': 2,
+}
+
+
+def _rules() -> Dict[str, Any]:
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            custom = json.load(f).get('global_config', {}).get('agent_worker', {})
+    except Exception:
+        custom = {}
+    return dict(WORKER_DEFAULTS, **custom)
+
+
+def _address() -> Tuple[str, int]:
+    env = os.getenv("AGENT_WORKER_ADDRESS")
+    if env:
+        host, _, port = env.rpartition(':')
+        return host or '127.0.0.1', int(port)
+    rules = _rules()
+    return rules['host'], int(rules['port'])
+
+
+def _authkey() -> str:
+    """
+    Shared key from AGENT_WORKER_AUTHKEY or the key file (created on first use).
+
+    Raises:
+        PermissionError: if the key file is readable by group/others
+    """
+    env = os.getenv("AGENT_WORKER_AUTHKEY")
+    if env:
+        return env
+    path = os.path.join(os.path.dirname(os.path.abspath(CONFIG_FILE)), KEY_FILE)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    if os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f"{path} must not be accessible by other users (chmod 600)")
+    with open(path, 'r') as f:
+        key = f.read().strip()
+    if not key:
+        raise PermissionError(f"{path} is empty")
+    return key
+
+
+def _send(conn: socket.socket, message: Dict[str, Any]) -> None:
+    conn.sendall(json.dumps(message, default=str).encode() + b'\n')
+
+
+def _recv(reader) -> Optional[Dict[str, Any]]:
+    """One JSON object from a socket file; None on EOF, oversize or non-object input."""
+    line = reader.readline(MAX_MESSAGE_BYTES + 1)
+    if not line or len(line) > MAX_MESSAGE_BYTES:
+        return None
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) else None
+
+
+class AgentWorker:
+    """Runs agent cycles on request (and optionally on an interval) and serves results."""
+
+    def __init__(self, address: Tuple[str, int] = None, interval_seconds: float = 0):
+        self.address = address or _address()
+        self.interval_seconds = interval_seconds
+        self.running = False
+        self.started_at = time.time()
+        self.cond = threading.Condition()
+        self.requested = False
+        self.busy = False
+        self.seq = 0
+        self.latest: Dict[str, Any] = {}
+        self.finished_at: Optional[float] = None
+        self.listener = None
+        self.authkey = None
+        self.engine = None
+
+    def warm_up(self) -> None:
+        """Import the agent stack and build the graph/LLM client once."""
+        start = time.monotonic()
+        import agent_engine
+        import shadow
+        import tools
+        self.engine = agent_engine
+        agent_engine.get_graph()
+        try:
+            agent_engine.get_llm()
+        except Exception as e:
+            print(f"  ⚠️ LLM client not ready: {e}")
+        shadow.warm_up(tools.get_config().get('global_config', {}).get('shadow_eval', {}).get('workers'))
+        self.latest = agent_engine.read_agent_state()
+        print(f"✓ Agent stack warm in {time.monotonic() - start:.1f}s")
+
+    def start(self) -> None:
+        """Warm up, then serve requests and run cycles until stop()."""
+        self.authkey = _authkey()
+        self.warm_up()
+        self.running = True
+        threading.Thread(target=self._cycle_loop, daemon=True).start()
+        self.listener = socket.create_server(self.address)
+        print(f"✓ Agent worker listening on {self.address[0]}:{self.address[1]}"
+              f"{f' (cycle every {self.interval_seconds:.0f}s)' if self.interval_seconds else ''}")
+        while self.running:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def stop(self) -> None:
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.listener:
+            self.listener.close()
+        print("✓ Agent worker stopped")
+
+    def request_cycle(self) -> int:
+        """Queue a cycle; returns the seq whose completion satisfies this request."""
+        with self.cond:
+            self.requested = True
+            self.cond.notify_all()
+            # A cycle already running started before this request: wait for the next one
+            return self.seq + (2 if self.busy else 1)
+
+    def _cycle_loop(self):
+        next_due = time.monotonic() + self.interval_seconds if self.interval_seconds else None
+        while self.running:
+            with self.cond:
+                while self.running and not self.requested and (next_due is None or time.monotonic() < next_due):
+                    self.cond.wait(timeout=None if next_due is None else max(0.0, next_due - time.monotonic()))
+                if not self.running:
+                    return
+                self.requested = False
+                self.busy = True
+            try:
+                result = self.engine.run_agent_cycle()
+            except Exception as e:
+                result = {'timestamp': None, 'reasoning': f'Error: {e}', 'reasoning_details': None,
+                          'actions': [], 'feedback': {'status': 'error'}}
+            with self.cond:
+                self.latest = result
+                self.seq += 1
+                self.finished_at = time.time()
+                self.busy = False
+                self.cond.notify_all()
+            if self.interval_seconds:
+                next_due = time.monotonic() + self.interval_seconds
+
+    def _serve(self, conn: socket.socket):
+        try:
+            with conn, conn.makefile('rb') as reader:
+                conn.settimeout(10)
+                request = _recv(reader)
+                if request is None:
+                    return
+                if not hmac.compare_digest(str(request.get('key', '')).encode(), self.authkey.encode()):
+                    _send(conn, {'success': False, 'error': 'Invalid agent worker key'})
+                    return
+                _send(conn, self._handle(request))
+        except Exception as e:
+            print(f"  ⚠️ IPC error: {e}")
+
+    def _status(self) -> Dict[str, Any]:
+        return {'success': True, 'result': self.latest, 'running': self.busy or self.requested,
+                'seq': self.seq, 'finished_at': self.finished_at}
+
+    def _handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        cmd = request.get('cmd')
+        if cmd == 'ping':
+            return {'success': True, 'pid': os.getpid(), 'uptime_s': round(time.time() - self.started_at, 1),
+                    'cycles': self.seq}
+        if cmd == 'latest':
+            with self.cond:
+                return self._status()
+        if cmd == 'run':
+            target = self.request_cycle()
+            if not request.get('wait'):
+                return {'success': True, 'queued': True, 'seq': target}
+            deadline = time.monotonic() + float(request.get('timeout', 120))
+            with self.cond:
+                while self.running and self.seq < target and time.monotonic() < deadline:
+                    self.cond.wait(timeout=max(0.0, deadline - time.monotonic()))
+                if self.seq < target:
+                    return {'success': False, 'error': 'Timed out waiting for the agent cycle'}
+                return self._status()
+        return {'success': False, 'error': f'Unknown command: {cmd}'}
+
+
+# ==================== CLIENT ====================
+
+def _request(message: Dict[str, Any], timeout: float = None) -> Optional[Dict[str, Any]]:
+    """Send one request to the worker; None if no worker is reachable."""
+    timeout = timeout if timeout is not None else _rules()['request_timeout_seconds']
+    try:
+        key = _authkey()
+    except Exception as e:
+        print(f"  ⚠️ Agent worker key unavailable: {e}")
+        return None
+    try:
+        conn = socket.create_connection(_address(), timeout=timeout)
+    except OSError:
+        return None
+    try:
+        with conn, conn.makefile('rb') as reader:
+            _send(conn, dict(message, key=key))
+            reply = _recv(reader)
+        if reply is None:
+            return {'success': False, 'error': 'No valid reply from agent worker'}
+        return reply
+    except socket.timeout:
+        return {'success': False, 'error': f'No reply from agent worker within {timeout}s'}
+    except Exception as e:
+        return {'success': False, 'error': f'Agent worker error: {e}'}
+
+
+def ping() -> Optional[Dict[str, Any]]:
+    """Worker status, or None if no worker is running."""
+    return _request({'cmd': 'ping'})
+
+
+def trigger(wait: bool = False, timeout: float = 120) -> Optional[Dict[str, Any]]:
+    """
+    Ask the worker to run a cycle.
+
+    Returns:
+        None if no worker is running; {'queued': True, ...} when not waiting;
+        the latest status (with 'result') once the cycle finished when waiting
+    """
+    message = {'cmd': 'run', 'wait': wait, 'timeout': timeout}
+    return _request(message, timeout + 5 if wait else None)
+
+
+def latest() -> Dict[str, Any]:
+    """
+    Latest agent result: from the worker when one is up, else agent_state.json.
+
+    Returns:
+        {'result': {...}, 'running': bool, 'worker': bool}
+    """
+    status = _request({'cmd': 'latest'})
+    if status and status.get('success'):
+        return {'result': status.get('result') or {}, 'running': status.get('running', False), 'worker': True}
+    try:
+        with open(STATE_FILE, 'r') as f:
+            return {'result': json.load(f), 'running': False, 'worker': False}
+    except Exception:
+        return {'result': {}, 'running': False, 'worker': False}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent agent worker")
+    parser.add_argument('--interval', type=float, help='Also run a cycle every N seconds')
+    args = parser.parse_args()
+
+    interval = args.interval if args.interval is not None else _rules()['interval_seconds']
+    worker = AgentWorker(interval_seconds=interval)
+    try:
+        worker.start()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,18 @@ Dark, professional, technical dashboard with AI reasoning display
 """
 
 import streamlit as st
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import time
 from datetime import datetime, timedelta
-import pandas as pd
 import os
 import json
 
-import simulator
-import agent_engine
+import agent_worker
+import config_lock
 import tools
+import rollups
+import routing
+import txn_store
+from downsample import downsample_series, point_budget
 
 
 # Page configuration
@@ -146,21 +147,69 @@ if 'simulator_running' not in st.session_state:
     st.session_state.intervention_count = 0
     st.session_state.last_run_timestamp = 0
 
+@st.cache_resource(show_spinner=False)
+def start_rollup_job():
+    """Start the per-minute rollup job once per server process (keeps historical views fresh)."""
+    rollups.rollup_job.start()
+    return rollups.rollup_job
+
 
 def load_transactions_from_csv(count=50):
-    """Load recent transactions from CSV."""
+    """Load recent transactions from the transaction store."""
+    return txn_store.get_store().recent(count)
+
+
+def has_transactions():
+    """Whether the transaction store holds any data yet."""
+    return bool(txn_store.get_store().recent(1))
+
+
+# Latency chart time ranges (label -> minutes) and rendering budget
+LATENCY_RANGES = {
+    '5 min': 5,
+    '1 hour': 60,
+    '6 hours': 360,
+    '24 hours': 1440,
+}
+CHART_WIDTH_PX = 1200  # Approximate plot width; LTTB keeps ~1 point per pixel per trace
+# Seconds a loaded series is reused, by range: the 5 min view follows every rerun,
+# the long views move too little in a few seconds to rescan all their rows
+LATENCY_REFRESH_SECONDS = {5: 2, 60: 10, 360: 30, 1440: 60}
+
+
+def load_latency_series(range_minutes, max_points_per_bank):
+    """Load per-bank latency series for a time range, downsampled with LTTB (cached per range)."""
+    refresh = LATENCY_REFRESH_SECONDS.get(range_minutes, 2)
+    return _latency_series(range_minutes, max_points_per_bank, int(time.time() // refresh))
+
+
+@st.cache_data(ttl=120, max_entries=16, show_spinner=False)
+def _latency_series(range_minutes, max_points_per_bank, refresh_slot):
+    """Query and downsample one range; `refresh_slot` only keys the cache."""
     try:
-        if os.path.exists('transactions.csv'):
-            # Use on_bad_lines='skip' to handle corrupted rows
-            df = pd.read_csv('transactions.csv', on_bad_lines='skip')
-            if df.empty:
-                return []
-            return df.tail(count).to_dict('records')
-        return []
+        rows = txn_store.query_transactions(since_minutes=range_minutes)
+        if not rows:
+            return {}
+        import pandas as pd  # deferred: ~0.4s to import, only needed once there is data to chart
+        df = pd.DataFrame(rows, columns=['timestamp', 'bank', 'latency_ms'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+        df['latency_ms'] = pd.to_numeric(df['latency_ms'], errors='coerce')
+        df = df.dropna(subset=['timestamp', 'latency_ms'])
+
+        cutoff = datetime.now() - timedelta(minutes=range_minutes)
+        df = df[df['timestamp'] >= cutoff].sort_values('timestamp')
+
+        series = {}
+        for bank, group in df.groupby('bank'):
+            points = list(zip(group['timestamp'].dt.to_pydatetime(), group['latency_ms'].tolist()))
+            series[bank] = [
+                {'timestamp': ts, 'latency': lat}
+                for ts, lat in downsample_series(points, max_points_per_bank)
+            ]
+        return series
     except Exception as e:
-        # In streamlit, it's useful to see this in console
-        print(f"Error reading transactions CSV: {e}")
-        return []
+        print(f"Error loading latency series: {e}")
+        return {}
 
 
 def calculate_metrics():
@@ -171,53 +220,46 @@ def calculate_metrics():
         return {
             'success_rate': 0,
             'avg_latency': 0,
-            'interventions': 0,
-            'bank_latencies': {}
+            'interventions': 0
         }
     
     total = len(transactions)
     successful = sum(1 for t in transactions if t.get('status') == 'Success')
     
-    # Per-bank latencies over time
-    bank_latencies = {}
-    for t in transactions:
-        bank = t.get('bank', 'Unknown')
-        if bank not in bank_latencies:
-            bank_latencies[bank] = []
-        
-        try:
-            ts = pd.to_datetime(t['timestamp'])
-            bank_latencies[bank].append({
-                'timestamp': ts,
-                'latency': float(t.get('latency_ms', 0))
-            })
-        except (ValueError, TypeError):
-            continue
-    
     return {
         'success_rate': (successful / total * 100) if total > 0 else 0,
         'avg_latency': sum(float(t.get('latency_ms', 0)) for t in transactions) / total if total > 0 else 0,
-        'interventions': st.session_state.intervention_count,
-        'bank_latencies': bank_latencies
+        'interventions': st.session_state.intervention_count
     }
 
 
 def start_simulator():
     """Start the transaction simulator."""
     if not st.session_state.simulator_running:
+        import simulator
         simulator.simulator.start()
         st.session_state.simulator_running = True
 
 
 def stop_simulator():
     """Stop the transaction simulator."""
+    import simulator
     simulator.simulator.stop()
     st.session_state.simulator_running = False
 
 
 def run_agent_cycle():
-    """Run one agent cycle and capture reasoning."""
+    """
+    Run one agent cycle and capture reasoning.
+    
+    With an agent worker running (agent_worker.py) the cycle is only queued
+    there and the result shows up on a later refresh; otherwise it runs here.
+    """
+    if agent_worker.trigger():
+        return None
+    
     try:
+        import agent_engine  # LangGraph/LangChain only load when there is no worker
         result = agent_engine.run_agent_cycle()
         
         # Count interventions
@@ -291,7 +333,7 @@ with st.sidebar:
             st.caption(f"Next run in {int(20 - time_since)}s...")
     
     if should_run:
-        if st.session_state.simulator_running or os.path.exists('transactions.csv'):
+        if st.session_state.simulator_running or has_transactions():
             with st.spinner("🤖 Sentinel Analyzing..."):
                 run_agent_cycle()
                 st.session_state.last_run_timestamp = time.time()
@@ -313,8 +355,11 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("**Latest Analysis:**")
     
-    # Try to load from disk (background process)
-    disk_state = agent_engine.read_agent_state()
+    # Latest result from the agent worker (or agent_state.json from a background process)
+    worker_state = agent_worker.latest()
+    if worker_state['running']:
+        st.caption("⏳ Agent worker is analysing...")
+    disk_state = worker_state['result']
     if disk_state:
         # Check if disk state is newer than session state
         last_session_time = st.session_state.last_agent_run
@@ -326,6 +371,8 @@ with st.sidebar:
             
         if not last_session_time or (disk_time and disk_time > last_session_time):
             # Update session with disk state
+            if worker_state['worker'] and disk_state.get('actions', []) and disk_state['actions'][0] != 'NONE':
+                st.session_state.intervention_count += len(disk_state['actions'])
             st.session_state.agent_log.append(disk_state)
             st.session_state.agent_log = st.session_state.agent_log[-10:]
             st.session_state.last_agent_run = disk_time
@@ -433,9 +480,18 @@ st.markdown("<br>", unsafe_allow_html=True)
 # Middle - Real-time Latency Chart
 st.markdown("### 📊 REAL-TIME BANK LATENCY ANALYSIS")
 
-bank_latencies = metrics.get('bank_latencies', {})
+latency_range = st.radio(
+    "Time range",
+    list(LATENCY_RANGES.keys()),
+    horizontal=True,
+    label_visibility="collapsed",
+    key="latency_range"
+)
+max_points = point_budget(CHART_WIDTH_PX)
+bank_latencies = load_latency_series(LATENCY_RANGES[latency_range], max_points)
 
 if bank_latencies:
+    import plotly.graph_objects as go  # deferred: ~25ms to import and ~100ms to build the first figure
     fig = go.Figure()
     
     colors = {
@@ -453,10 +509,11 @@ if bank_latencies:
             timestamps = [d['timestamp'] for d in data]
             latencies = [d['latency'] for d in data]
             
-            fig.add_trace(go.Scatter(
+            # WebGL trace; markers only while the series is sparse
+            fig.add_trace(go.Scattergl(
                 x=timestamps,
                 y=latencies,
-                mode='lines+markers',
+                mode='lines+markers' if len(data) <= 100 else 'lines',
                 name=bank,
                 line=dict(
                     color=colors.get(bank, '#64ffda'),
@@ -500,16 +557,142 @@ if bank_latencies:
     )
     
     st.plotly_chart(fig, use_container_width=True)
+    
+    # Hedged requests (published live by the simulator's router)
+    hedging = routing.read_metrics().get('simulator', {}).get('hedging')
+    if hedging and hedging.get('requests'):
+        st.caption(
+            f"🪁 Hedging: {hedging['hedge_rate']*100:.1f}% of payments hedged, "
+            f"{hedging['hedge_wins']} won by the hedge, {hedging['duplicates_voided']} duplicates voided | "
+            f"p95 {hedging['p95_ms']:.0f}ms (saved {hedging['p95_saved_ms']:.0f}ms) · "
+            f"p99 {hedging['p99_ms']:.0f}ms (saved {hedging['p99_saved_ms']:.0f}ms)"
+        )
 else:
     st.info("💫 Awaiting transaction data... Start the simulator to begin monitoring.")
 
 st.markdown("<br>", unsafe_allow_html=True)
 
+# Historical Views - served from the per-minute rollup store only
+st.markdown("### 🗂️ HISTORICAL VIEWS")
+
+HISTORY_RANGES = {
+    '6 hours': (360, 10),
+    '24 hours': (1440, 30),
+    '7 days': (10080, 180),
+}
+history_range = st.radio(
+    "History range",
+    list(HISTORY_RANGES.keys()),
+    horizontal=True,
+    label_visibility="collapsed",
+    key="history_range"
+)
+since_minutes, bucket_minutes = HISTORY_RANGES[history_range]
+
+chart_layout = dict(
+    height=350,
+    paper_bgcolor='rgba(30, 33, 57, 0.6)',
+    plot_bgcolor='rgba(10, 14, 39, 0.8)',
+    font=dict(color='#ccd6f6', family='Consolas, Monaco, monospace'),
+    margin=dict(l=0, r=0, t=30, b=0)
+)
+
+col_heat, col_err = st.columns(2)
+
+with col_heat:
+    heatmap = rollups.bank_time_heatmap(since_minutes, bucket_minutes)
+    if heatmap['banks']:
+        import plotly.graph_objects as go
+        fig_heat = go.Figure(go.Heatmap(
+            x=heatmap['buckets'],
+            y=heatmap['banks'],
+            z=[[None if v is None else v * 100 for v in heatmap['success_rate'][b]] for b in heatmap['banks']],
+            colorscale='RdYlGn',
+            zmin=50,
+            zmax=100,
+            colorbar=dict(title='SR %'),
+            hovertemplate='<b>%{y}</b><br>%{x}<br>SR: %{z:.1f}%<extra></extra>'
+        ))
+        fig_heat.update_layout(title="Bank × Time Success Rate", **chart_layout)
+        st.plotly_chart(fig_heat, use_container_width=True)
+    else:
+        st.info("No rollups yet for this range.")
+
+with col_err:
+    trends = rollups.error_code_trends(since_minutes, bucket_minutes)
+    if trends['series']:
+        import plotly.graph_objects as go
+        fig_err = go.Figure()
+        for code, counts in sorted(trends['series'].items()):
+            fig_err.add_trace(go.Bar(x=trends['buckets'], y=counts, name=code))
+        fig_err.update_layout(title="Error Code Trends", barmode='stack', **chart_layout)
+        st.plotly_chart(fig_err, use_container_width=True)
+    else:
+        st.info("No failures recorded in this range.")
+
+# Incident query - same helper the agent uses for failure hotspots
+with st.expander("🔎 INCIDENT QUERY"):
+    q1, q2, q3 = st.columns(3)
+    with q1:
+        q_minutes = st.number_input("Last N minutes", min_value=1, max_value=10080, value=60, key="q_minutes")
+    with q2:
+        q_error = st.selectbox(
+            "Error code",
+            ["Any", "TIMEOUT", "GATEWAY_ERROR", "AUTH_FAILURE", "INSUFFICIENT_FUNDS"],
+            key="q_error"
+        )
+    with q3:
+        q_amount = st.number_input("Min amount (₹)", min_value=0, value=0, step=500, key="q_amount")
+    
+    breakdown = txn_store.failure_breakdown(
+        q_minutes,
+        error_code=None if q_error == "Any" else q_error,
+        min_amount=q_amount or None
+    )
+    if breakdown:
+        import pandas as pd
+        st.dataframe(pd.DataFrame(breakdown), use_container_width=True, hide_index=True)
+    else:
+        st.caption("No matching failures.")
+
+# Bandit posteriors (thompson routing strategy), published live by the simulator's router
+posteriors = routing.read_metrics().get('simulator', {}).get('bandit', {})
+if posteriors:
+    with st.expander("🎰 BANDIT POSTERIORS"):
+        import plotly.graph_objects as go
+        fig_post = go.Figure()
+        methods = sorted({m for per_method in posteriors.values() for m in per_method})
+        banks_sorted = sorted(posteriors)
+        for m in methods:
+            stats = [posteriors[b].get(m) for b in banks_sorted]
+            fig_post.add_trace(go.Bar(
+                x=banks_sorted,
+                y=[s['mean'] * 100 if s else None for s in stats],
+                error_y=dict(
+                    type='data',
+                    symmetric=False,
+                    array=[(s['high'] - s['mean']) * 100 if s else 0 for s in stats],
+                    arrayminus=[(s['mean'] - s['low']) * 100 if s else 0 for s in stats]
+                ),
+                name=m,
+                hovertemplate='<b>%{x}</b><br>Posterior SR: %{y:.1f}%<extra>' + m + '</extra>'
+            ))
+        fig_post.update_layout(
+            title="Posterior success rate (mean, 90% interval)",
+            barmode='group',
+            yaxis=dict(range=[50, 100], title='SR %'),
+            **chart_layout
+        )
+        st.plotly_chart(fig_post, use_container_width=True)
+
+st.markdown("<br>", unsafe_allow_html=True)
+
 # Live Logs Section
 st.markdown("### 📡 LIVE TRAFFIC LOGS")
 
 recent_transactions = load_transactions_from_csv(15)
 if recent_transactions:
+    import pandas as pd
     df_logs = pd.DataFrame(recent_transactions)
     
     # Clean up
@@ -604,8 +787,10 @@ with col_right:
     safe_mode = config.get('global_config', {}).get('safe_mode', False)
     
     if st.button(f"{'🔓 DISABLE' if safe_mode else '🔒 ENABLE'} SAFE MODE", use_container_width=True):
-        config['global_config']['safe_mode'] = not safe_mode
-        tools.save_config(config)
+        with config_lock.locked(tools.CONFIG_FILE):
+            config = tools.get_config()
+            config.setdefault('global_config', {})['safe_mode'] = not safe_mode
+            tools.save_config(config)
         st.rerun()
     
     st.caption(f"Status: {'**DRY RUN ONLY**' if safe_mode else '**AUTONOMOUS**'}")
@@ -635,7 +820,10 @@ with col_right:
 # Auto-run agent logic removed - handled by background sentinel_loop.py
 # if auto_run and ...
 
+# Started after the page is drawn, so its backlog drain doesn't slow the first render
+start_rollup_job()
+
 # Auto-refresh for live updates
-if st.session_state.simulator_running or os.path.exists('transactions.csv'):
+if st.session_state.simulator_running or has_transactions():
     time.sleep(2)
     st.rerun()
@@ -0,0 +1,378 @@
+"""
+Archiver - Moves cold transactions from transactions.csv into Parquet
+
+Aged rows are written to compressed Parquet files partitioned by date and bank:
+
+    archive/date=2026-02-01/bank=hdfc/part-<hash>.parquet
+
+Each file carries row-group statistics, and read_archive() prunes partitions by
+directory name before letting Parquet skip row groups by timestamp.
+
+Archiving is incremental (bounded batch per run) and runs in a background
+thread. Writers are only held off for the final swap of the trimmed log.
+
+Requires pyarrow (optional dependency): pip install pyarrow
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency
+    pa = None
+    pq = None
+
+import txn_store
+
+ARCHIVE_DIR = "archive"
+CONFIG_FILE = "shared_config.json"
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required for archiving. Install with: pip install pyarrow")
+
+
+def _schema():
+    return pa.schema([
+        ('timestamp', pa.timestamp('us')),
+        ('txn_id', pa.string()),
+        ('bank', pa.string()),
+        ('method', pa.string()),
+        ('status', pa.string()),
+        ('latency_ms', pa.int32()),
+        ('amount', pa.float64()),
+        ('error_code', pa.string()),
+        ('retry_count', pa.int16()),
+    ])
+
+
+def _bank_ids() -> Dict[str, str]:
+    """Map bank display names to config ids (e.g. 'HDFC Bank' -> 'hdfc')."""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            return {b['name']: b['id'] for b in json.load(f).get('banks', [])}
+    except Exception:
+        return {}
+
+
+def _slug(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', (value or 'unknown').lower()).strip('_') or 'unknown'
+
+
+def _to_int(value, default=0) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value, default=0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _columns(rows: List[Dict[str, Any]]) -> Dict[str, list]:
+    return {
+        'timestamp': [datetime.fromisoformat(r['timestamp']) for r in rows],
+        'txn_id': [r.get('txn_id') for r in rows],
+        'bank': [r.get('bank') for r in rows],
+        'method': [r.get('method') for r in rows],
+        'status': [r.get('status') for r in rows],
+        'latency_ms': [_to_int(r.get('latency_ms')) for r in rows],
+        'amount': [_to_float(r.get('amount')) for r in rows],
+        'error_code': [r.get('error_code') or '' for r in rows],
+        'retry_count': [_to_int(r.get('retry_count')) for r in rows],
+    }
+
+
+def write_partitions(rows: List[Dict[str, Any]], archive_dir: str = ARCHIVE_DIR,
+                     row_group_size: int = 50000) -> List[str]:
+    """
+    Write rows to date/bank partitions.
+
+    File names are derived from the rows' txn_ids, so re-running after a crash
+    overwrites the same files instead of duplicating data.
+
+    Returns:
+        Paths written
+    """
+    _require_pyarrow()
+    bank_ids = _bank_ids()
+    partitions = {}
+    for r in rows:
+        key = (r['timestamp'][:10], bank_ids.get(r.get('bank'), _slug(r.get('bank'))))
+        partitions.setdefault(key, []).append(r)
+
+    written = []
+    for (date, bank), part_rows in partitions.items():
+        part_rows.sort(key=lambda r: r['timestamp'])
+        digest = hashlib.sha1('\n'.join(r.get('txn_id', '') for r in part_rows).encode()).hexdigest()[:16]
+        directory = os.path.join(archive_dir, f"date={date}", f"bank={bank}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{digest}.parquet")
+
+        table = pa.Table.from_pydict(_columns(part_rows), schema=_schema())
+        tmp_path = path + '.tmp'
+        pq.write_table(
+            table, tmp_path,
+            compression='zstd',
+            row_group_size=row_group_size,
+            write_statistics=True
+        )
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+def _aged_prefix(path: str, cutoff: str, max_rows: int):
+    """
+    Scan the head of the CSV log for rows older than `cutoff`.
+
+    Returns:
+        (rows, header_bytes, prefix_end_offset)
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        fieldnames = next(csv.reader([header.decode('utf-8').strip()]))
+        lines = []
+        end = f.tell()
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            if line[:26].decode('utf-8', errors='replace') >= cutoff:
+                break
+            lines.append(line)
+            end += len(line)
+            if len(lines) >= max_rows:
+                break
+
+    text = b''.join(lines).decode('utf-8', errors='replace')
+    rows = [r for r in csv.DictReader(io.StringIO(text), fieldnames=fieldnames) if r.get('timestamp')]
+    return rows, header, end
+
+
+def _trim_log(store: txn_store.CsvStore, header: bytes, prefix_end: int) -> None:
+    """
+    Drop the first `prefix_end` bytes of the log (keeping the header).
+
+    The tail is copied to a temp file while writers keep appending; only the
+    final catch-up copy and atomic rename happen under the store's
+    cross-process write lock, so no append can land between the two.
+    """
+    path = store.path
+    tmp_path = path + '.archiving'
+    with open(tmp_path, 'wb') as dst:
+        dst.write(header)
+        with open(path, 'rb') as src:
+            src.seek(prefix_end)
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+            copied_to = src.tell()
+
+        with store.locked():
+            # Catch up on anything appended since the bulk copy, then swap
+            with open(path, 'rb') as src:
+                src.seek(copied_to)
+                dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+            dst.close()
+            os.replace(tmp_path, path)
+
+
+def archive_once(max_age_days: float = 7, archive_dir: str = ARCHIVE_DIR,
+                 max_rows: int = 200000) -> Dict[str, Any]:
+    """
+    Move up to `max_rows` rows older than `max_age_days` from the CSV log into Parquet.
+
+    Returns:
+        {'success': bool, 'archived': n, 'files': [...]} or {'success': False, 'error': ...}
+    """
+    _require_pyarrow()
+    store = txn_store.get_store()
+    if not isinstance(store, txn_store.CsvStore):
+        return {'success': False, 'error': f'Archiving supports the csv store only (active: {store.name})'}
+    if not os.path.exists(store.path):
+        return {'success': True, 'archived': 0, 'files': []}
+
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+    rows, header, prefix_end = _aged_prefix(store.path, cutoff, max_rows)
+    if not rows:
+        return {'success': True, 'archived': 0, 'files': []}
+
+    # Parquet first: a crash before the trim leaves rows in both places, and the
+    # deterministic part names make the retry overwrite rather than duplicate.
+    files = write_partitions(rows, archive_dir)
+    _trim_log(store, header, prefix_end)
+
+    return {'success': True, 'archived': len(rows), 'files': files}
+
+
+def read_archive(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 banks: Optional[List[str]] = None, columns: Optional[List[str]] = None,
+                 archive_dir: str = ARCHIVE_DIR):
+    """
+    Read archived transactions, pruning by time range and bank.
+
+    Args:
+        start: Inclusive lower bound on timestamp
+        end: Exclusive upper bound on timestamp
+        banks: Bank ids or names to include (None = all)
+        columns: Columns to read (None = all)
+
+    Returns:
+        pyarrow.Table
+    """
+    _require_pyarrow()
+    if not os.path.isdir(archive_dir):
+        return _schema().empty_table()
+
+    wanted_banks = None
+    if banks:
+        bank_ids = _bank_ids()
+        wanted_banks = {bank_ids.get(b, _slug(b)) for b in banks}
+
+    start_date = start.date().isoformat() if start else None
+    end_date = end.date().isoformat() if end else None
+
+    filters = []
+    if start:
+        filters.append(('timestamp', '>=', start))
+    if end:
+        filters.append(('timestamp', '<', end))
+
+    tables = []
+    for date_dir in sorted(os.listdir(archive_dir)):
+        if not date_dir.startswith('date='):
+            continue
+        date = date_dir[5:]
+        # Partition pruning on the date directory
+        if (start_date and date < start_date) or (end_date and date > end_date):
+            continue
+        for bank_dir in sorted(os.listdir(os.path.join(archive_dir, date_dir))):
+            if not bank_dir.startswith('bank='):
+                continue
+            if wanted_banks is not None and bank_dir[5:] not in wanted_banks:
+                continue
+            directory = os.path.join(archive_dir, date_dir, bank_dir)
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.parquet'):
+                    continue
+                # Row groups outside the time range are skipped via their statistics
+                tables.append(pq.read_table(
+                    os.path.join(directory, name),
+                    columns=columns,
+                    filters=filters or None
+                ))
+
+    if not tables:
+        schema = _schema()
+        if columns:
+            schema = pa.schema([schema.field(c) for c in columns])
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+class ArchiveJob:
+    """Background thread that archives aged rows in bounded batches."""
+
+    def __init__(self, interval_seconds: float = 300.0, max_age_days: float = 7):
+        self.running = False
+        self.interval_seconds = interval_seconds
+        self.max_age_days = max_age_days
+        self.thread = None
+
+    def start(self):
+        """Start periodic archiving (no-op if already running)."""
+        if self.running:
+            return
+        _require_pyarrow()
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        print(f"✓ Archive job started - rows older than {self.max_age_days}d, every {self.interval_seconds:.0f}s")
+
+    def stop(self):
+        """Stop periodic archiving."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        print("✓ Archive job stopped")
+
+    def _loop(self):
+        while self.running:
+            try:
+                # Keep going while full batches are being moved
+                while self.running:
+                    result = archive_once(self.max_age_days)
+                    if result.get('archived'):
+                        print(f"  📦 Archived {result['archived']} rows into {len(result['files'])} files")
+                    if not result.get('success') or result.get('archived', 0) < 200000:
+                        break
+            except Exception as e:
+                print(f"Archive error: {e}")
+            time.sleep(self.interval_seconds)
+
+
+# Global archive job instance
+archive_job = ArchiveJob()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive cold transactions to partitioned Parquet")
+    sub = parser.add_subparsers(dest='command')
+
+    run = sub.add_parser('run', help='Archive aged rows (once, or continuously with --loop)')
+    run.add_argument('--max-age-days', type=float, default=7)
+    run.add_argument('--loop', action='store_true', help='Keep running in the background')
+    run.add_argument('--interval', type=float, default=300)
+
+    read = sub.add_parser('read', help='Read archived rows')
+    read.add_argument('--start', help='ISO start timestamp (inclusive)')
+    read.add_argument('--end', help='ISO end timestamp (exclusive)')
+    read.add_argument('--bank', action='append', help='Bank id or name (repeatable)')
+    read.add_argument('--limit', type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.command == 'read':
+        table = read_archive(
+            start=datetime.fromisoformat(args.start) if args.start else None,
+            end=datetime.fromisoformat(args.end) if args.end else None,
+            banks=args.bank
+        )
+        print(f"{table.num_rows} archived rows")
+        for row in table.slice(0, args.limit).to_pylist():
+            print(f"  {row['timestamp']} | {row['bank']:15} | {row['status']:7} | {row['latency_ms']}ms")
+    elif args.command == 'run' and args.loop:
+        job = ArchiveJob(args.interval, args.max_age_days)
+        try:
+            job.start()
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            job.stop()
+    else:
+        max_age = args.max_age_days if args.command == 'run' else 7
+        print(archive_once(max_age))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Backtest - Replays recorded transaction logs through the agent on simulated time
+
+For each scenario a worker process:
+1. creates a sandbox directory with a copy of the config (agent history and
+   pending feedback cleared) and an empty transaction log
+2. walks simulated time from the first to the last row of the recorded log;
+   every `cadence_seconds` it appends the rows up to that instant to the
+   sandbox log and runs the full observe/reason/act/feedback graph with
+   clock.now() pinned to simulated time (plus the cycle's real duration, so a
+   slow LLM costs simulated time too)
+3. reads back what the agent applied from the sandbox config's history
+
+The log is replayed open-loop: the agent's actions change the sandbox config
+but not the recorded traffic, so time-to-mitigate is the time to the first
+applied action, not to recovery.
+
+Reported per scenario:
+- onset: incident start (scenario's `incident_start`, or the first minute in
+  which a bank breaches the fallback SR/latency thresholds)
+- TTD: onset -> first cycle deciding to INTERVENE
+- TTM: onset -> first action applied to the config
+- actions / false positives (applied before onset) / flaps (reroutes reversed
+  within flap_window_minutes, strategy switched back, or auto-rollbacks)
+
+Scenarios run in parallel, one fresh process each. The LLM is the offline
+stand-in (mock_llm) unless a scenario sets "llm": "live".
+
+    python backtest.py incident.csv --cadence 30
+    python backtest.py scenarios.json --workers 4 --json results.json
+
+A scenario file holds one object or a list of them:
+
+    {"name": "hdfc-timeouts", "log": "logs/hdfc.csv", "cadence_seconds": 30,
+     "incident_start": "2026-02-01T07:35:00", "llm": "mock",
+     "mock": {"latency_ms": 400, "rate_limit": 0.1}, "config": "shared_config.json"}
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+import clock
+import fallback
+
+BACKTEST_DEFAULTS = {
+    'cadence_seconds': 60,
+    'llm': 'mock',
+    'mock': {},
+    'flap_window_minutes': 10,
+    'onset_bucket_seconds': 60,
+    'config': 'shared_config.json',
+    'keep_sandbox': False,
+}
+
+NOT_APPLIED = ('action_feedback',)
+
+
+def load_log(path: str) -> List[Dict[str, Any]]:
+    """Rows of a recorded transactions.csv, sorted by timestamp."""
+    with open(path, 'r', newline='') as f:
+        rows = [r for r in csv.DictReader(f) if r.get('timestamp')]
+    rows.sort(key=lambda r: r['timestamp'])
+    return rows
+
+
+def detect_onset(rows: List[Dict[str, Any]], config: Dict[str, Any],
+                 bucket_seconds: int = 60) -> Optional[datetime]:
+    """
+    Start of the first time bucket in which some bank breaches the fallback
+    policy's SR or latency threshold (with at least min_transactions rows).
+    """
+    r = fallback.rules(config)['fallback']
+    buckets: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        ts = datetime.fromisoformat(row['timestamp'])
+        start = ts - timedelta(seconds=ts.timestamp() % bucket_seconds)
+        buckets.setdefault((start, row.get('bank')), []).append(row)
+
+    for (start, _bank), txns in sorted(buckets.items(), key=lambda kv: kv[0][0]):
+        if len(txns) < r['min_transactions']:
+            continue
+        sr = sum(1 for t in txns if t.get('status') == 'Success') / len(txns)
+        latency = sum(float(t.get('latency_ms') or 0) for t in txns) / len(txns)
+        if sr < r['min_success_rate'] or latency > r['max_latency_ms']:
+            return start
+    return None
+
+
+def count_flaps(history: List[Dict[str, Any]], window_minutes: float = 10) -> int:
+    """Reroutes undone by a reverse reroute, strategy switches reverted, and auto-rollbacks."""
+    flaps = 0
+    window = timedelta(minutes=window_minutes)
+    for i, h in enumerate(history):
+        if h['action'] == 'auto_rollback':
+            flaps += 1
+            continue
+        ts = datetime.fromisoformat(h['timestamp'])
+        for earlier in reversed(history[:i]):
+            if ts - datetime.fromisoformat(earlier['timestamp']) > window:
+                break
+            if h['action'] == earlier['action'] == 'reroute_traffic':
+                d, e = h['details'], earlier['details']
+                if d.get('from') == e.get('to') and d.get('to') == e.get('from'):
+                    flaps += 1
+                    break
+            if h['action'] == earlier['action'] == 'set_routing_strategy':
+                if earlier['details'].get('previous') == h['details'].get('strategy'):
+                    flaps += 1
+                    break
+    return flaps
+
+
+def _seconds(later: Optional[datetime], earlier: Optional[datetime]) -> Optional[float]:
+    if later is None or earlier is None:
+        return None
+    return round((later - earlier).total_seconds(), 1)
+
+
+@contextmanager
+def _output_to(path: str):
+    """Send this process's stdout (and that of the shadow pool it starts) to a file."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(path, 'w') as log:
+        os.dup2(log.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def run_scenario(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replay one scenario in a sandbox (meant to run in its own process: it
+    changes the working directory and environment).
+
+    Returns:
+        {'success': True, 'name', 'onset', 'ttd_s', 'ttm_s', 'actions',
+         'false_positives', 'flaps', 'cycles', 'fallback_cycles', ...}
+    """
+    s = dict(BACKTEST_DEFAULTS, **scenario)
+    name = s.get('name') or os.path.splitext(os.path.basename(s['log']))[0]
+    original_dir = os.getcwd()
+    sandbox = tempfile.mkdtemp(prefix=f"backtest_{name}_")
+    server = None
+    try:
+        rows = load_log(s['log'])
+        if not rows:
+            return {'success': False, 'name': name, 'error': f"no rows in {s['log']}"}
+        with open(s['config'], 'r') as f:
+            config = json.load(f)
+        config['agent_history'] = []
+        config['pending_feedback'] = []
+
+        os.chdir(sandbox)
+        os.environ['TXN_STORE'] = 'csv'
+        with open('shared_config.json', 'w') as f:
+            f.write(json.dumps(config, indent=2))
+
+        if s['llm'] == 'mock':
+            import mock_llm
+            server = mock_llm.start(**s['mock'])
+            os.environ['LLM_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+
+        import agent_engine
+        import tools
+        import txn_store
+        store = txn_store.get_store()
+
+        onset = (datetime.fromisoformat(s['incident_start']) if s.get('incident_start')
+                 else detect_onset(rows, config, s['onset_bucket_seconds']))
+        start = datetime.fromisoformat(rows[0]['timestamp'])
+        end = datetime.fromisoformat(rows[-1]['timestamp'])
+
+        cycles = []
+        fed = 0
+        tick = start + timedelta(seconds=s['cadence_seconds'])
+        with _output_to('agent.log'):
+            while tick <= end + timedelta(seconds=s['cadence_seconds']):
+                cutoff = tick.isoformat()
+                batch = []
+                while fed < len(rows) and rows[fed]['timestamp'] <= cutoff:
+                    batch.append(rows[fed])
+                    fed += 1
+                store.append_many(batch)
+
+                real_start = time.monotonic()
+                clock.set_source(lambda: tick + timedelta(seconds=time.monotonic() - real_start))
+                result = agent_engine.run_agent_cycle()
+                duration = time.monotonic() - real_start
+                clock.set_source(None)
+
+                details = result.get('reasoning_details') or {}
+                cycles.append({
+                    'time': tick,
+                    'decided_at': tick + timedelta(seconds=duration),
+                    'duration_s': duration,
+                    'decision': details.get('decision', 'ERROR' if 'error' in details else 'NO_ACTION'),
+                    'fallback': bool(details.get('fallback')),
+                    'actions': result.get('actions', []),
+                })
+                tick = max(tick + timedelta(seconds=s['cadence_seconds']), tick + timedelta(seconds=duration))
+
+        history = [h for h in tools.get_config().get('agent_history', []) if h['action'] not in NOT_APPLIED]
+        applied_times = [datetime.fromisoformat(h['timestamp']) for h in history if h['action'] != 'auto_rollback']
+        detected = next((c['decided_at'] for c in cycles
+                         if onset and c['time'] >= onset and c['decision'] == 'INTERVENE'), None)
+        mitigated = next((t for t in applied_times if onset and t >= onset), None)
+        durations = sorted(c['duration_s'] for c in cycles)
+
+        return {
+            'success': True,
+            'name': name,
+            'log': s['log'],
+            'rows': len(rows),
+            'span_minutes': round((end - start).total_seconds() / 60, 1),
+            'onset': onset.isoformat() if onset else None,
+            'ttd_s': _seconds(detected, onset),
+            'ttm_s': _seconds(mitigated, onset),
+            'actions': len(applied_times),
+            'false_positives': sum(1 for t in applied_times if onset is None or t < onset),
+            'flaps': count_flaps(history, s['flap_window_minutes']),
+            'cycles': len(cycles),
+            'interventions': sum(1 for c in cycles if c['decision'] == 'INTERVENE'),
+            'fallback_cycles': sum(1 for c in cycles if c['fallback']),
+            'cycle_p50_s': round(durations[len(durations) // 2], 3) if durations else 0.0,
+            'cycle_max_s': round(durations[-1], 3) if durations else 0.0,
+            'history': history,
+            'sandbox': sandbox if s['keep_sandbox'] else None,
+        }
+    except Exception as e:
+        return {'success': False, 'name': name, 'error': f"{type(e).__name__}: {e}"}
+    finally:
+        clock.set_source(None)
+        if server is not None:
+            server.shutdown()
+        if 'shadow' in sys.modules:
+            sys.modules['shadow'].shutdown()
+        os.chdir(original_dir)
+        if not s['keep_sandbox']:
+            shutil.rmtree(sandbox, ignore_errors=True)
+
+
+def run_all(scenarios: List[Dict[str, Any]], workers: int = 4) -> List[Dict[str, Any]]:
+    """Run scenarios in parallel, each in a fresh spawned process (clean module state)."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(scenarios))), mp_context=context,
+                             max_tasks_per_child=1) as pool:
+        return list(pool.map(run_scenario, scenarios))
+
+
+def _load_scenarios(paths: List[str], overrides: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Scenario JSON files (object or list) and bare logs, with paths made absolute."""
+    scenarios = []
+    for path in paths:
+        if path.endswith('.json'):
+            with open(path, 'r') as f:
+                loaded = json.load(f)
+            base = os.path.dirname(os.path.abspath(path))
+            for item in loaded if isinstance(loaded, list) else [loaded]:
+                item = dict(overrides, **item)
+                item['log'] = os.path.join(base, item['log'])
+                if 'config' in item:
+                    item['config'] = os.path.join(base, item['config'])
+                scenarios.append(item)
+        else:
+            scenarios.append(dict(overrides, log=path))
+    for item in scenarios:
+        item['log'] = os.path.abspath(item['log'])
+        item['config'] = os.path.abspath(item.get('config', BACKTEST_DEFAULTS['config']))
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the agent against recorded transaction logs")
+    parser.add_argument('inputs', nargs='+', help='transactions CSV logs and/or scenario JSON files')
+    parser.add_argument('--cadence', type=float, help='Seconds of simulated time between agent cycles')
+    parser.add_argument('--llm', choices=['mock', 'live'], help='Offline stand-in (default) or the configured LLM')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--keep-sandbox', action='store_true')
+    parser.add_argument('--json', help='Write full results (including applied history) to this file')
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.cadence:
+        overrides['cadence_seconds'] = args.cadence
+    if args.llm:
+        overrides['llm'] = args.llm
+    if args.keep_sandbox:
+        overrides['keep_sandbox'] = True
+
+    scenarios = _load_scenarios(args.inputs, overrides)
+    print(f"🧪 Backtesting {len(scenarios)} scenario(s) on {min(args.workers, len(scenarios))} worker(s)...")
+    started = time.monotonic()
+    results = run_all(scenarios, args.workers)
+
+    def fmt(v):
+        return '-' if v is None else f"{v:.0f}s"
+
+    print(f"\n{'scenario':24} {'cycles':>6} {'onset':>19} {'TTD':>6} {'TTM':>6} {'actions':>7} "
+          f"{'false+':>6} {'flaps':>5} {'fallbk':>6} {'cycle p50':>9}")
+    for r in results:
+        if not r['success']:
+            print(f"{r['name'][:24]:24} ✗ {r['error']}")
+            continue
+        print(f"{r['name'][:24]:24} {r['cycles']:>6} {(r['onset'] or '-')[:19]:>19} {fmt(r['ttd_s']):>6} "
+              f"{fmt(r['ttm_s']):>6} {r['actions']:>7} {r['false_positives']:>6} {r['flaps']:>5} "
+              f"{r['fallback_cycles']:>6} {r['cycle_p50_s']:>8.2f}s")
+    print(f"\nDone in {time.monotonic() - started:.1f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
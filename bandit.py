@@ -0,0 +1,152 @@
+"""
+Bandit - Thompson-sampling bank selection
+
+Keeps a Beta(alpha, beta) posterior over each bank's success probability
+(optionally one per payment method) and routes each payment to the bank with
+the best sampled success probability minus a latency penalty. Evidence is
+discounted on every update so the posterior forgets pre-incident history and
+moves traffic within a handful of failures.
+
+Configured in shared_config.json under routing_rules.bandit and enabled with
+routing_rules.strategy = "thompson":
+
+    "bandit": {
+      "per_method": true,
+      "weights_as": "prior",
+      "prior_strength": 10,
+      "latency_penalty_per_s": 0.1,
+      "decay": 0.98
+    }
+
+weights_as:
+    "prior": the bank's configured success_rate is the prior mean, trusted with
+             prior_strength pseudo-observations scaled by the bank's weight share
+    "cap":   uniform prior, and a bank never gets more than its weight share
+             of recent traffic
+    "none":  uniform prior, weights ignored
+"""
+
+import math
+import random
+import threading
+from collections import Counter, deque
+from typing import Dict, List, Any, Optional
+
+# Defaults for routing_rules.bandit
+BANDIT_DEFAULTS = {
+    'per_method': True,
+    'weights_as': 'prior',
+    'prior_strength': 10,
+    'latency_penalty_per_s': 0.1,
+    'decay': 0.98,
+}
+
+WEIGHT_MODES = ('prior', 'cap', 'none')
+
+ALL_METHODS = '*'
+
+
+class ThompsonBandit:
+    """Beta-Bernoulli Thompson sampling over banks."""
+
+    def __init__(self, rng: random.Random = None, cap_window: int = 200):
+        self.rng = rng or random.Random()
+        self.rules = dict(BANDIT_DEFAULTS)
+        self.priors: Dict[str, tuple] = {}
+        self.shares: Dict[str, float] = {}
+        self.posteriors: Dict[tuple, List[float]] = {}  # (bank_id, method) -> [alpha, beta, n]
+        self.recent_choices = deque(maxlen=cap_window)
+        self.lock = threading.Lock()
+
+    def configure(self, banks: List[Dict[str, Any]], rules: Dict[str, Any]) -> None:
+        """Apply routing_rules.bandit and derive priors/caps from the banks' weights."""
+        with self.lock:
+            self.rules = dict(BANDIT_DEFAULTS, **rules)
+            enabled = [b for b in banks if b.get('enabled', True)]
+            total = float(sum(max(0, b.get('weight', 0)) for b in enabled)) or 1.0
+            self.shares = {b['id']: max(0, b.get('weight', 0)) / total for b in enabled}
+
+            priors = {}
+            for b in enabled:
+                if self.rules['weights_as'] == 'prior':
+                    mean = min(0.999, max(0.001, b.get('metrics', {}).get('success_rate', 0.5)))
+                    strength = self.rules['prior_strength'] * self.shares[b['id']] * len(enabled)
+                    priors[b['id']] = (1 + strength * mean, 1 + strength * (1 - mean))
+                else:
+                    priors[b['id']] = (1.0, 1.0)
+
+            # Keep learned evidence but move it onto the new prior (weights changed)
+            for (bank_id, _), post in self.posteriors.items():
+                old = self.priors.get(bank_id, (1.0, 1.0))
+                new = priors.get(bank_id, (1.0, 1.0))
+                post[0] = max(1e-3, post[0] - old[0] + new[0])
+                post[1] = max(1e-3, post[1] - old[1] + new[1])
+            self.priors = priors
+
+    def _key(self, bank_id: str, method: Optional[str]) -> tuple:
+        return (bank_id, method if method and self.rules['per_method'] else ALL_METHODS)
+
+    def _posterior(self, key: tuple) -> List[float]:
+        post = self.posteriors.get(key)
+        if post is None:
+            alpha, beta = self.priors.get(key[0], (1.0, 1.0))
+            post = self.posteriors[key] = [alpha, beta, 0]
+        return post
+
+    def choose(self, banks: List[Dict[str, Any]], method: Optional[str] = None,
+               latency_ms: Dict[str, float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Thompson draw: sample each bank's success probability from its posterior,
+        subtract the latency penalty, and return the best bank.
+
+        Args:
+            banks: Candidate banks (already filtered for breakers/capacity)
+            method: Payment method, for per-method posteriors
+            latency_ms: Live latency per bank id (e.g. the router's EWMA)
+        """
+        if not banks:
+            return None
+        latency_ms = latency_ms or {}
+        with self.lock:
+            if self.rules['weights_as'] == 'cap' and self.recent_choices:
+                counts = Counter(self.recent_choices)
+                total = len(self.recent_choices)
+                under_cap = [b for b in banks if counts[b['id']] / total <= self.shares.get(b['id'], 0)]
+                banks = under_cap or banks
+
+            best, best_score = None, -math.inf
+            for b in banks:
+                alpha, beta, _ = self._posterior(self._key(b['id'], method))
+                latency = latency_ms.get(b['id'], b.get('metrics', {}).get('avg_latency_ms', 150))
+                score = self.rng.betavariate(alpha, beta) - self.rules['latency_penalty_per_s'] * latency / 1000.0
+                if score > best_score:
+                    best, best_score = b, score
+            self.recent_choices.append(best['id'])
+            return best
+
+    def update(self, bank_id: str, success: bool, method: Optional[str] = None) -> None:
+        """Discount old evidence toward the prior, then add this outcome."""
+        with self.lock:
+            post = self._posterior(self._key(bank_id, method))
+            alpha0, beta0 = self.priors.get(bank_id, (1.0, 1.0))
+            decay = self.rules['decay']
+            post[0] = alpha0 + decay * (post[0] - alpha0) + (1 if success else 0)
+            post[1] = beta0 + decay * (post[1] - beta0) + (0 if success else 1)
+            post[2] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Posterior state per bank and method: alpha, beta, mean, 90% interval, samples."""
+        with self.lock:
+            result: Dict[str, Dict[str, Any]] = {}
+            for (bank_id, method), (alpha, beta, n) in self.posteriors.items():
+                mean = alpha / (alpha + beta)
+                sd = math.sqrt(alpha * beta / ((alpha + beta) ** 2 * (alpha + beta + 1)))
+                result.setdefault(bank_id, {})[method] = {
+                    'alpha': round(alpha, 2),
+                    'beta': round(beta, 2),
+                    'mean': round(mean, 4),
+                    'low': round(max(0.0, mean - 1.645 * sd), 4),
+                    'high': round(min(1.0, mean + 1.645 * sd), 4),
+                    'n': n,
+                }
+            return result
@@ -0,0 +1,195 @@
+"""
+Checkout Bench - Concurrent shoppers against blocking vs background payment handling
+
+Models the checkout server as a fixed pool of request threads (the threads
+Streamlit runs script reruns on) and N shoppers clicking "Pay" at once:
+
+- blocking: the click handler runs the payment inline, so the request thread
+  is held for the whole bank call (the old time.sleep in the button handler)
+- background: the click handler submits to payments.PaymentProcessor and
+  returns; the shopper's page then polls status() every poll interval, each
+  poll being one short request
+
+Both modes run the same router / hedging / retry path. A probe client sends a
+trivial request every 50ms throughout, standing in for other shoppers just
+loading the page; its latency shows whether request threads are starved.
+
+Runs in a sandbox directory with a copy of shared_config.json, so the live
+transaction log and routing state are not touched. Bank call durations are
+scaled by --latency-scale (0.1 = a healthy bank answers in 100ms).
+
+    python checkout_bench.py
+    python checkout_bench.py --shoppers 200 --server-threads 8 --latency-scale 0.2
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+import payments
+import routing
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Probe:
+    """Sends a no-op request to the server pool every interval and records how long it took."""
+
+    def __init__(self, server: ThreadPoolExecutor, interval_s: float = 0.05):
+        self.server = server
+        self.interval_s = interval_s
+        self.latencies: List[float] = []
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _loop(self):
+        while self.running:
+            start = time.perf_counter()
+            self.server.submit(lambda: None).result()
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(self.interval_s)
+
+
+def run_mode(mode: str, shoppers: int, server_threads: int, workers: int,
+             latency_scale: float, poll_s: float, seed: int = 7) -> Dict[str, Any]:
+    """
+    Run one load test.
+
+    Args:
+        mode: 'blocking' or 'background'
+        shoppers: Shoppers clicking "Pay" at the same moment
+        server_threads: Request threads on the checkout server
+        workers: Background payment workers (background mode)
+        latency_scale: Multiplier on simulated bank call durations
+        poll_s: Status poll interval of a waiting page (background mode)
+
+    Returns:
+        Click response, payment completion and probe latency percentiles (ms)
+    """
+    router = routing.Router(source='checkout_bench')
+    router.refresh(force=True)
+    processor = payments.PaymentProcessor(router, workers=workers, latency_scale=latency_scale)
+    server = ThreadPoolExecutor(max_workers=server_threads, thread_name_prefix='server')
+    rng = random.Random(seed)
+    banks = [b['id'] for b in router.banks if b.get('enabled', True)]
+    picks = [rng.choice(banks) for _ in range(shoppers)]
+    clicks, completions, outcomes = [], [], []
+    lock = threading.Lock()
+    go = threading.Event()
+
+    def shopper(bank_id: str):
+        go.wait()
+        start = time.perf_counter()
+        if mode == 'blocking':
+            txn = server.submit(processor.process, bank_id, 1000, 'UPI').result()
+            clicked = done = time.perf_counter()
+        else:
+            handle = server.submit(processor.submit, bank_id, 1000, 'UPI').result()
+            clicked = time.perf_counter()
+            while True:
+                time.sleep(poll_s)
+                status = server.submit(processor.status, handle).result()
+                if status['state'] == 'done':
+                    break
+            done = time.perf_counter()
+            txn = status['result']
+        with lock:
+            clicks.append((clicked - start) * 1000)
+            completions.append((done - start) * 1000)
+            outcomes.append(txn.get('status') == 'Success')
+
+    probe = _Probe(server)
+    threads = [threading.Thread(target=shopper, args=(bank_id,), daemon=True) for bank_id in picks]
+    for t in threads:
+        t.start()
+    probe.start()
+    time.sleep(0.2)  # probe baseline before the rush
+    started = time.perf_counter()
+    go.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    probe.stop()
+    server.shutdown(wait=True)
+    processor.shutdown()
+
+    return {
+        'mode': mode,
+        'shoppers': shoppers,
+        'elapsed_s': round(elapsed, 2),
+        'payments_per_s': round(shoppers / elapsed, 1),
+        'success_rate': round(sum(outcomes) / len(outcomes), 3) if outcomes else 0.0,
+        'rejected': processor.stats['rejected'],
+        'click_p50_ms': round(statistics.median(clicks), 1),
+        'click_p95_ms': round(_percentile(clicks, 0.95), 1),
+        'complete_p50_ms': round(statistics.median(completions), 1),
+        'complete_p95_ms': round(_percentile(completions, 0.95), 1),
+        'probe_p95_ms': round(_percentile(probe.latencies, 0.95), 1),
+        'probe_max_ms': round(max(probe.latencies), 1) if probe.latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout concurrency benchmark")
+    parser.add_argument('--shoppers', type=int, default=100, help='Concurrent shoppers')
+    parser.add_argument('--server-threads', type=int, default=8, help='Request threads on the checkout server')
+    parser.add_argument('--workers', type=int, default=64, help='Background payment workers')
+    parser.add_argument('--latency-scale', type=float, default=0.1, help='Bank call duration multiplier')
+    parser.add_argument('--poll-ms', type=float, default=100, help='Status poll interval')
+    parser.add_argument('--config', default=routing.CONFIG_FILE, help='Config to copy into the sandbox')
+    parser.add_argument('--json', help='Also write results to this file')
+    args = parser.parse_args()
+
+    config_path = os.path.abspath(args.config)
+    sandbox = tempfile.mkdtemp(prefix='checkout_bench_')
+    cwd = os.getcwd()
+    os.environ['TXN_STORE'] = 'csv'
+    try:
+        shutil.copy(config_path, os.path.join(sandbox, routing.CONFIG_FILE))
+        os.chdir(sandbox)
+        results = []
+        for mode in ('blocking', 'background'):
+            print(f"▶ {mode}: {args.shoppers} shoppers, {args.server_threads} server threads ...")
+            results.append(run_mode(mode, args.shoppers, args.server_threads, args.workers,
+                                    args.latency_scale, args.poll_ms / 1000.0))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    columns = ['elapsed_s', 'payments_per_s', 'success_rate', 'rejected', 'click_p50_ms', 'click_p95_ms',
+               'complete_p50_ms', 'complete_p95_ms', 'probe_p95_ms', 'probe_max_ms']
+    print(f"\n{'':<18}" + ''.join(f"{r['mode']:>14}" for r in results))
+    for column in columns:
+        print(f"{column:<18}" + ''.join(f"{r[column]:>14}" for r in results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
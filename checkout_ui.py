@@ -1,10 +1,11 @@
 import streamlit as st
 import json
-import csv
 import random
 import os
 from datetime import datetime
 
+import routing
+
 # ==================== CONFIG ====================
 PRIMARY_COLOR = "#2D5CF6"  # Razorpay Blue
 BACKGROUND_COLOR = "#F8FAFC"
@@ -14,6 +15,13 @@ TEXT_SECONDARY = "#718096"
 BORDER_COLOR = "#E2E8F0"
 SUCCESS_COLOR = "#10B981"
 WARNING_COLOR = "#F59E0B"
+PAYMENT_POLL_SECONDS = 0.5  # how often the page checks a pending payment
+
+PAYMENT_ERRORS = {
+    'BANK_BUSY': 'This bank is busy right now, please try again or choose another bank',
+    'BANK_UNAVAILABLE': 'This bank is not accepting payments right now, please choose another bank',
+    'STATUS_UNAVAILABLE': 'Payment status unavailable',
+}
 
 # ==================== HELPER FUNCTIONS ====================
 
@@ -51,41 +59,41 @@ def get_available_banks():
     return banks
 
 def get_recommended_bank(banks):
-    """Get the top recommended bank (highest weight among healthy banks)"""
-    # Prioritize healthy banks
-    healthy_banks = [b for b in banks if not b['is_degraded'] and not b.get('is_down', False)]
-    if healthy_banks:
-        return max(healthy_banks, key=lambda x: x['weight'])['id']
+    """Get the top recommended bank from the shared router"""
+    recommended = routing.get_router().recommend()
+    if recommended and any(b['id'] == recommended for b in banks):
+        return recommended
     return None
 
-def append_transaction(bank_name, amount, method, status='Success'):
-    """Append transaction to CSV"""
-    try:
-        timestamp = datetime.now().isoformat()
-        txn_id = f"txn_{int(datetime.now().timestamp()*1000)}_{random.randint(1000, 9999)}"
-        
-        # Simulate latency based on bank health
-        config = load_config()
-        bank = next((b for b in config['banks'] if b['name'] == bank_name), None)
-        
-        if bank:
-            if bank['health_status'] == 'degraded':
-                latency = random.randint(550, 650)  # High latency for degraded
-            else:
-                latency = int(bank['metrics']['avg_latency_ms']) + random.randint(-20, 20)
-        else:
-            latency = random.randint(100, 200)
-        
-        with open('transactions.csv', 'a', newline='') as f:
-            writer = csv.writer(f)
-            error_code = '' if status == 'Success' else 'GATEWAY_ERROR'
-            retry_count = 0 if status == 'Success' else 1
-            writer.writerow([timestamp, txn_id, bank_name, method, status, latency, amount, error_code, retry_count])
-        
-        return txn_id, latency
-    except Exception as e:
-        st.error(f"Transaction logging error: {e}")
-        return None, None
+@st.fragment(run_every=PAYMENT_POLL_SECONDS)
+def payment_status():
+    """Poll the pending payment; hand over to the result once the bank has answered"""
+    import payments  # deferred: only needed once a shopper pays, keeps page cold start minimal
+    pending = st.session_state.pending_payment
+    status = payments.get_processor().status(pending['txn_id'])
+    if status is not None and status['state'] == 'pending':
+        st.info(f"⏳ Contacting {pending['bank']} server...")
+        return
+
+    st.session_state.pending_payment = None
+    txn = (status or {}).get('result') or {'status': 'Fail', 'error_code': 'STATUS_UNAVAILABLE'}
+    if txn['status'] == 'Success':
+        st.session_state.payment_complete = True
+        st.session_state.txn_details = {
+            'txn_id': txn['txn_id'],
+            'bank': txn['bank'],
+            'amount': txn['amount'],
+            'method': txn['method'],
+            'latency': txn['latency_ms'],
+            'timestamp': datetime.now().strftime("%d %b %Y, %I:%M %p")
+        }
+    else:
+        st.session_state.payment_error = {
+            'message': PAYMENT_ERRORS.get(txn.get('error_code'), txn.get('error_code') or 'Bank Server Error'),
+            'bank': pending['bank'],
+            'is_down': pending['is_down']
+        }
+    st.rerun()
 
 def get_bank_icon(bank_id):
     """Return emoji icon for bank"""
@@ -364,6 +372,10 @@ def main():
         st.session_state.payment_complete = False
     if 'txn_details' not in st.session_state:
         st.session_state.txn_details = None
+    if 'pending_payment' not in st.session_state:
+        st.session_state.pending_payment = None
+    if 'payment_error' not in st.session_state:
+        st.session_state.payment_error = None
     
     # Main container
     container = st.container()
@@ -478,6 +490,15 @@ def main():
 
             st.markdown("### Select Bank")
             
+            # Payments run in the background; the page only polls their status
+            if st.session_state.pending_payment:
+                payment_status()
+            elif st.session_state.payment_error:
+                error = st.session_state.payment_error
+                st.error(f"❌ Payment Failed: {error['message']}")
+                if error['is_down']:
+                    st.warning(f"⚠️ {error['bank']} is currently DOWN. Please try a different bank.")
+            
             original_banks = get_available_banks()
             # If wallet/upi, maybe show only healthy? No, user wants to see failures.
             # We show all.
@@ -515,50 +536,21 @@ def main():
                     if is_down:
                         btn_label = f"⚠️ Try {bank['name']}" # Warning on button text
                     
-                    if st.button(btn_label, key=f"bank_{bank['id']}", use_container_width=True):
+                    if st.button(btn_label, key=f"bank_{bank['id']}", use_container_width=True,
+                                 disabled=bool(st.session_state.pending_payment)):
+                        import payments
                         st.session_state.selected_bank = bank['name']
-                        
-                        # Simulate payment processing
-                        with st.spinner('Contacting Bank Server...'):
-                            import time
-                            # Latency simulation
-                            if is_down:
-                                time.sleep(3.0) # Long timeout
-                                success = False # Always fail
-                                status_msg = "TIMEOUT_ERROR"
-                            elif is_degraded:
-                                time.sleep(2.0)
-                                success = random.random() > 0.3 # High failure rate
-                                status_msg = "Make sure your server is not overloaded."
-                            else:
-                                time.sleep(1.0)
-                                success = random.random() > 0.05
-                                status_msg = ""
-                            
-                            status = 'Success' if success else 'Fail'
-                            
-                            txn_id, latency = append_transaction(
-                                bank['name'],
+                        st.session_state.payment_error = None
+                        st.session_state.pending_payment = {
+                            'txn_id': payments.get_processor().submit(
+                                bank['id'],
                                 st.session_state.amount,
-                                method_name, # Log the actual method type
-                                status
-                            )
-                            
-                            if success:
-                                st.session_state.payment_complete = True
-                                st.session_state.txn_details = {
-                                    'txn_id': txn_id,
-                                    'bank': bank['name'],
-                                    'amount': st.session_state.amount,
-                                    'method': method_name,
-                                    'latency': latency,
-                                    'timestamp': datetime.now().strftime("%d %b %Y, %I:%M %p")
-                                }
-                                st.rerun()
-                            else:
-                                st.error(f"❌ Payment Failed: {status_msg or 'Bank Server Error'}")
-                                if is_down:
-                                    st.warning(f"⚠️ {bank['name']} is currently DOWN. Please try a different bank.")
+                                method_name  # Log the actual method type
+                            ),
+                            'bank': bank['name'],
+                            'is_down': is_down
+                        }
+                        st.rerun()
             
             st.markdown("<br>", unsafe_allow_html=True)
             if st.button("← Back to Payment Methods", key="back_from_banks"):
@@ -609,6 +601,8 @@ def main():
                 st.session_state.selected_bank = None
                 st.session_state.payment_complete = False
                 st.session_state.txn_details = None
+                st.session_state.pending_payment = None
+                st.session_state.payment_error = None
                 st.session_state.amount = random.choice([500, 1000, 1500, 2500, 5000])
                 st.rerun()
 
@@ -0,0 +1,24 @@
+"""
+Clock - Replaceable source of "now" for the agent path
+
+Code that decides from time windows (transaction store cutoffs, agent
+cooldowns, feedback settling, history timestamps) reads clock.now() instead of
+datetime.now(), so the backtester can run the agent on a recorded log's
+simulated time. Outside a backtest it is plain datetime.now().
+"""
+
+from datetime import datetime
+from typing import Callable, Optional
+
+_source: Optional[Callable[[], datetime]] = None
+
+
+def now() -> datetime:
+    """Current time from the installed source, or the wall clock."""
+    return _source() if _source is not None else datetime.now()
+
+
+def set_source(source: Optional[Callable[[], datetime]]) -> None:
+    """Install a function returning the current (e.g. simulated) time; None restores the wall clock."""
+    global _source
+    _source = source
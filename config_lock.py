@@ -0,0 +1,62 @@
+"""
+Config Lock - Cross-process lock for read-modify-write of shared_config.json
+
+Several processes rewrite the config: the agent (tools.apply_actions), the
+feedback rollback, the dashboard and every router persisting breaker states.
+Each of them reads the file, changes its part and writes the whole file back,
+so an unguarded writer can silently revert another one's commit. Writers take
+locked() around the read and the write.
+
+The lock is an fcntl.flock on a sidecar file (the config itself is replaced
+atomically, so its inode changes) and is re-entrant within a thread, so
+save_config() can be called while apply_actions() already holds it.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: in-process locking only
+    fcntl = None
+
+_local = threading.local()
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(key: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(key, threading.Lock())
+
+
+@contextmanager
+def locked(path: str):
+    """Hold the exclusive write lock for `path` (re-entrant within a thread)."""
+    key = os.path.abspath(path)
+    held = getattr(_local, 'held', None)
+    if held is None:
+        held = _local.held = {}
+    if held.get(key):
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    with _thread_lock(key):
+        lock_file = open(key + '.lock', 'a') if fcntl else None
+        try:
+            if lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            held[key] = 1
+            try:
+                yield
+            finally:
+                held[key] = 0
+        finally:
+            if lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
@@ -0,0 +1,94 @@
+"""
+Downsample - Visual downsampling for dashboard time series
+
+Implements Largest-Triangle-Three-Buckets (LTTB) so the latency chart can
+render any time range with a bounded number of points per trace.
+"""
+
+from typing import List, Sequence, Tuple, Any
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Select the indices of the points to keep using Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The remaining points are split
+    into (threshold - 2) buckets and, for each bucket, the point forming the
+    largest triangle with the previously selected point and the average of the
+    next bucket is kept. Spikes (e.g. a single 600ms timeout) survive.
+
+    Args:
+        xs: Monotonically increasing x values (e.g. epoch seconds)
+        ys: y values, same length as xs
+        threshold: Maximum number of points to keep
+
+    Returns:
+        Sorted list of indices into xs/ys
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket (the "third" vertex of the triangle)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        if span <= 0:
+            avg_x, avg_y = xs[n - 1], ys[n - 1]
+        else:
+            avg_x = sum(xs[next_start:next_end]) / span
+            avg_y = sum(ys[next_start:next_end]) / span
+
+        # Pick the point in the current bucket with the largest triangle area
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        indices.append(best)
+        a = best
+
+    indices.append(n - 1)
+    return indices
+
+
+def downsample_series(points: List[Tuple[Any, float]], threshold: int,
+                      key=None) -> List[Tuple[Any, float]]:
+    """
+    Downsample a list of (x, y) points with LTTB.
+
+    Args:
+        points: (x, y) pairs sorted by x
+        threshold: Maximum number of points to keep
+        key: Optional function mapping x to a float (defaults to .timestamp()
+             for datetimes, identity otherwise)
+
+    Returns:
+        The selected (x, y) pairs, in order
+    """
+    if len(points) <= threshold:
+        return list(points)
+
+    if key is None:
+        def key(x):
+            return x.timestamp() if hasattr(x, 'timestamp') else float(x)
+
+    xs = [key(p[0]) for p in points]
+    ys = [float(p[1]) for p in points]
+    return [points[i] for i in lttb(xs, ys, threshold)]
+
+
+def point_budget(chart_width_px: int, points_per_px: float = 1.0, minimum: int = 50) -> int:
+    """Points per trace for a chart of the given pixel width."""
+    return max(minimum, int(chart_width_px * points_per_px))
@@ -0,0 +1,134 @@
+"""
+Fallback - Cycle deadlines and a deterministic remediation policy
+
+Every agent cycle runs against a deadline (cycle_seconds), and each graph
+node has its own budget inside it. The reason node gets whatever is left of
+its budget after reserving time for act and feedback. If the LLM has not
+answered by then (slow response, or 429 backoff that would sleep past the
+deadline), the cycle falls through to policy() below instead of waiting:
+
+- reroute traffic away from every bank below min_success_rate or above
+  max_latency_ms (given at least min_transactions observations), toward the
+  healthiest remaining bank
+- tighten those banks' retry policy to retry_level
+
+The fallback decision has the same shape as the LLM's, so it goes through
+the same guardrails in act (cooldown, safe mode, shadow evaluation).
+
+Configured in shared_config.json under global_config.agent_deadline.
+"""
+
+import time
+from typing import Dict, List, Any, Optional
+
+# Defaults for global_config.agent_deadline
+DEADLINE_DEFAULTS = {
+    'cycle_seconds': 45,
+    'node_seconds': {'observe': 5, 'reason': 25, 'act': 10, 'feedback': 5},
+    'fallback': {
+        'enabled': True,
+        'min_success_rate': 0.85,
+        'max_latency_ms': 800,
+        'min_transactions': 5,
+        'retry_level': 'low',
+    },
+}
+
+
+def rules(config: Dict[str, Any]) -> Dict[str, Any]:
+    """global_config.agent_deadline merged over the defaults (nested blocks too)."""
+    custom = config.get('global_config', {}).get('agent_deadline', {})
+    merged = dict(DEADLINE_DEFAULTS, **custom)
+    merged['node_seconds'] = dict(DEADLINE_DEFAULTS['node_seconds'], **custom.get('node_seconds', {}))
+    merged['fallback'] = dict(DEADLINE_DEFAULTS['fallback'], **custom.get('fallback', {}))
+    return merged
+
+
+def cycle_deadline(config: Dict[str, Any], now: float = None) -> float:
+    """Monotonic time by which the whole cycle should be done."""
+    return (now if now is not None else time.monotonic()) + rules(config)['cycle_seconds']
+
+
+def node_deadline(node: str, cycle_end: Optional[float], config: Dict[str, Any],
+                  reserve: List[str] = (), now: float = None) -> float:
+    """
+    Monotonic time by which `node` must finish: its own budget, capped so the
+    nodes in `reserve` still have their budgets before the cycle deadline.
+    """
+    r = rules(config)
+    now = now if now is not None else time.monotonic()
+    end = now + r['node_seconds'].get(node, r['cycle_seconds'])
+    if cycle_end is not None:
+        end = min(end, cycle_end - sum(r['node_seconds'].get(n, 0) for n in reserve))
+    return end
+
+
+def policy(observations: Dict[str, Any], banks: List[Dict[str, Any]],
+           config: Dict[str, Any], reason: str = 'deadline exceeded') -> Dict[str, Any]:
+    """
+    Rule-based decision in the same format as the LLM's structured response.
+
+    Args:
+        observations: Output of the observe node (bank_metrics keyed by bank name)
+        banks: Bank configs (for ids, weights and retry policies)
+        config: Full config (for the thresholds)
+        reason: Why the fallback ran, for the analysis text
+
+    Returns:
+        {'hypothesis', 'confidence_score', 'analysis', 'decision', 'actions',
+         'explanation_for_user', 'fallback': True}
+    """
+    r = rules(config)['fallback']
+    by_name = {b.get('name'): b for b in banks}
+    usable = [b for b in banks if b.get('enabled', True) and b.get('health_status') != 'down']
+
+    unhealthy, healthy = [], []
+    for name, m in observations.get('bank_metrics', {}).items():
+        bank = by_name.get(name)
+        if bank is None or m.get('count', 0) < r['min_transactions']:
+            continue
+        if m.get('success_rate', 1.0) < r['min_success_rate'] or m.get('avg_latency', 0) > r['max_latency_ms']:
+            unhealthy.append((bank, m))
+        elif bank in usable:
+            healthy.append((bank, m))
+
+    if not unhealthy:
+        return {
+            'hypothesis': 'No bank breaches the fallback thresholds',
+            'confidence_score': 1.0,
+            'analysis': f"Fallback policy ({reason}): every observed bank is at or above "
+                        f"{r['min_success_rate'] * 100:.0f}% SR and under {r['max_latency_ms']}ms.",
+            'decision': 'NO_ACTION',
+            'actions': [],
+            'explanation_for_user': 'Automatic check found no unhealthy bank.',
+            'fallback': True,
+        }
+
+    # Target: best observed healthy bank, else the highest-weight usable bank
+    unhealthy_ids = {b['id'] for b, _ in unhealthy}
+    target = None
+    if healthy:
+        target = max(healthy, key=lambda bm: (bm[1].get('success_rate', 0), -bm[1].get('avg_latency', 0)))[0]
+    else:
+        spare = [b for b in usable if b['id'] not in unhealthy_ids]
+        target = max(spare, key=lambda b: b.get('weight', 0)) if spare else None
+
+    actions, findings = [], []
+    for bank, m in unhealthy:
+        findings.append(f"{bank['name']} {m.get('success_rate', 0) * 100:.0f}% SR / {m.get('avg_latency', 0):.0f}ms")
+        if target is not None:
+            actions.append({'type': 'reroute_traffic', 'params': {'bank': bank['id'], 'target': target['id']}})
+        if bank.get('retry_policy', {}).get('level') != r['retry_level']:
+            actions.append({'type': 'set_retry_policy', 'params': {'bank': bank['id'], 'level': r['retry_level']}})
+
+    return {
+        'hypothesis': f"Unhealthy: {', '.join(findings)}",
+        'confidence_score': 0.6,
+        'analysis': f"Fallback policy ({reason}): banks below {r['min_success_rate'] * 100:.0f}% SR or above "
+                    f"{r['max_latency_ms']}ms get traffic moved to "
+                    f"{target['name'] if target else 'no healthy bank'} and retries set to {r['retry_level']}.",
+        'decision': 'INTERVENE' if actions else 'NO_ACTION',
+        'actions': actions,
+        'explanation_for_user': 'Automatic remediation while the AI analysis was unavailable.',
+        'fallback': True,
+    }
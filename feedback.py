@@ -0,0 +1,209 @@
+"""
+Feedback - Measures the effect of agent actions and rolls back harmful ones
+
+When the agent applies actions, a snapshot of system and per-bank SR/latency
+(before window) and the routing fields the commit changed (old and new value,
+see tools.config_changes) are stored as a pending evaluation in
+shared_config.json. Once the action has had settle_seconds to take effect
+and enough new traffic has arrived, the post-action window is measured and the
+effect is appended to agent_history as an `action_feedback` entry. If SR
+dropped or latency rose beyond the thresholds, the changed fields are restored
+automatically (`auto_rollback`) - but only if they still hold the values the
+commit wrote. If a later commit or the operator has changed any of them since,
+the rollback is skipped and the evaluation is marked stale.
+
+Configured in shared_config.json under global_config.feedback.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+import clock
+import config_lock
+import tools
+import txn_store
+
+# Defaults for global_config.feedback
+FEEDBACK_DEFAULTS = {
+    'enabled': True,
+    'window_minutes': 5,               # before-window length
+    'settle_seconds': 60,              # wait this long after an action before measuring
+    'min_transactions': 20,            # post-action traffic needed for a verdict
+    'max_sr_drop': 0.02,               # roll back if SR falls by more than 2 points
+    'max_latency_increase_ms': 50,     # ... or average latency rises by more than this
+    'auto_rollback': True,
+    'expire_minutes': 30,              # give up on evaluations that never get traffic
+}
+
+
+def _rules(config: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(FEEDBACK_DEFAULTS, **config.get('global_config', {}).get('feedback', {}))
+
+
+def summarize(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """System and per-bank success rate / average latency of a set of transactions."""
+    def stats(rows):
+        if not rows:
+            return {'count': 0, 'success_rate': None, 'avg_latency': None}
+        return {
+            'count': len(rows),
+            'success_rate': sum(1 for r in rows if r.get('status') == 'Success') / len(rows),
+            'avg_latency': sum(float(r.get('latency_ms') or 0) for r in rows) / len(rows),
+        }
+
+    by_bank: Dict[str, List[Dict[str, Any]]] = {}
+    for t in transactions:
+        by_bank.setdefault(t.get('bank', 'Unknown'), []).append(t)
+    return {
+        'system': stats(transactions),
+        'banks': {bank: stats(rows) for bank, rows in by_bank.items()},
+    }
+
+
+def snapshot(window_minutes: float = 5) -> Dict[str, Any]:
+    """Summary of the last `window_minutes` of traffic."""
+    return summarize(txn_store.query_transactions(since_minutes=window_minutes))
+
+
+def begin(config: Dict[str, Any], actions: List[Dict[str, Any]], before: Dict[str, Any],
+          changes: List[Dict[str, Any]]) -> None:
+    """
+    Queue a pending evaluation for actions just applied (mutates `config`).
+
+    Args:
+        config: Config to queue the evaluation in
+        actions: The applied actions
+        before: snapshot() taken before the commit
+        changes: The commit's field changes (tools.apply_actions()['changes'])
+    """
+    config.setdefault('pending_feedback', []).append({
+        'timestamp': clock.now().isoformat(),
+        'actions': actions,
+        'before': before,
+        'changes': changes,
+    })
+    config['pending_feedback'] = config['pending_feedback'][-10:]
+
+
+def _effect(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    b, a = before.get('system', {}), after.get('system', {})
+    if b.get('success_rate') is None or a.get('success_rate') is None:
+        return {'sr_delta': None, 'latency_delta_ms': None}
+    return {
+        'sr_delta': round(a['success_rate'] - b['success_rate'], 4),
+        'latency_delta_ms': round(a['avg_latency'] - b['avg_latency'], 1),
+    }
+
+
+def evaluate_due(now: datetime = None) -> List[Dict[str, Any]]:
+    """
+    Measure every pending evaluation whose settle time has passed, journal the
+    effect, and roll back the changes of actions that made things worse.
+
+    Returns:
+        The feedback entries written this call
+    """
+    # Held from the read to the write so a rollback is checked against the current commit
+    with config_lock.locked(tools.CONFIG_FILE):
+        return _evaluate_due(now or clock.now())
+
+
+def _evaluate_due(now: datetime) -> List[Dict[str, Any]]:
+    config = tools.get_config()
+    rules = _rules(config)
+    pending = config.get('pending_feedback', [])
+    if not pending:
+        return []
+
+    written = []
+    still_pending = []
+    for item in pending:
+        started = datetime.fromisoformat(item['timestamp'])
+        age = (now - started).total_seconds()
+        if age < rules['settle_seconds']:
+            still_pending.append(item)
+            continue
+
+        # Post-action window: everything after the settle period
+        settle_from = started + timedelta(seconds=rules['settle_seconds'])
+        rows = [t for t in txn_store.query_transactions(since_minutes=age / 60.0 + 1)
+                if t.get('timestamp', '') >= settle_from.isoformat()]
+        if len(rows) < rules['min_transactions']:
+            if age < rules['expire_minutes'] * 60:
+                still_pending.append(item)
+            continue
+
+        after = summarize(rows)
+        effect = _effect(item['before'], after)
+        worse = effect['sr_delta'] is not None and (
+            effect['sr_delta'] < -rules['max_sr_drop']
+            or effect['latency_delta_ms'] > rules['max_latency_increase_ms']
+        )
+        verdict = 'worse' if worse else ('better' if effect['sr_delta'] is not None and (
+            effect['sr_delta'] > 0 or effect['latency_delta_ms'] < 0) else 'neutral')
+
+        rolled_back = False
+        conflicts = []
+        if worse and rules['auto_rollback']:
+            if 'changes' in item:
+                conflicts = tools.revert_changes(config, item['changes'])
+            else:
+                # Queued before changes were recorded: no way to tell what is still ours
+                conflicts = ['unrecorded']
+            rolled_back = not conflicts
+            if rolled_back and item['changes']:
+                config.setdefault('agent_history', []).append({
+                    'timestamp': now.isoformat(),
+                    'action': 'auto_rollback',
+                    'details': {'reverted': item['changes'], 'actions': item['actions']}
+                })
+
+        entry = {
+            'timestamp': now.isoformat(),
+            'action': 'action_feedback',
+            'details': {
+                'actions': item['actions'],
+                'applied_at': item['timestamp'],
+                'before': item['before']['system'],
+                'after': after['system'],
+                'effect': effect,
+                'verdict': verdict,
+                'rolled_back': rolled_back,
+            }
+        }
+        if conflicts:
+            # Worse, but the config has moved on: reverting would undo someone else's change
+            entry['details']['stale'] = True
+            entry['details']['changed_since'] = conflicts
+        config.setdefault('agent_history', []).append(entry)
+        written.append(entry)
+
+    config['pending_feedback'] = still_pending
+    if written or len(still_pending) != len(pending):
+        config['agent_history'] = config.get('agent_history', [])[-100:]
+        if not tools.save_config(config):
+            # Nothing (rollbacks included) reached the config: evaluate again next cycle
+            return []
+    return written
+
+
+def recent_effects(limit: int = 5) -> List[str]:
+    """One line per recent measured effect, for the agent's prompt memory."""
+    lines = []
+    history = tools.get_config().get('agent_history', [])
+    for h in [h for h in history if h.get('action') == 'action_feedback'][-limit:]:
+        d = h['details']
+        actions = ", ".join(f"{a.get('type')}({a.get('params', {})})" for a in d.get('actions', []))
+        effect = d.get('effect', {})
+        if effect.get('sr_delta') is None:
+            measured = "no comparable data"
+        else:
+            measured = f"SR {effect['sr_delta'] * 100:+.1f} pts, latency {effect['latency_delta_ms']:+.0f}ms"
+        if d.get('rolled_back'):
+            outcome = "ROLLED BACK"
+        elif d.get('stale'):
+            outcome = f"{d.get('verdict')}, not rolled back: changed since"
+        else:
+            outcome = d.get('verdict', 'neutral')
+        lines.append(f"- {actions} -> {measured} ({outcome})")
+    return lines
@@ -0,0 +1,292 @@
+"""
+Hedging - Hedged payment requests to cut tail latency on degraded banks
+
+If a payment has not completed within the bank's observed latency percentile
+(p95 by default), a second "hedge" request is sent to the next-best healthy
+bank. Both legs carry the same idempotency key; the first successful leg
+settles the payment and any later success is voided, so a customer is never
+charged twice.
+
+Configured in shared_config.json under routing_rules.hedging:
+
+    "hedging": {
+      "enabled": true,
+      "delay_percentile": 0.95,
+      "min_delay_ms": 50,
+      "max_hedge_ratio": 0.1,
+      "policies": [
+        {"method": "UPI", "min_amount": 0, "enabled": true},
+        {"method": "*", "min_amount": 2500, "delay_percentile": 0.9}
+      ]
+    }
+
+The most specific matching policy wins (exact method over "*", then the
+highest min_amount tier).
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Callable, Optional
+
+# Defaults for routing_rules.hedging
+HEDGE_DEFAULTS = {
+    'enabled': True,
+    'delay_percentile': 0.95,
+    'min_delay_ms': 50,
+    'max_hedge_ratio': 0.1,   # hedges allowed per request (recent window)
+}
+
+
+def resolve_policy(routing_rules: Dict[str, Any], method: str, amount: float) -> Dict[str, Any]:
+    """
+    Effective hedge policy for a payment method and amount.
+
+    Returns:
+        HEDGE_DEFAULTS overlaid with routing_rules.hedging and the most
+        specific matching entry of its `policies` list
+    """
+    rules = routing_rules.get('hedging', {})
+    policy = dict(HEDGE_DEFAULTS, **{k: v for k, v in rules.items() if k != 'policies'})
+
+    best = None
+    best_rank = None
+    for entry in rules.get('policies', []):
+        entry_method = entry.get('method', '*')
+        if entry_method not in ('*', method):
+            continue
+        if (amount or 0) < entry.get('min_amount', 0):
+            continue
+        rank = (entry_method != '*', entry.get('min_amount', 0))
+        if best_rank is None or rank > best_rank:
+            best, best_rank = entry, rank
+
+    if best:
+        policy.update({k: v for k, v in best.items() if k not in ('method', 'min_amount')})
+    return policy
+
+
+class IdempotencyLedger:
+    """First-success-wins settlement keyed by idempotency key."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self.settled: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def settle(self, key: str, leg: str) -> bool:
+        """
+        Try to settle `key` with `leg`.
+
+        Returns:
+            True if this leg settled the payment, False if another leg already
+            did (this leg's charge must be voided)
+        """
+        with self.lock:
+            if key in self.settled:
+                return self.settled[key] == leg
+            self.settled[key] = leg
+            if len(self.settled) > self.max_keys:
+                self.settled.popitem(last=False)
+            return True
+
+    def winner(self, key: str) -> Optional[str]:
+        with self.lock:
+            return self.settled.get(key)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Hedger:
+    """Sends hedge legs for slow payments and tracks hedge rate and latency saved."""
+
+    def __init__(self, router, ledger: IdempotencyLedger = None, window: int = 1000,
+                 max_workers: int = 16):
+        """
+        Args:
+            router: routing.Router used for latency percentiles and next_best()
+            ledger: Idempotency ledger shared by all legs
+            window: Number of recent payments used for the hedge ratio and metrics
+            max_workers: Leg threads for execute() (bounds concurrent live legs)
+        """
+        self.router = router
+        self.ledger = ledger or IdempotencyLedger()
+        self.lock = threading.Lock()
+        self.recent_hedged = deque(maxlen=window)
+        self.unhedged_latencies = deque(maxlen=window)
+        self.hedged_latencies = deque(maxlen=window)
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'duplicates_voided': 0}
+        self.max_workers = max_workers
+        self.executor = None
+
+    def hedge_delay_ms(self, bank: Dict[str, Any], policy: Dict[str, Any]) -> float:
+        """Time to wait on the primary leg before hedging."""
+        observed = self.router.latency_percentile(bank.get('id'), policy['delay_percentile'])
+        return max(policy['min_delay_ms'], observed or 0)
+
+    def _may_hedge(self, policy: Dict[str, Any]) -> bool:
+        if not policy.get('enabled'):
+            return False
+        with self.lock:
+            if not self.recent_hedged:
+                return True
+            return sum(self.recent_hedged) / len(self.recent_hedged) < policy['max_hedge_ratio']
+
+    def _run(self, bank: Dict[str, Any], run_leg: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            return run_leg(bank)
+        finally:
+            self.router.release(bank.get('id'))
+
+    def _record(self, hedged: bool, hedge_won: bool, voided: int,
+                unhedged_ms: float, final_ms: float) -> None:
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['hedged'] += int(hedged)
+            self.stats['hedge_wins'] += int(hedge_won)
+            self.stats['duplicates_voided'] += voided
+            self.recent_hedged.append(int(hedged))
+            self.unhedged_latencies.append(unhedged_ms)
+            self.hedged_latencies.append(final_ms)
+
+    def simulate(self, key: str, bank: Dict[str, Any], method: str, amount: float,
+                 routing_rules: Dict[str, Any],
+                 run_leg: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Hedge on simulated time (used by the simulator).
+
+        The primary leg runs first; if its latency exceeds the hedge delay d, a
+        hedge leg is run on the next-best bank and completes at d + its latency.
+        The earliest success settles; if every leg fails the payment waits for
+        the slowest one.
+
+        Args:
+            key: Idempotency key (the transaction id)
+            bank: Primary bank, with an in-flight slot already taken by route()
+            run_leg: bank -> result dict with 'status', 'latency_ms', 'error_code'
+
+        Every leg's router slot is released once the leg completes.
+
+        Returns:
+            Winning leg result with 'bank_id', 'hedged' and 'latency_ms' (end to end)
+        """
+        policy = resolve_policy(routing_rules, method, amount)
+        primary = dict(self._run(bank, run_leg), bank_id=bank.get('id'), bank=bank, started_ms=0.0)
+        legs = [primary]
+
+        delay = self.hedge_delay_ms(bank, policy)
+        if primary['latency_ms'] > delay and self._may_hedge(policy):
+            hedge_bank = self.router.next_best(exclude_id=bank.get('id'), acquire=True)
+            if hedge_bank is not None:
+                legs.append(dict(self._run(hedge_bank, run_leg), bank_id=hedge_bank.get('id'),
+                                 bank=hedge_bank, started_ms=delay))
+
+        for leg in legs:
+            leg['completed_ms'] = leg['started_ms'] + leg['latency_ms']
+        return self._settle(key, legs, bank.get('id'), primary['latency_ms'], hedged=len(legs) > 1)
+
+    def _settle(self, key: str, legs: List[Dict[str, Any]], primary_id: str,
+                unhedged_ms: float, hedged: bool) -> Dict[str, Any]:
+        """Settle the earliest successful leg; later successes are voided."""
+        winner = None
+        voided = 0
+        for leg in sorted(legs, key=lambda l: l['completed_ms']):
+            if leg.get('status') != 'Success':
+                continue
+            if self.ledger.settle(key, leg['bank_id']):
+                winner = winner or leg
+            else:
+                voided += 1
+
+        if winner is None and voided:
+            # Succeeded, but the key was already settled by an earlier attempt: this charge is voided too
+            winner = dict(legs[0], status='Fail', error_code='ALREADY_SETTLED',
+                          completed_ms=max(l['completed_ms'] for l in legs))
+        elif winner is None:
+            # Every leg failed: report the first leg's error once all legs are back
+            winner = dict(legs[0], completed_ms=max(l['completed_ms'] for l in legs))
+
+        self._record(hedged, winner['bank_id'] != primary_id, voided, unhedged_ms, winner['completed_ms'])
+
+        result = {k: v for k, v in winner.items() if k not in ('started_ms', 'completed_ms')}
+        result['latency_ms'] = int(winner['completed_ms'])
+        result['hedged'] = hedged
+        return result
+
+    def execute(self, key: str, bank: Dict[str, Any], method: str, amount: float,
+                routing_rules: Dict[str, Any],
+                run_leg: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Hedge in real time: run legs on worker threads (used by live checkout).
+
+        Same contract as simulate(); `run_leg` blocks for the leg's duration.
+        """
+        policy = resolve_policy(routing_rules, method, amount)
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hedge')
+
+        start = time.monotonic()
+
+        def timed(leg_bank: Dict[str, Any], started_ms: float) -> Dict[str, Any]:
+            result = self._run(leg_bank, run_leg)
+            return dict(result, bank_id=leg_bank.get('id'), bank=leg_bank, started_ms=started_ms,
+                        completed_ms=(time.monotonic() - start) * 1000)
+
+        futures = [self.executor.submit(timed, bank, 0.0)]
+        delay = self.hedge_delay_ms(bank, policy)
+        done, _ = wait(futures, timeout=delay / 1000.0)
+        if not done and self._may_hedge(policy):
+            hedge_bank = self.router.next_best(exclude_id=bank.get('id'), acquire=True)
+            if hedge_bank is not None:
+                futures.append(self.executor.submit(timed, hedge_bank, (time.monotonic() - start) * 1000))
+
+        # Return on the first success; otherwise wait for every leg
+        legs = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            legs.extend(f.result() for f in done)
+            if any(l.get('status') == 'Success' for l in legs):
+                break
+
+        legs.sort(key=lambda l: l['started_ms'])
+        primary = legs[0] if legs[0]['started_ms'] == 0.0 else None
+        # If the primary is still in flight, elapsed time is a lower bound on its latency
+        unhedged_ms = primary['completed_ms'] if primary else (time.monotonic() - start) * 1000
+        # Settle before watching the losing legs, so a late leg can never take the ledger
+        # from the winner reported here
+        result = self._settle(key, legs, bank.get('id'), unhedged_ms, hedged=len(futures) > 1)
+
+        if pending:
+            # Losing legs still go through the ledger (and get voided) when they finish
+            def void_late(future):
+                leg = future.result()
+                if leg.get('status') == 'Success' and not self.ledger.settle(key, leg['bank_id']):
+                    with self.lock:
+                        self.stats['duplicates_voided'] += 1
+            for future in pending:
+                future.add_done_callback(void_late)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hedge rate, hedge wins, voided duplicates and p95/p99 with vs without hedging."""
+        with self.lock:
+            stats = dict(self.stats)
+            unhedged = list(self.unhedged_latencies)
+            hedged = list(self.hedged_latencies)
+        stats['hedge_rate'] = stats['hedged'] / stats['requests'] if stats['requests'] else 0.0
+        for q, name in ((0.95, 'p95'), (0.99, 'p99')):
+            before = _percentile(unhedged, q)
+            after = _percentile(hedged, q)
+            stats[f'{name}_unhedged_ms'] = round(before, 1)
+            stats[f'{name}_ms'] = round(after, 1)
+            stats[f'{name}_saved_ms'] = round(before - after, 1)
+        return stats
@@ -0,0 +1,407 @@
+"""
+Importer - Bulk parallel loader for real gateway exports
+
+Loads large CSV/JSONL gateway logs into the transaction store so the agent's
+observe_node and the dashboard can run against real incidents.
+
+The input is split into byte ranges aligned on record (newline) boundaries and
+parsed in a process pool. Each record is mapped onto the transaction schema
+(timestamp, txn_id, bank, method, status, latency_ms, amount, error_code,
+retry_count); external bank names, ids and IFSC prefixes are resolved to the
+bank names in shared_config.json. Ranges are written to the store in file
+order, so the log stays time-ordered if the export was.
+
+Usage:
+    python importer.py export.csv
+    python importer.py export.jsonl --workers 8 --mapping mapping.json
+
+mapping.json (optional):
+    {"fields": {"timestamp": "created_at", "latency_ms": "resp_ms"},
+     "banks": {"HDFC0001234": "hdfc"}}
+
+Note: CSV records must not contain embedded newlines (quoted multi-line
+fields), since ranges are split on raw newlines.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import txn_store
+
+CONFIG_FILE = "shared_config.json"
+
+# Candidate source columns for each schema field, first match wins
+FIELD_ALIASES = {
+    'timestamp': ['timestamp', 'created_at', 'time', 'ts', 'txn_time', 'event_time', 'datetime'],
+    'txn_id': ['txn_id', 'transaction_id', 'payment_id', 'id', 'order_id', 'reference'],
+    'bank': ['bank', 'bank_name', 'issuer', 'issuer_bank', 'acquirer', 'bank_code', 'bank_id', 'ifsc'],
+    'method': ['method', 'payment_method', 'mode', 'instrument', 'channel'],
+    'status': ['status', 'state', 'result', 'txn_status'],
+    'latency_ms': ['latency_ms', 'latency', 'response_time_ms', 'duration_ms', 'response_time', 'elapsed_ms'],
+    'amount': ['amount', 'amt', 'value', 'amount_inr'],
+    'error_code': ['error_code', 'error', 'failure_reason', 'reason_code', 'decline_code'],
+    'retry_count': ['retry_count', 'retries', 'retry'],
+}
+
+# IFSC / short-code prefixes for the banks in shared_config.json
+BANK_CODES = {
+    'hdfc': 'hdfc', 'sbin': 'sbi', 'sbi': 'sbi', 'icic': 'icici', 'icici': 'icici',
+    'utib': 'axis', 'axis': 'axis', 'barb': 'bob', 'bob': 'bob',
+    'idfb': 'idfc', 'idfc': 'idfc', 'punb': 'pnb', 'pnb': 'pnb',
+}
+
+# JSONL records read to detect columns (union of their keys)
+JSONL_SAMPLE_RECORDS = 1000
+
+SUCCESS_STATUSES = {'success', 'succeeded', 'successful', 'captured', 'ok', 'completed', 'settled', 'paid'}
+FAIL_STATUSES = {'fail', 'failed', 'failure', 'declined', 'error', 'timeout', 'timed_out', 'rejected', 'cancelled'}
+
+METHODS = {
+    'upi': 'UPI',
+    'card': 'Card', 'credit_card': 'Card', 'debit_card': 'Card', 'cc': 'Card', 'dc': 'Card',
+    'netbanking': 'Net Banking', 'net_banking': 'Net Banking', 'net banking': 'Net Banking', 'nb': 'Net Banking',
+    'wallet': 'Wallet',
+}
+
+
+def build_bank_lookup(overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Map lowercase external bank identifiers to config bank names."""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            banks = json.load(f).get('banks', [])
+    except Exception:
+        banks = []
+
+    by_id = {b['id']: b['name'] for b in banks}
+    lookup = {}
+    for b in banks:
+        lookup[b['id'].lower()] = b['name']
+        lookup[b['name'].lower()] = b['name']
+        lookup[b['name'].lower().replace(' bank', '')] = b['name']
+    for code, bank_id in BANK_CODES.items():
+        if bank_id in by_id:
+            lookup.setdefault(code, by_id[bank_id])
+    for external, bank_id in (overrides or {}).items():
+        lookup[external.lower()] = by_id.get(bank_id, bank_id)
+    return lookup
+
+
+def _resolve_bank(value: str, lookup: Dict[str, str]) -> Optional[str]:
+    key = (value or '').strip().lower()
+    if not key:
+        return None
+    if key in lookup:
+        return lookup[key]
+    # IFSC codes look like HDFC0001234 - match on the 4-letter prefix
+    return lookup.get(key[:4])
+
+
+def _parse_timestamp(value) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+        # Epoch seconds or milliseconds
+        if number > 1e11:
+            number /= 1000.0
+        return datetime.fromtimestamp(number).isoformat()
+    except (TypeError, ValueError):
+        pass
+    try:
+        ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if ts.tzinfo is not None:
+            ts = ts.astimezone().replace(tzinfo=None)
+        return ts.isoformat()
+    except ValueError:
+        return None
+
+
+def map_record(record: Dict[str, Any], fields: Dict[str, str], bank_lookup: Dict[str, str],
+               offset: int = 0) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Map one external record onto the transaction schema.
+
+    Args:
+        record: Parsed record (CSV row or JSON object)
+        fields: Schema field -> record key
+        bank_lookup: Lowercased bank alias -> bank name
+        offset: Byte offset of the record in the export; keys records that
+            carry no txn_id, so ones sharing a timestamp stay distinct
+
+    Returns:
+        (transaction, '') on success or (None, reject_reason)
+    """
+    def get(field):
+        return record.get(fields[field]) if field in fields else None
+
+    timestamp = _parse_timestamp(get('timestamp'))
+    if not timestamp:
+        return None, 'bad_timestamp'
+
+    bank = _resolve_bank(str(get('bank') or ''), bank_lookup)
+    if not bank:
+        return None, 'unknown_bank'
+
+    raw_status = str(get('status') or '').strip().lower()
+    if raw_status in SUCCESS_STATUSES:
+        status = 'Success'
+    elif raw_status in FAIL_STATUSES:
+        status = 'Fail'
+    else:
+        return None, 'bad_status'
+
+    try:
+        latency = int(float(get('latency_ms') or 0))
+        amount = float(get('amount') or 0)
+        retry_count = int(float(get('retry_count') or 0))
+    except (TypeError, ValueError):
+        return None, 'bad_number'
+
+    error_code = str(get('error_code') or '').strip().upper()
+    if status == 'Fail' and not error_code:
+        error_code = 'TIMEOUT' if raw_status in ('timeout', 'timed_out') else 'UNKNOWN'
+    if status == 'Success':
+        error_code = ''
+
+    raw_method = str(get('method') or '').strip()
+    return {
+        'timestamp': timestamp,
+        'txn_id': str(get('txn_id') or f"imp_{timestamp}_{offset}"),
+        'bank': bank,
+        'method': METHODS.get(raw_method.lower(), raw_method or 'Unknown'),
+        'status': status,
+        'latency_ms': latency,
+        'amount': amount,
+        'error_code': error_code,
+        'retry_count': retry_count,
+    }, ''
+
+
+def resolve_fields(columns: List[str], overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Pick the source column for each schema field."""
+    present = {c.lower(): c for c in columns}
+    fields = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in present:
+                fields[field] = present[alias]
+                break
+    fields.update(overrides or {})
+    return fields
+
+
+def sample_jsonl_columns(path: str, sample: int = JSONL_SAMPLE_RECORDS) -> Tuple[List[str], str]:
+    """
+    Columns of a JSONL export: the union of the keys of its first `sample` records.
+
+    Returns:
+        (columns, '') or ([], error) if the first record is not a JSON object
+    """
+    columns = {}
+    seen = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                if not seen:
+                    return [], f"First JSONL record is not a JSON object: {line[:80]!r}"
+                continue  # rejected as bad_json when the range is parsed
+            columns.update(dict.fromkeys(record))
+            seen += 1
+            if seen >= sample:
+                break
+    if not seen:
+        return [], "No JSONL records found"
+    return list(columns), ''
+
+
+def split_ranges(path: str, chunk_bytes: int, start: int = 0) -> List[Tuple[int, int]]:
+    """Split [start, EOF) into ~chunk_bytes ranges that begin and end on newlines."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        pos = start
+        while pos < size:
+            target = pos + chunk_bytes
+            if target >= size:
+                end = size
+            else:
+                f.seek(target)
+                f.readline()  # Advance to the end of the record straddling the boundary
+                end = f.tell()
+            ranges.append((pos, end))
+            pos = end
+    return ranges
+
+
+def _parse_range(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker: parse and map one byte range. Runs in a child process."""
+    rows = []
+    rejects = {}
+    with open(task['path'], 'rb') as f:
+        f.seek(task['start'])
+        data = f.read(task['end'] - task['start'])
+
+    position = {'offset': task['start']}
+
+    def lines():
+        # Note where each line starts in the file; map_record keys id-less records by it
+        offset = task['start']
+        for raw in data.splitlines(keepends=True):
+            position['offset'] = offset
+            offset += len(raw)
+            yield raw.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    if task['format'] == 'csv':
+        records = csv.DictReader(lines(), fieldnames=task['columns'])
+    else:
+        records = lines()
+
+    field_sets = {}
+    for record in records:
+        fields = task['fields']
+        if task['format'] == 'jsonl':
+            if not record.strip():
+                continue
+            try:
+                record = json.loads(record)
+            except ValueError:
+                rejects['bad_json'] = rejects.get('bad_json', 0) + 1
+                continue
+            if not isinstance(record, dict):
+                rejects['bad_json'] = rejects.get('bad_json', 0) + 1
+                continue
+            # Records may name their fields differently: resolve each key set once
+            keys = tuple(record)
+            fields = field_sets.get(keys)
+            if fields is None:
+                fields = field_sets[keys] = resolve_fields(list(keys), task['overrides'])
+        txn, reason = map_record(record, fields, task['bank_lookup'], position['offset'])
+        if txn:
+            rows.append(txn)
+        else:
+            rejects[reason] = rejects.get(reason, 0) + 1
+    return {'rows': rows, 'rejects': rejects}
+
+
+def import_file(path: str, fmt: str = None, workers: int = None, chunk_mb: float = 32,
+                mapping: Optional[Dict[str, Any]] = None, store=None) -> Dict[str, Any]:
+    """
+    Import a CSV/JSONL gateway export into the transaction store.
+
+    Returns:
+        {'success': True, 'rows': n, 'rejected': n, 'reject_reasons': {...},
+         'elapsed_s': t, 'rows_per_s': r}
+    """
+    mapping = mapping or {}
+    store = store or txn_store.get_store()
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    workers = workers or os.cpu_count() or 2
+
+    # Detect columns from the header (CSV) or a sample of records (JSONL)
+    if fmt == 'csv':
+        with open(path, 'rb') as f:
+            first = f.readline()
+            data_start = f.tell()
+        columns = next(csv.reader([first.decode('utf-8', errors='replace').strip()]))
+    else:
+        data_start = 0
+        columns, error = sample_jsonl_columns(path)
+        if error:
+            return {'success': False, 'error': error}
+
+    fields = resolve_fields(columns, mapping.get('fields'))
+    missing = [f for f in ('timestamp', 'bank', 'status') if f not in fields]
+    if missing:
+        return {'success': False, 'error': f"Could not map required fields: {missing}. Columns: {columns}"}
+
+    base_task = {
+        'path': path,
+        'format': fmt,
+        'columns': columns,
+        'fields': fields,
+        'overrides': mapping.get('fields'),
+        'bank_lookup': build_bank_lookup(mapping.get('banks')),
+    }
+    ranges = split_ranges(path, int(chunk_mb * 1024 * 1024), data_start)
+
+    started = time.perf_counter()
+    imported = 0
+    rejects = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Bounded look-ahead keeps memory flat; results are written in file order
+        pending = deque()
+        queue = iter(ranges)
+        for start, end in queue:
+            pending.append(pool.submit(_parse_range, dict(base_task, start=start, end=end)))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            result = pending.popleft().result()
+            imported += store.append_many(result['rows'])
+            for reason, count in result['rejects'].items():
+                rejects[reason] = rejects.get(reason, 0) + count
+            next_range = next(queue, None)
+            if next_range:
+                pending.append(pool.submit(_parse_range, dict(base_task, start=next_range[0], end=next_range[1])))
+            print(f"  … {imported:,} rows imported", end='\r', flush=True)
+
+    elapsed = time.perf_counter() - started
+    rejected = sum(rejects.values())
+    return {
+        'success': True,
+        'rows': imported,
+        'rejected': rejected,
+        'reject_reasons': rejects,
+        'elapsed_s': round(elapsed, 3),
+        'rows_per_s': round((imported + rejected) / elapsed, 1) if elapsed > 0 else 0,
+        'field_mapping': fields,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import gateway exports into the transaction store")
+    parser.add_argument('path', help='CSV or JSONL export')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+    parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+    parser.add_argument('--chunk-mb', type=float, default=32, help='Byte range size per task')
+    parser.add_argument('--mapping', help='JSON file with field/bank mapping overrides')
+    args = parser.parse_args()
+
+    mapping = {}
+    if args.mapping:
+        with open(args.mapping, 'r') as f:
+            mapping = json.load(f)
+
+    store = txn_store.get_store()
+    print(f"🚚 Importing {args.path} into {store.name} store...")
+    result = import_file(args.path, args.format, args.workers, args.chunk_mb, mapping, store)
+    print()
+
+    if not result['success']:
+        print(f"❌ {result['error']}")
+        return
+
+    print(f"✅ Imported {result['rows']:,} rows in {result['elapsed_s']}s ({result['rows_per_s']:,.0f} rows/s)")
+    print(f"   Field mapping: {result['field_mapping']}")
+    if result['rejected']:
+        print(f"⚠️  Rejected {result['rejected']:,} rows:")
+        for reason, count in sorted(result['reject_reasons'].items(), key=lambda x: -x[1]):
+            print(f"   - {reason}: {count:,}")
+
+
+if __name__ == "__main__":
+    main()
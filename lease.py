@@ -0,0 +1,253 @@
+"""
+Lease - Leader lease and single-flight execution across processes
+
+A named lease lives in a local SQLite database (coordination.db). The holder
+renews it on a heartbeat thread; if the holder dies, the lease expires after
+ttl_seconds and the next requester takes over. Every new holder gets a higher
+fencing token.
+
+single_flight(name, fn) runs fn only while holding the lease. A requester
+that finds the lease taken does not start a duplicate run: it waits for the
+in-flight run to finish and returns that run's result (marked shared=True).
+The agent uses this so sentinel_loop.py, the dashboard's "Run Analysis" and a
+second host on the same disk never run two cycles (two LLM calls, two
+reroutes) at once.
+
+Configured in shared_config.json under global_config.coordination.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Any, Callable, Optional
+
+# Defaults for global_config.coordination
+COORDINATION_DEFAULTS = {
+    'enabled': True,
+    'db_path': 'coordination.db',
+    'ttl_seconds': 30,          # lease expires this long after the last heartbeat
+    'heartbeat_seconds': 10,
+    'wait_seconds': 60,         # how long a follower waits for the in-flight result
+    'poll_seconds': 0.25,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    token INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flights (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    holder TEXT,
+    finished_at REAL,
+    result TEXT
+);
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=5, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class Lease:
+    """A named, expiring lease held by this instance."""
+
+    def __init__(self, name: str, db_path: str = 'coordination.db', ttl_seconds: float = 30,
+                 heartbeat_seconds: float = 10):
+        self.name = name
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token: Optional[int] = None
+        self.lost = False
+        self.running = False
+        self.thread = None
+
+    def acquire(self) -> bool:
+        """Take the lease if it is free, expired or already ours."""
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT holder, token, expires_at FROM leases WHERE name = ?",
+                               (self.name,)).fetchone()
+            now = time.time()
+            if row and row[0] != self.holder and row[2] > now:
+                conn.execute("ROLLBACK")
+                return False
+            token = row[1] if row and row[0] == self.holder else (row[1] + 1 if row else 1)
+            conn.execute(
+                "INSERT INTO leases (name, holder, token, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, token = excluded.token, "
+                "expires_at = excluded.expires_at",
+                (self.name, self.holder, token, now + self.ttl_seconds)
+            )
+            conn.execute("COMMIT")
+            self.token = token
+            self.lost = False
+            return True
+        finally:
+            conn.close()
+
+    def renew(self) -> bool:
+        """Extend the lease; False if someone else holds it now."""
+        conn = _connect(self.db_path)
+        try:
+            cur = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND holder = ? AND token = ?",
+                (time.time() + self.ttl_seconds, self.name, self.holder, self.token)
+            )
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self) -> None:
+        """Stop heartbeats and give the lease up immediately."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?", (self.name, self.holder))
+        finally:
+            conn.close()
+        self.token = None
+
+    def start_heartbeat(self) -> None:
+        """Renew the lease every heartbeat_seconds until released."""
+        self.running = True
+        self.thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self.thread.start()
+
+    def _heartbeat(self):
+        while self.running:
+            deadline = time.monotonic() + self.heartbeat_seconds
+            while self.running and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if not self.running:
+                break
+            try:
+                if not self.renew():
+                    self.lost = True
+                    print(f"  ⚠️ Lease '{self.name}' lost to another holder")
+                    break
+            except Exception as e:
+                print(f"  ⚠️ Lease heartbeat failed: {e}")
+
+
+def holder(name: str, db_path: str = 'coordination.db') -> Optional[Dict[str, Any]]:
+    """Current holder of a lease, or None if free or expired."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT holder, token, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+    if not row or row[2] <= time.time():
+        return None
+    return {'holder': row[0], 'token': row[1], 'expires_in_s': round(row[2] - time.time(), 1)}
+
+
+def _flight(conn: sqlite3.Connection, name: str) -> tuple:
+    row = conn.execute("SELECT seq, finished_at, result FROM flights WHERE name = ?", (name,)).fetchone()
+    return row or (0, None, None)
+
+
+def single_flight(name: str, fn: Callable[[], Dict[str, Any]], rules: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Run fn() under the lease, or join the run already in flight.
+
+    Args:
+        name: Lease name (e.g. 'agent_cycle')
+        fn: Work to run; must return a JSON-serialisable dict
+        rules: global_config.coordination overrides
+
+    Returns:
+        fn's result. A follower gets the leader's result with 'shared': True,
+        or {'success': False, 'error': ...} if nothing finished in wait_seconds.
+        If the coordination db cannot be used (locked past the sqlite timeout,
+        unreadable), fn is not run and {'success': False, 'error': ...} is
+        returned, so a polling loop just skips the cycle.
+    """
+    rules = dict(COORDINATION_DEFAULTS, **(rules or {}))
+    lease = Lease(name, rules['db_path'], rules['ttl_seconds'], rules['heartbeat_seconds'])
+    deadline = time.monotonic() + rules['wait_seconds']
+
+    # A locked or broken coordination db skips this run instead of raising into the caller's loop
+    try:
+        conn = _connect(rules['db_path'])
+        try:
+            seen_seq = _flight(conn, name)[0]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return _unavailable(name, e)
+
+    while True:
+        try:
+            acquired = lease.acquire()
+        except sqlite3.Error as e:
+            return _unavailable(name, e)
+        if acquired:
+            lease.start_heartbeat()
+            try:
+                result = fn()
+                try:
+                    conn = _connect(rules['db_path'])
+                    try:
+                        conn.execute(
+                            "INSERT INTO flights (name, seq, holder, finished_at, result) VALUES (?, 1, ?, ?, ?) "
+                            "ON CONFLICT(name) DO UPDATE SET seq = seq + 1, holder = excluded.holder, "
+                            "finished_at = excluded.finished_at, result = excluded.result",
+                            (name, lease.holder, time.time(), json.dumps(result, default=str))
+                        )
+                    finally:
+                        conn.close()
+                except sqlite3.Error as e:
+                    # The run itself succeeded; followers just won't see its result
+                    print(f"  ⚠️ Could not publish '{name}' result: {e}")
+                if lease.lost:
+                    result = dict(result, lease_lost=True)
+                return result
+            finally:
+                try:
+                    lease.release()
+                except sqlite3.Error as e:
+                    print(f"  ⚠️ Could not release lease '{name}' (expires in {rules['ttl_seconds']}s): {e}")
+
+        # Follower: wait for the in-flight run to publish its result
+        try:
+            conn = _connect(rules['db_path'])
+            try:
+                while time.monotonic() < deadline:
+                    leader_gone = holder(name, rules['db_path']) is None
+                    seq, _finished, result = _flight(conn, name)
+                    if seq > seen_seq and result is not None:
+                        shared = json.loads(result)
+                        shared['shared'] = True
+                        return shared
+                    if leader_gone:
+                        break  # released or expired without a new result: try to take over
+                    time.sleep(rules['poll_seconds'])
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            return _unavailable(name, e)
+
+        if time.monotonic() >= deadline:
+            return {'success': False, 'error': f"'{name}' still running elsewhere after {rules['wait_seconds']}s"}
+
+
+def _unavailable(name: str, error: sqlite3.Error) -> Dict[str, Any]:
+    print(f"  ⚠️ Skipping '{name}': coordination db unavailable ({error})")
+    return {'success': False, 'error': f"coordination db unavailable: {error}"}
@@ -0,0 +1,214 @@
+"""
+Mock LLM - Offline stand-in for the Groq chat API
+
+Serves the OpenAI-compatible endpoint the Groq client calls
+(POST /openai/v1/chat/completions), so run_agent_cycle can be benchmarked and
+regression-tested without GROQ_API_KEY or network access.
+
+Responses:
+- rules (default): parses the bank lines of the agent's prompt and answers
+  with fallback.policy(), i.e. a schema-valid, deterministic decision
+- script: answers from a JSON file (a list of decisions or raw strings),
+  one per request, cycling
+
+Faults, all reproducible with --seed:
+- --latency-ms / --jitter-ms: response delay
+- --rate-limit P: fraction of requests answered with HTTP 429
+- --malformed P: fraction answered with truncated, unparseable JSON
+
+Point the agent at it with LLM_BASE_URL (or global_config.llm.base_url):
+
+    python mock_llm.py --port 8765 --latency-ms 400 --rate-limit 0.1
+    LLM_BASE_URL=http://127.0.0.1:8765 python sentinel_loop.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional
+
+import fallback
+import tools
+
+DEFAULT_PORT = 8765
+
+# "  - HDFC Bank: 45% SR, 820ms LATENCY. ..." lines of the agent prompt
+BANK_LINE = re.compile(r"^\s*- (?P<name>[^:]+): (?P<sr>\d+)% SR, (?P<latency>\d+)ms LATENCY", re.MULTILINE)
+SAMPLE_SIZE = re.compile(r"Last (\d+) txns")
+
+
+class MockLLM:
+    """Decision logic and fault injection shared by all request threads."""
+
+    def __init__(self, script: Optional[List[Any]] = None, latency_ms: float = 0, jitter_ms: float = 0,
+                 rate_limit: float = 0.0, malformed: float = 0.0, seed: int = None):
+        self.script = script
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.malformed = malformed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.stats = {'requests': 0, 'rate_limited': 0, 'malformed': 0}
+
+    def _draw(self) -> tuple:
+        """(call index, delay s, 429?, malformed?) drawn under the lock so a seed fixes the sequence."""
+        with self.lock:
+            index = self.calls
+            self.calls += 1
+            self.stats['requests'] += 1
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+            limited = self.rng.random() < self.rate_limit
+            broken = not limited and self.rng.random() < self.malformed
+            self.stats['rate_limited'] += limited
+            self.stats['malformed'] += broken
+            return index, delay, limited, broken
+
+    def decide(self, prompt: str, index: int) -> str:
+        """Content of the assistant message for a prompt."""
+        if self.script:
+            item = self.script[index % len(self.script)]
+            return item if isinstance(item, str) else json.dumps(item)
+
+        sample = SAMPLE_SIZE.search(prompt)
+        count = int(sample.group(1)) if sample else 30
+        bank_metrics = {
+            m.group('name').strip(): {
+                'count': count,
+                'success_rate': int(m.group('sr')) / 100.0,
+                'avg_latency': float(m.group('latency')),
+            }
+            for m in BANK_LINE.finditer(prompt)
+        }
+        config = tools.get_config()
+        decision = fallback.policy({'bank_metrics': bank_metrics}, config.get('banks', []), config,
+                                   reason='offline stand-in')
+        decision.pop('fallback', None)
+        return json.dumps(decision)
+
+    def respond(self, request: Dict[str, Any]) -> tuple:
+        """
+        Returns:
+            (status code, headers dict, body dict or str)
+        """
+        index, delay, limited, broken = self._draw()
+        time.sleep(delay)
+        if limited:
+            return 429, {'retry-after': '1'}, {'error': {
+                'message': 'Rate limit reached (injected by mock_llm)',
+                'type': 'tokens', 'code': 'rate_limit_exceeded'}}
+
+        messages = request.get('messages', [])
+        prompt = "\n".join(str(m.get('content', '')) for m in messages)
+        content = self.decide(prompt, index)
+        if broken:
+            content = content[:max(1, len(content) // 2)]
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return 200, {}, {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def _handler(mock: MockLLM):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send(404, {}, {'error': {'message': f'Unknown path {self.path}'}})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError as e:
+                self._send(400, {}, {'error': {'message': f'Bad request: {e}'}})
+                return
+            self._send(*mock.respond(request))
+
+        def do_GET(self):
+            # Health/stats probe
+            self._send(200, {}, dict(mock.stats))
+
+        def _send(self, status: int, headers: Dict[str, str], body: Any):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(port: int = 0, host: str = '127.0.0.1', **options) -> ThreadingHTTPServer:
+    """
+    Start the stand-in on a background thread (port 0 picks a free port).
+
+    Returns:
+        The server; its URL is f"http://{host}:{server.server_address[1]}".
+        Stop it with server.shutdown().
+    """
+    mock = MockLLM(**options)
+    server = ThreadingHTTPServer((host, port), _handler(mock))
+    server.daemon_threads = True
+    server.mock = mock
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Groq chat API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--script', help='JSON file with a list of responses to cycle through')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--malformed', type=float, default=0.0, help='Fraction answered with broken JSON')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, 'r') as f:
+            script = json.load(f)
+
+    mock = MockLLM(script=script, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                   rate_limit=args.rate_limit, malformed=args.malformed, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), _handler(mock))
+    server.daemon_threads = True
+    print(f"🧪 Mock LLM on http://{args.host}:{args.port} "
+          f"({'script' if script else 'rules'}, {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, "
+          f"429: {args.rate_limit:.0%}, malformed: {args.malformed:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopped. {mock.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Optimizer - Computes a full routing weight vector in one step
+
+Each enabled bank is scored on recent traffic:
+
+    score = success_rate - latency_weight * p95_latency_s
+
+Maximising expected score over traffic shares x (sum x = 1) with per-bank
+bounds min_share <= x <= max_share (max_share is further capped by the share
+of traffic the bank's live concurrency limit can carry, see capacity_shares)
+is a linear program whose optimum is greedy: give every bank its minimum, then
+fill banks in score order up to their maximum.
+
+Shares are turned into integer weights summing to 100 with the largest-
+remainder method, so weights never drift the way repeated int() truncation does.
+
+Configured in shared_config.json under routing_rules.optimizer.
+"""
+
+from typing import Dict, List, Any, Optional
+
+import txn_store
+
+# Defaults for routing_rules.optimizer
+OPTIMIZER_DEFAULTS = {
+    'min_share': 0.02,          # every enabled bank keeps some traffic (keeps stats fresh)
+    'max_share': 0.6,           # no single bank takes more than this
+    'latency_weight': 0.1,      # SR points traded per second of p95 latency
+    'window_minutes': 15,
+    'prior_samples': 5,         # pseudo-samples of the configured success_rate
+}
+
+
+def largest_remainder(shares: Dict[str, float], total: int = 100) -> Dict[str, int]:
+    """
+    Round shares to integers that sum exactly to `total`.
+
+    Each key gets floor(share * total); the leftover units go to the keys with
+    the largest fractional remainders (ties broken by larger share).
+    """
+    share_sum = sum(shares.values())
+    if not shares or share_sum <= 0:
+        return {k: 0 for k in shares}
+    exact = {k: v / share_sum * total for k, v in shares.items()}
+    result = {k: int(v) for k, v in exact.items()}
+    leftover = total - sum(result.values())
+    order = sorted(exact, key=lambda k: (exact[k] - result[k], exact[k]), reverse=True)
+    for k in order[:leftover]:
+        result[k] += 1
+    return result
+
+
+def solve_shares(scores: Dict[str, float], min_share: Dict[str, float],
+                 max_share: Dict[str, float]) -> Dict[str, float]:
+    """
+    Maximise sum(score * x) subject to sum(x) = 1 and min <= x <= max.
+
+    Infeasible bounds are relaxed: minimums are scaled down if they exceed 1,
+    and if the maximums cannot absorb all traffic the remainder is spread over
+    the banks in proportion to their maximums, so every bank overshoots its cap
+    by the same factor rather than the best one taking all of the overflow.
+    """
+    banks = list(scores)
+    if not banks:
+        return {}
+    floor_total = sum(min_share[b] for b in banks)
+    scale = 1.0 / floor_total if floor_total > 1 else 1.0
+    shares = {b: min_share[b] * scale for b in banks}
+    remaining = 1.0 - sum(shares.values())
+
+    ranked = sorted(banks, key=lambda b: scores[b], reverse=True)
+    for b in ranked:
+        if remaining <= 1e-12:
+            break
+        room = max(0.0, max_share[b] - shares[b])
+        take = min(room, remaining)
+        shares[b] += take
+        remaining -= take
+
+    if remaining > 1e-12:
+        # Caps too tight to place all traffic (every bank is at its maximum)
+        cap_total = sum(max_share[b] for b in banks)
+        for b in banks:
+            shares[b] += remaining * (max_share[b] / cap_total if cap_total > 0 else 1.0 / len(banks))
+    return shares
+
+
+def capacity_shares(limits: Dict[str, float], stats: Dict[str, Dict[str, float]],
+                    window_minutes: float) -> Dict[str, float]:
+    """
+    Largest share of current traffic each bank's concurrency limit can carry.
+
+    By Little's law a bank holding at most `limit` payments in flight, each
+    taking latency_s, completes at most limit / latency_s payments per second.
+    Divided by the total offered rate (recent samples over the window) that is
+    the share of traffic the bank can take before payments queue on it. p95
+    latency is used so the cap holds for the slow tail too.
+
+    Returns:
+        {bank_id: max share} ({} when there is no recent traffic to size against)
+    """
+    rate = sum(s.get('samples', 0) for s in stats.values()) / (window_minutes * 60.0)
+    if rate <= 0:
+        return {}
+    caps = {}
+    for bank_id, limit in limits.items():
+        latency_s = max(stats.get(bank_id, {}).get('p95_ms') or 0, 1.0) / 1000.0
+        caps[bank_id] = limit / latency_s / rate
+    return caps
+
+
+def bank_stats(banks: List[Dict[str, Any]], window_minutes: float = 15,
+               prior_samples: float = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Success rate and p95 latency per bank id over the recent window.
+
+    The success rate is smoothed toward the bank's configured success_rate with
+    `prior_samples` pseudo-observations so a bank with little traffic is not
+    judged on two transactions. Banks with no samples fall back to config.
+    """
+    by_name = {}
+    for txn in txn_store.query_transactions(since_minutes=window_minutes):
+        by_name.setdefault(txn.get('bank'), []).append(txn)
+
+    stats = {}
+    for bank in banks:
+        config_sr = bank.get('metrics', {}).get('success_rate', 0.95)
+        config_latency = bank.get('metrics', {}).get('avg_latency_ms', 150)
+        txns = by_name.get(bank.get('name'), [])
+        successes = sum(1 for t in txns if t.get('status') == 'Success')
+        latencies = sorted(float(t.get('latency_ms') or 0) for t in txns)
+        stats[bank['id']] = {
+            'samples': len(txns),
+            'success_rate': (successes + prior_samples * config_sr) / (len(txns) + prior_samples),
+            'p95_ms': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else config_latency,
+        }
+    return stats
+
+
+def optimize(banks: List[Dict[str, Any]], rules: Dict[str, Any] = None,
+             stats: Dict[str, Dict[str, float]] = None,
+             capacity: Optional[Dict[str, float]] = None,
+             concurrency_limits: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Compute the optimal integer weight vector for the enabled banks.
+
+    Args:
+        banks: Bank configs (disabled or down banks get weight 0)
+        rules: routing_rules.optimizer overrides
+        stats: Per-bank {'success_rate', 'p95_ms'} (read from the store if omitted)
+        capacity: Optional per-bank max traffic share
+        concurrency_limits: Optional live per-bank in-flight limits, turned into
+                            max shares with capacity_shares() (ignored if
+                            `capacity` is given)
+
+    Returns:
+        {'weights': {id: int}, 'shares': {id: float}, 'scores': {id: float}, 'stats': ...}
+    """
+    rules = dict(OPTIMIZER_DEFAULTS, **(rules or {}))
+    eligible = [b for b in banks if b.get('enabled', True) and b.get('health_status') != 'down']
+    if stats is None:
+        stats = bank_stats(eligible, rules['window_minutes'], rules['prior_samples'])
+    if capacity is None and concurrency_limits:
+        capacity = capacity_shares(concurrency_limits, stats, rules['window_minutes'])
+    capacity = capacity or {}
+
+    scores, lower, upper = {}, {}, {}
+    for b in eligible:
+        s = stats.get(b['id'], {})
+        sr = s.get('success_rate', b.get('metrics', {}).get('success_rate', 0.95))
+        p95 = s.get('p95_ms', b.get('metrics', {}).get('avg_latency_ms', 150))
+        scores[b['id']] = sr - rules['latency_weight'] * p95 / 1000.0
+        upper[b['id']] = min(rules['max_share'], capacity.get(b['id'], 1.0))
+        lower[b['id']] = min(rules['min_share'], upper[b['id']])
+
+    shares = solve_shares(scores, lower, upper)
+    weights = {b['id']: 0 for b in banks}
+    weights.update(largest_remainder(shares))
+    return {
+        'weights': weights,
+        'shares': {k: round(v, 4) for k, v in shares.items()},
+        'scores': {k: round(v, 4) for k, v in scores.items()},
+        'stats': stats,
+    }
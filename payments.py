@@ -0,0 +1,246 @@
+"""
+Payments - Background payment execution for the checkout page
+
+A shopper's click submits the payment to a process-wide thread pool and gets
+a handle (the txn_id) back at once; the page then polls status(handle) while
+the payment runs through the same path the simulator models:
+
+1. the router admits the shopper's bank (Router.acquire); if its breaker is
+   open or it is at its limit the payment fails with BANK_UNAVAILABLE or
+   BANK_BUSY instead of being moved to a bank the shopper did not pick
+2. Hedger.execute sends a hedge leg to the next-best bank if the primary is
+   slower than its latency percentile
+3. each leg runs under the bank's retry policy (retries.RetryExecutor), and
+   every attempt is fed back to the router's breakers/limiters
+
+The finished transaction is written to the transaction store by the worker,
+so it is logged even if the shopper closes the page.
+
+Configured in shared_config.json under global_config.checkout.
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import hedging
+import retries
+import routing
+import txn_store
+
+CONFIG_FILE = "shared_config.json"
+
+# Defaults for global_config.checkout
+CHECKOUT_DEFAULTS = {
+    'workers': 64,          # payments in flight at once; more are queued
+    'keep_seconds': 600,    # finished payments stay pollable this long
+}
+
+# Bank call duration (seconds) and failure rate by health status
+BANK_MODEL = {
+    'down': (3.0, 1.0, 'TIMEOUT_ERROR'),
+    'degraded': (2.0, 0.3, 'TIMEOUT'),
+    'healthy': (1.0, 0.05, 'GATEWAY_ERROR'),
+}
+
+
+def _rules() -> Dict[str, Any]:
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            custom = json.load(f).get('global_config', {}).get('checkout', {})
+    except Exception:
+        custom = {}
+    return dict(CHECKOUT_DEFAULTS, **custom)
+
+
+def _new_txn_id() -> str:
+    return f"txn_{int(time.time() * 1000)}_{random.randint(1000, 9999)}"
+
+
+def bank_attempt(bank: Dict[str, Any], latency_scale: float = 1.0,
+                 rng: random.Random = random) -> Dict[str, Any]:
+    """
+    Live bank model: block for the bank's call duration, then succeed or fail.
+
+    Args:
+        bank: Bank config (health_status picks the model)
+        latency_scale: Multiplier on the call duration (benchmarks shrink it)
+        rng: Random source for the outcome
+
+    Returns:
+        {'status', 'latency_ms', 'error_code'} for one attempt
+    """
+    seconds, failure_rate, error_code = BANK_MODEL.get(
+        bank.get('health_status', 'healthy').lower(), BANK_MODEL['healthy'])
+    start = time.monotonic()
+    time.sleep(seconds * latency_scale)
+    failed = rng.random() < failure_rate
+    return {
+        'status': 'Fail' if failed else 'Success',
+        'latency_ms': int((time.monotonic() - start) * 1000),
+        'error_code': error_code if failed else ''
+    }
+
+
+class PaymentProcessor:
+    """Runs checkout payments on a thread pool and keeps their status for polling."""
+
+    def __init__(self, router: routing.Router = None, workers: int = None, latency_scale: float = 1.0,
+                 store: txn_store.TransactionStore = None):
+        """
+        Args:
+            router: Router to admit and record payments (the process-wide one by default)
+            workers: Concurrent payments (global_config.checkout.workers by default)
+            latency_scale: Multiplier on simulated bank call durations
+            store: Transaction store finished payments are written to (None = configured store)
+        """
+        rules = _rules()
+        self.router = router or routing.get_router()
+        self.workers = int(workers or rules['workers'])
+        self.keep_seconds = rules['keep_seconds']
+        self.latency_scale = latency_scale
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='payment')
+        self.retry_executor = retries.RetryExecutor(
+            sleep=lambda seconds: time.sleep(seconds * latency_scale),
+            is_available=self.router.is_available
+        )
+        # Each payment waits on at most two legs
+        self.hedger = hedging.Hedger(self.router, max_workers=2 * self.workers)
+        self.router.metrics_providers['retries'] = self.retry_executor.metrics
+        self.router.metrics_providers['hedging'] = self.hedger.metrics
+        self.lock = threading.Lock()
+        self.payments: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'submitted': 0, 'completed': 0, 'succeeded': 0, 'rejected': 0}
+
+    def submit(self, bank_id: str, amount: float, method: str) -> str:
+        """
+        Queue a payment and return its handle without waiting for the bank.
+
+        Args:
+            bank_id: Bank the shopper picked
+            amount: Payment amount
+            method: Payment method (logged and used for hedge policies)
+
+        Returns:
+            Payment handle (the txn_id) for status()
+        """
+        txn_id = _new_txn_id()
+        now = time.monotonic()
+        with self.lock:
+            self._prune(now)
+            self.payments[txn_id] = {'txn_id': txn_id, 'state': 'pending', 'bank_id': bank_id,
+                                     'submitted_at': now, 'result': None}
+            self.stats['submitted'] += 1
+        self.executor.submit(self._run, txn_id, bank_id, amount, method)
+        return txn_id
+
+    def status(self, txn_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Current status of a submitted payment.
+
+        Returns:
+            {'txn_id', 'state': 'pending' | 'done', 'bank_id', 'submitted_at',
+             'result'} (result is the logged transaction once done), or None
+            if the handle is unknown or expired
+        """
+        with self.lock:
+            payment = self.payments.get(txn_id)
+            return dict(payment) if payment else None
+
+    def _prune(self, now: float) -> None:
+        expired = [k for k, p in self.payments.items()
+                   if p['state'] == 'done' and now - p['finished_at'] > self.keep_seconds]
+        for k in expired:
+            del self.payments[k]
+
+    def _run(self, txn_id: str, bank_id: str, amount: float, method: str):
+        try:
+            result = self.process(bank_id, amount, method, txn_id)
+        except Exception as e:
+            print(f"Payment error: {e}")
+            result = {'txn_id': txn_id, 'status': 'Fail', 'error_code': 'INTERNAL_ERROR', 'latency_ms': 0}
+        with self.lock:
+            self.payments[txn_id].update(state='done', result=result, finished_at=time.monotonic())
+            self.stats['completed'] += 1
+            self.stats['succeeded'] += int(result.get('status') == 'Success')
+
+    def process(self, bank_id: str, amount: float, method: str, txn_id: str = None) -> Dict[str, Any]:
+        """
+        Run one payment to completion on the calling thread.
+
+        Returns:
+            The transaction as written to the store ('bank' is the bank that
+            settled it, which may differ from bank_id only after a hedge)
+        """
+        txn_id = txn_id or _new_txn_id()
+        transaction = {
+            'timestamp': datetime.now().isoformat(),
+            'txn_id': txn_id,
+            'amount': amount,
+            'method': method,
+        }
+
+        bank = self.router.acquire(bank_id)
+        if bank is None:
+            # The shopper picked this bank: tell them it can't take the payment
+            # rather than quietly charging them through a different one
+            with self.lock:
+                self.stats['rejected'] += 1
+            requested = self.router.get_bank(bank_id) or {}
+            routable = any(b.get('id') == bank_id for b in self.router.table.items)
+            busy = routable and self.router.is_available(bank_id)
+            transaction.update(bank=requested.get('name', bank_id), status='Fail', latency_ms=0,
+                               error_code='BANK_BUSY' if busy else 'BANK_UNAVAILABLE', retry_count=0)
+            self._write(transaction)
+            return transaction
+
+        routing_rules = self.router.routing_rules
+        self.retry_executor.configure(routing_rules)
+
+        def on_attempt(attempt_bank, attempt_result):
+            self.router.record(attempt_bank.get('id'), attempt_result['status'] == 'Success',
+                               attempt_result['latency_ms'], attempt_result.get('error_code'), method)
+
+        def run_leg(leg_bank):
+            leg = self.retry_executor.execute(leg_bank, lambda b, n: bank_attempt(b, self.latency_scale),
+                                              on_attempt)
+            leg.pop('backoff_ms', None)
+            return leg
+
+        result = self.hedger.execute(txn_id, bank, method, amount, routing_rules, run_leg)
+        transaction['bank'] = result.pop('bank').get('name', 'Unknown')
+        result.pop('bank_id', None)
+        transaction.update(result)
+        self._write(transaction)
+        return transaction
+
+    def _write(self, transaction: Dict[str, Any]):
+        try:
+            (self.store or txn_store.get_store()).append(transaction)
+        except Exception as e:
+            print(f"Error writing transaction: {e}")
+
+    def shutdown(self) -> None:
+        """Wait for queued payments to finish and stop the worker threads."""
+        self.executor.shutdown(wait=True)
+        if self.hedger.executor is not None:
+            self.hedger.executor.shutdown(wait=True)
+
+
+_processor: Optional[PaymentProcessor] = None
+_processor_lock = threading.Lock()
+
+
+def get_processor() -> PaymentProcessor:
+    """Return the process-wide payment processor (shared by every checkout session)."""
+    global _processor
+    if _processor is None:
+        with _processor_lock:
+            if _processor is None:
+                _processor = PaymentProcessor()
+    return _processor
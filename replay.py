@@ -0,0 +1,162 @@
+"""
+Replay - Re-feeds a recorded transaction log into the live store at N× speed
+
+Streams the rows of an existing transactions.csv (e.g. a captured incident)
+into the configured transaction store, keeping the original inter-arrival
+gaps divided by the speed factor, so the dashboard, the agent's observe node
+and sentinel_loop.py see real traffic shapes at 10-100× the recorded rate.
+
+- Timestamps are rewritten to the moment each row is written (default), so
+  time-windowed queries see the replay as live traffic; --keep-timestamps
+  writes them unchanged.
+- --loop starts over when the log ends; txn_ids get a pass suffix so they
+  stay unique.
+- Rows due within the same flush interval are written as one batch; if the
+  store cannot keep up, due rows are written immediately and the lag is
+  reported rather than the schedule being stretched.
+
+Usage:
+    python replay.py incident.csv --speed 20
+    python replay.py incident.csv --speed 50 --loop --duration 600
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import backtest
+import txn_store
+
+
+class Replayer:
+    """Background thread that writes a recorded log into the store on schedule."""
+
+    def __init__(self, rows: List[Dict[str, Any]], speed: float = 1.0, rewrite_timestamps: bool = True,
+                 loop: bool = False, store: txn_store.TransactionStore = None, flush_ms: float = 20.0):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.rows = rows
+        self.speed = speed
+        self.rewrite_timestamps = rewrite_timestamps
+        self.loop = loop
+        self.store = store or txn_store.get_store()
+        self.flush_s = flush_ms / 1000.0
+        self.running = False
+        self.thread = None
+        self.stats = {'written': 0, 'passes': 0, 'max_lag_ms': 0.0, 'started': None}
+
+        # Offsets (recorded seconds since the first row) drive the schedule
+        first = datetime.fromisoformat(rows[0]['timestamp']) if rows else None
+        self.offsets = [(datetime.fromisoformat(r['timestamp']) - first).total_seconds() for r in rows]
+        gaps = [b - a for a, b in zip(self.offsets, self.offsets[1:])]
+        # A looped pass starts one average gap after the previous pass ended
+        self.pass_span = (self.offsets[-1] + (sum(gaps) / len(gaps) if gaps else 1.0)) if rows else 0.0
+
+    def start(self):
+        """Start replaying (no-op if already running)."""
+        if self.running or not self.rows:
+            return
+        self.running = True
+        self.stats['started'] = time.monotonic()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        print(f"✓ Replay started - {len(self.rows):,} rows at {self.speed:g}× into the {self.store.name} store"
+              f"{' (looping)' if self.loop else ''}")
+
+    def stop(self):
+        """Stop replaying."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        print(f"✓ Replay stopped - {self.stats['written']:,} rows written")
+
+    def is_alive(self) -> bool:
+        return bool(self.thread and self.thread.is_alive())
+
+    def rate(self) -> float:
+        """Achieved rows per second since start."""
+        if not self.stats['started']:
+            return 0.0
+        return self.stats['written'] / max(1e-9, time.monotonic() - self.stats['started'])
+
+    def _row(self, row: Dict[str, Any], pass_no: int) -> Dict[str, Any]:
+        out = dict(row)
+        if self.rewrite_timestamps:
+            out['timestamp'] = datetime.now().isoformat()
+        if pass_no:
+            out['txn_id'] = f"{row.get('txn_id', '')}_r{pass_no}"
+        return out
+
+    def _loop(self):
+        start = time.monotonic()
+        pass_no = 0
+        i = 0
+        try:
+            while self.running:
+                if i >= len(self.rows):
+                    self.stats['passes'] += 1
+                    if not self.loop:
+                        break
+                    pass_no += 1
+                    i = 0
+
+                base = start + pass_no * self.pass_span / self.speed
+                due_at = base + self.offsets[i] / self.speed
+                now = time.monotonic()
+                if due_at > now:
+                    time.sleep(min(due_at - now, 0.5))
+                    continue
+
+                # Everything due now (plus the next flush interval) goes in one write
+                horizon = now + self.flush_s
+                batch = []
+                while i < len(self.rows) and base + self.offsets[i] / self.speed <= horizon:
+                    batch.append(self._row(self.rows[i], pass_no))
+                    i += 1
+                self.stats['max_lag_ms'] = max(self.stats['max_lag_ms'], (now - due_at) * 1000)
+                self.stats['written'] += self.store.append_many(batch)
+        except Exception as e:
+            print(f"Replay error: {e}")
+        finally:
+            self.running = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded transaction log into the live store")
+    parser.add_argument('path', help='Recorded transactions CSV')
+    parser.add_argument('--speed', type=float, default=10.0, help='Speed-up factor (10 = ten times real rate)')
+    parser.add_argument('--loop', action='store_true', help='Start over when the log ends')
+    parser.add_argument('--keep-timestamps', action='store_true', help='Write original timestamps')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+    parser.add_argument('--flush-ms', type=float, default=20.0, help='Batch rows due within this window')
+    args = parser.parse_args()
+
+    store = txn_store.get_store()
+    if isinstance(store, txn_store.CsvStore) and os.path.abspath(store.path) == os.path.abspath(args.path):
+        print(f"❌ {args.path} is the live log itself; replay a copy of it")
+        return
+
+    rows = backtest.load_log(args.path)
+    if not rows:
+        print(f"❌ No rows in {args.path}")
+        return
+
+    replayer = Replayer(rows, args.speed, not args.keep_timestamps, args.loop, store, args.flush_ms)
+    deadline: Optional[float] = time.monotonic() + args.duration if args.duration else None
+    try:
+        replayer.start()
+        while replayer.is_alive() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(min(5.0, max(0.1, deadline - time.monotonic())) if deadline else 5.0)
+            print(f"  ▶ {replayer.stats['written']:,} rows | {replayer.rate():,.1f} rows/s | "
+                  f"pass {replayer.stats['passes'] + 1} | max lag {replayer.stats['max_lag_ms']:.0f}ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        replayer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Retries - Retry executor that enforces each bank's retry_policy
+
+Applies `retry_policy.max_retries` / `backoff_ms` from shared_config.json with
+exponential backoff and full jitter, and caps retries globally with a retry
+budget (retries may be at most `ratio` of recent traffic) so retries cannot
+amplify load during an outage.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Optional
+
+# Defaults for routing_rules.retry_budget
+BUDGET_DEFAULTS = {
+    'ratio': 0.2,             # retries allowed per request in the window
+    'min_retries_per_sec': 0.5,  # floor so low traffic can still retry
+    'window_seconds': 10,
+}
+
+# Only transient failures are worth retrying
+RETRYABLE_ERRORS = {'TIMEOUT', 'GATEWAY_ERROR', 'TIMEOUT_ERROR'}
+
+MAX_BACKOFF_MS = 10000
+
+
+class RetryBudget:
+    """Sliding-window retry budget shared by all banks in a process."""
+
+    def __init__(self, ratio: float = 0.2, min_retries_per_sec: float = 0.5, window_seconds: float = 10):
+        self.ratio = ratio
+        self.min_retries_per_sec = min_retries_per_sec
+        self.window_seconds = window_seconds
+        self.requests = deque()
+        self.retries = deque()
+        self.lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        for events in (self.requests, self.retries):
+            while events and now - events[0] > self.window_seconds:
+                events.popleft()
+
+    def record_request(self, now: float = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.requests.append(now)
+            self._expire(now)
+
+    def try_acquire(self, now: float = None) -> bool:
+        """Take one retry from the budget. False if the budget is exhausted."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self._expire(now)
+            allowed = self.ratio * len(self.requests) + self.min_retries_per_sec * self.window_seconds
+            if len(self.retries) >= allowed:
+                return False
+            self.retries.append(now)
+            return True
+
+
+class RetryExecutor:
+    """Runs a payment attempt function under a bank's retry policy."""
+
+    def __init__(self, budget: RetryBudget = None, rng: random.Random = None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 is_available: Callable[[str], bool] = None):
+        """
+        Args:
+            budget: Shared retry budget (a default one is created if omitted)
+            rng: Random source for jitter
+            sleep: Called with the backoff in seconds (the simulator passes a
+                   virtual sleep that adds to latency instead of blocking)
+            is_available: Optional bank_id -> bool check (e.g. circuit breaker);
+                          retries stop once it returns False
+        """
+        self.budget = budget or RetryBudget()
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+        self.is_available = is_available
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'attempts': 0, 'retries': 0, 'budget_exhausted': 0}
+
+    def configure(self, routing_rules: Dict[str, Any]) -> None:
+        """Apply routing_rules.retry_budget."""
+        rules = dict(BUDGET_DEFAULTS, **routing_rules.get('retry_budget', {}))
+        self.budget.ratio = rules['ratio']
+        self.budget.min_retries_per_sec = rules['min_retries_per_sec']
+        self.budget.window_seconds = rules['window_seconds']
+
+    def backoff_ms(self, policy: Dict[str, Any], retry_number: int) -> float:
+        """Exponential backoff with full jitter: uniform(0, base * 2^n), capped."""
+        base = policy.get('backoff_ms', 1000)
+        return self.rng.uniform(0, min(MAX_BACKOFF_MS, base * (2 ** retry_number)))
+
+    def execute(self, bank: Dict[str, Any], attempt: Callable[[Dict[str, Any], int], Dict[str, Any]],
+                on_attempt: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Run `attempt(bank, attempt_number)` until it succeeds, fails with a
+        non-retryable error, or the policy/budget says stop.
+
+        Each attempt result is a dict with at least 'status' and 'error_code'.
+
+        Returns:
+            The final attempt result with 'retry_count' and 'backoff_ms'
+            (total backoff waited) added.
+        """
+        policy = bank.get('retry_policy', {})
+        max_retries = int(policy.get('max_retries', 0))
+        self.budget.record_request()
+
+        retries = 0
+        total_backoff = 0.0
+        while True:
+            result = attempt(bank, retries)
+            with self.lock:
+                self.stats['attempts'] += 1
+            if on_attempt:
+                on_attempt(bank, result)
+
+            if result.get('status') == 'Success' or result.get('error_code') not in RETRYABLE_ERRORS:
+                break
+            if retries >= max_retries:
+                break
+            if self.is_available and not self.is_available(bank.get('id')):
+                break
+            if not self.budget.try_acquire():
+                with self.lock:
+                    self.stats['budget_exhausted'] += 1
+                break
+
+            delay = self.backoff_ms(policy, retries)
+            total_backoff += delay
+            self.sleep(delay / 1000.0)
+            retries += 1
+
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['retries'] += retries
+
+        result = dict(result)
+        result['retry_count'] = retries
+        result['backoff_ms'] = int(total_backoff)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Attempts per request (retry amplification) and budget exhaustion count."""
+        with self.lock:
+            stats = dict(self.stats)
+        stats['amplification'] = stats['attempts'] / stats['requests'] if stats['requests'] else 1.0
+        return stats
+
+
+def amplification(transactions) -> float:
+    """Retry amplification factor of logged transactions: attempts / requests."""
+    if not transactions:
+        return 1.0
+    attempts = 0
+    for t in transactions:
+        try:
+            attempts += 1 + int(float(t.get('retry_count') or 0))
+        except (TypeError, ValueError):
+            attempts += 1
+    return attempts / len(transactions)
@@ -0,0 +1,363 @@
+"""
+Rollups - Pre-aggregated per-minute transaction store
+
+Materializes the transaction log (see txn_store) into per-minute, per-bank,
+per-method rollups in SQLite (WAL mode) so historical dashboard views never
+re-read the raw log.
+
+Tables:
+- rollup_minute: counts, failures, latency sum/max and a latency histogram sketch
+- rollup_errors: failure counts by error code
+- rollup_state:  ingestion cursor into the transaction store
+
+Run standalone with `python rollups.py` or start `rollup_job` from the dashboard.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+import txn_store
+
+ROLLUP_DB = "rollups.db"
+
+# Latency histogram bucket upper bounds (ms). Last bucket is open-ended.
+LATENCY_BUCKETS = [25, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 600, 800, 1000, 1500, 2000, 3000, 5000]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_minute (
+    minute TEXT NOT NULL,
+    bank TEXT NOT NULL,
+    method TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    success INTEGER NOT NULL,
+    fail INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    latency_max REAL NOT NULL,
+    latency_hist TEXT NOT NULL,
+    PRIMARY KEY (minute, bank, method)
+);
+CREATE TABLE IF NOT EXISTS rollup_errors (
+    minute TEXT NOT NULL,
+    bank TEXT NOT NULL,
+    error_code TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (minute, bank, error_code)
+);
+CREATE TABLE IF NOT EXISTS rollup_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def connect(db_path: str = ROLLUP_DB) -> sqlite3.Connection:
+    """Open the rollup database in WAL mode so readers never block the writer."""
+    conn = sqlite3.connect(db_path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _bucket_index(latency: float) -> int:
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if latency <= bound:
+            return i
+    return len(LATENCY_BUCKETS)
+
+
+def histogram_quantile(hist: List[int], q: float) -> float:
+    """Estimate a latency quantile (0-1) from a histogram sketch."""
+    total = sum(hist)
+    if total == 0:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for i, c in enumerate(hist):
+        seen += c
+        if seen >= rank:
+            return float(LATENCY_BUCKETS[i]) if i < len(LATENCY_BUCKETS) else float(LATENCY_BUCKETS[-1])
+    return float(LATENCY_BUCKETS[-1])
+
+
+def _minute_key(timestamp: str) -> Optional[str]:
+    """Truncate an ISO timestamp to its minute ('YYYY-MM-DDTHH:MM')."""
+    if not timestamp or len(timestamp) < 16:
+        return None
+    return timestamp[:16]
+
+
+def aggregate_rows(rows: List[Dict[str, Any]]) -> Tuple[Dict[tuple, Dict[str, Any]], Dict[tuple, int]]:
+    """Aggregate raw transaction rows into minute/bank/method and error-code buckets."""
+    minutes = {}
+    errors = {}
+    for row in rows:
+        minute = _minute_key(row.get('timestamp', ''))
+        if not minute:
+            continue
+        try:
+            latency = float(row.get('latency_ms') or 0)
+        except (TypeError, ValueError):
+            latency = 0.0
+        bank = row.get('bank') or 'Unknown'
+        method = row.get('method') or 'Unknown'
+
+        key = (minute, bank, method)
+        agg = minutes.get(key)
+        if agg is None:
+            agg = minutes[key] = {
+                'count': 0, 'success': 0, 'fail': 0,
+                'latency_sum': 0.0, 'latency_max': 0.0,
+                'latency_hist': [0] * (len(LATENCY_BUCKETS) + 1)
+            }
+        agg['count'] += 1
+        agg['latency_sum'] += latency
+        agg['latency_max'] = max(agg['latency_max'], latency)
+        agg['latency_hist'][_bucket_index(latency)] += 1
+
+        if row.get('status') == 'Success':
+            agg['success'] += 1
+        else:
+            agg['fail'] += 1
+            ekey = (minute, bank, row.get('error_code') or 'UNKNOWN')
+            errors[ekey] = errors.get(ekey, 0) + 1
+    return minutes, errors
+
+
+def merge_into_db(conn: sqlite3.Connection, minutes: Dict[tuple, Dict[str, Any]], errors: Dict[tuple, int]) -> None:
+    """Merge aggregated buckets into the rollup tables (single transaction)."""
+    for (minute, bank, method), agg in minutes.items():
+        existing = conn.execute(
+            "SELECT count, success, fail, latency_sum, latency_max, latency_hist "
+            "FROM rollup_minute WHERE minute=? AND bank=? AND method=?",
+            (minute, bank, method)
+        ).fetchone()
+        if existing:
+            hist = json.loads(existing[5])
+            hist = [a + b for a, b in zip(hist, agg['latency_hist'])]
+            values = (
+                existing[0] + agg['count'], existing[1] + agg['success'], existing[2] + agg['fail'],
+                existing[3] + agg['latency_sum'], max(existing[4], agg['latency_max']), json.dumps(hist)
+            )
+        else:
+            values = (
+                agg['count'], agg['success'], agg['fail'],
+                agg['latency_sum'], agg['latency_max'], json.dumps(agg['latency_hist'])
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO rollup_minute "
+            "(minute, bank, method, count, success, fail, latency_sum, latency_max, latency_hist) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (minute, bank, method) + values
+        )
+
+    for (minute, bank, error_code), count in errors.items():
+        conn.execute(
+            "INSERT INTO rollup_errors (minute, bank, error_code, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(minute, bank, error_code) DO UPDATE SET count = count + excluded.count",
+            (minute, bank, error_code, count)
+        )
+
+
+def _get_state(conn: sqlite3.Connection, key: str, default: str = '') -> str:
+    row = conn.execute("SELECT value FROM rollup_state WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_state(conn: sqlite3.Connection, key: str, value: str) -> None:
+    conn.execute("INSERT OR REPLACE INTO rollup_state (key, value) VALUES (?, ?)", (key, value))
+
+
+def ingest_once(db_path: str = ROLLUP_DB, max_rows: int = 100000, store=None) -> int:
+    """
+    Ingest rows appended to the transaction store since the last run.
+
+    The store's change cursor (byte offset for CSV, rowid for SQLite) is kept
+    in rollup_state and committed in the same transaction as the merged
+    buckets, so a crash never double-counts.
+
+    Returns:
+        Number of rows ingested
+    """
+    store = store or txn_store.get_store()
+    conn = connect(db_path)
+    try:
+        cursor_key = f'cursor:{store.name}'
+        cursor = _get_state(conn, cursor_key, '')
+        rows, new_cursor = store.changes_since(cursor, max_rows)
+        if new_cursor == cursor:
+            return 0
+
+        minutes, errors = aggregate_rows(rows)
+        with conn:
+            merge_into_db(conn, minutes, errors)
+            _set_state(conn, cursor_key, new_cursor)
+        return len(rows)
+    finally:
+        conn.close()
+
+
+class RollupJob:
+    """Background thread that keeps the rollup store up to date."""
+
+    def __init__(self, interval_seconds: float = 5.0):
+        self.running = False
+        self.interval_seconds = interval_seconds
+        self.thread = None
+        self.db_path = ROLLUP_DB
+
+    def start(self):
+        """Start periodic ingestion (no-op if already running)."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        print(f"✓ Rollup job started - every {self.interval_seconds:.0f}s")
+
+    def stop(self):
+        """Stop periodic ingestion."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        print("✓ Rollup job stopped")
+
+    def _loop(self):
+        while self.running:
+            try:
+                # Drain any backlog before sleeping
+                while ingest_once(self.db_path) > 0 and self.running:
+                    pass
+            except Exception as e:
+                print(f"Rollup error: {e}")
+            time.sleep(self.interval_seconds)
+
+
+# ==================== QUERIES ====================
+
+def _since(minutes: int) -> str:
+    return (datetime.now() - timedelta(minutes=minutes)).strftime('%Y-%m-%dT%H:%M')
+
+
+def _bucket_expr(bucket_minutes: int) -> str:
+    """SQL expression truncating `minute` to a bucket of N minutes."""
+    if bucket_minutes <= 1:
+        return "minute"
+    seconds = bucket_minutes * 60
+    return (f"strftime('%Y-%m-%dT%H:%M', "
+            f"(CAST(strftime('%s', minute) AS INTEGER) / {seconds}) * {seconds}, 'unixepoch')")
+
+
+def bank_time_heatmap(since_minutes: int = 1440, bucket_minutes: int = 15,
+                      db_path: str = ROLLUP_DB) -> Dict[str, Any]:
+    """
+    Success rate and average latency per bank per time bucket.
+
+    Returns:
+        {'buckets': [...], 'banks': [...], 'success_rate': {bank: [..]}, 'avg_latency': {bank: [..]},
+         'count': {bank: [..]}}
+    """
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            f"SELECT {_bucket_expr(bucket_minutes)} AS bucket, bank, "
+            f"SUM(count), SUM(success), SUM(latency_sum) "
+            f"FROM rollup_minute WHERE minute >= ? GROUP BY bucket, bank ORDER BY bucket",
+            (_since(since_minutes),)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    buckets = sorted({r[0] for r in rows})
+    banks = sorted({r[1] for r in rows})
+    pos = {b: i for i, b in enumerate(buckets)}
+    result = {
+        'buckets': buckets,
+        'banks': banks,
+        'success_rate': {b: [None] * len(buckets) for b in banks},
+        'avg_latency': {b: [None] * len(buckets) for b in banks},
+        'count': {b: [0] * len(buckets) for b in banks},
+    }
+    for bucket, bank, count, success, latency_sum in rows:
+        i = pos[bucket]
+        result['count'][bank][i] = count
+        if count:
+            result['success_rate'][bank][i] = success / count
+            result['avg_latency'][bank][i] = latency_sum / count
+    return result
+
+
+def error_code_trends(since_minutes: int = 1440, bucket_minutes: int = 60,
+                      bank: str = None, db_path: str = ROLLUP_DB) -> Dict[str, Any]:
+    """
+    Failure counts by error code per time bucket.
+
+    Returns:
+        {'buckets': [...], 'series': {error_code: [counts aligned to buckets]}}
+    """
+    sql = (f"SELECT {_bucket_expr(bucket_minutes)} AS bucket, error_code, SUM(count) "
+           f"FROM rollup_errors WHERE minute >= ?")
+    params = [_since(since_minutes)]
+    if bank:
+        sql += " AND bank = ?"
+        params.append(bank)
+    sql += " GROUP BY bucket, error_code ORDER BY bucket"
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    buckets = sorted({r[0] for r in rows})
+    pos = {b: i for i, b in enumerate(buckets)}
+    series = {}
+    for bucket, code, count in rows:
+        series.setdefault(code, [0] * len(buckets))[pos[bucket]] = count
+    return {'buckets': buckets, 'series': series}
+
+
+def latency_percentiles(since_minutes: int = 60, db_path: str = ROLLUP_DB) -> Dict[str, Dict[str, float]]:
+    """Per-bank p50/p95/p99 latency estimated from merged histogram sketches."""
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT bank, latency_hist FROM rollup_minute WHERE minute >= ?",
+            (_since(since_minutes),)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    merged = {}
+    for bank, hist_json in rows:
+        hist = json.loads(hist_json)
+        acc = merged.setdefault(bank, [0] * len(hist))
+        for i, c in enumerate(hist):
+            acc[i] += c
+    return {
+        bank: {
+            'p50': histogram_quantile(hist, 0.50),
+            'p95': histogram_quantile(hist, 0.95),
+            'p99': histogram_quantile(hist, 0.99),
+        }
+        for bank, hist in merged.items()
+    }
+
+
+# Global rollup job instance
+rollup_job = RollupJob()
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Rollup Service...")
+    print("Press Ctrl+C to stop.")
+    try:
+        rollup_job.start()
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        rollup_job.stop()
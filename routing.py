@@ -0,0 +1,849 @@
+"""
+Routing - Shared bank selection engine
+
+One Router is used by the simulator and the checkout so both pick banks the
+same way. Enabled banks and their weights from shared_config.json are compiled
+into a Walker alias table once per config version (file mtime/size), and
+route() draws a bank in O(1).
+
+routing_rules.strategy selects how the draw is used:
+    "weighted":  the alias-table sample is the bank (default)
+    "p2c_ewma":  power of two choices - draw two banks from the alias table and
+                 send to the one with the lower live cost, EWMA latency x
+                 (1 + inflight_weight x in-flight). Tuned via routing_rules.p2c.
+    "thompson":  Thompson-sampling bandit over per-bank (and per-method) success
+                 posteriors with a latency penalty; see bandit.py.
+
+Each bank also has an in-process circuit breaker fed by record() after every
+transaction. An open breaker removes the bank from routing immediately; its
+state is persisted to the bank's `circuit_breaker` block every few seconds so
+other processes (and the agent) see it.
+
+Banks also get an adaptive in-flight limit (AIMD): it grows while latency stays
+near the bank's baseline and shrinks multiplicatively on timeouts or latency
+spikes. route() spills over to other banks when the sampled one is full, and
+total in-flight requests are capped by global_config.max_concurrent_requests.
+
+Live routing metrics (breakers, concurrency, retries, hedging, ...) are published per
+process to routing_metrics.json on the same cadence; see read_metrics().
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence, Callable
+
+import bandit
+import config_lock
+
+CONFIG_FILE = "shared_config.json"
+METRICS_FILE = "routing_metrics.json"
+
+DEFAULT_BANK = {
+    'id': 'hdfc',
+    'name': 'HDFC Bank',
+    'weight': 100,
+    'health_status': 'healthy',
+    'metrics': {'success_rate': 0.95, 'avg_latency_ms': 150}
+}
+
+# Defaults for routing_rules.circuit_breaker
+BREAKER_DEFAULTS = {
+    'window_seconds': 30,
+    'failure_rate_threshold': 0.5,
+    'cooldown_seconds': 15,
+    'half_open_max_probes': 3,
+    'probe_successes': 2,
+    'persist_interval_seconds': 5,
+}
+
+# Defaults for routing_rules.concurrency (max_limit comes from
+# global_config.max_concurrent_requests)
+CONCURRENCY_DEFAULTS = {
+    'enabled': True,
+    'initial_limit': 20,
+    'min_limit': 1,
+    'backoff_ratio': 0.7,          # multiplicative decrease
+    'latency_tolerance': 2.0,      # short-term latency above tolerance x baseline = congestion
+    'baseline_alpha': 0.01,        # how fast the baseline accepts a new normal
+    'decrease_cooldown_seconds': 1.0,
+}
+
+TIMEOUT_ERRORS = {'TIMEOUT', 'TIMEOUT_ERROR'}
+
+STRATEGIES = ('weighted', 'p2c_ewma', 'thompson')
+
+# Defaults for routing_rules.p2c
+P2C_DEFAULTS = {
+    'ewma_alpha': 0.3,            # weight of the newest latency sample
+    'failure_penalty_ms': 1000,   # failed attempts count as at least this slow
+    'inflight_weight': 1.0,       # cost multiplier per request in flight
+}
+
+
+class AliasTable:
+    """Walker/Vose alias table for O(1) weighted sampling."""
+
+    def __init__(self, items: Sequence[Any], weights: Sequence[float]):
+        n = len(items)
+        if n == 0:
+            raise ValueError("AliasTable needs at least one item")
+        total = float(sum(weights))
+        if total <= 0:
+            weights = [1.0] * n
+            total = float(n)
+
+        self.items = list(items)
+        self.weights = list(weights)
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def sample(self, rng=random) -> Any:
+        """Draw one item."""
+        i = int(rng.random() * len(self.items))
+        return self.items[i] if rng.random() < self.prob[i] else self.items[self.alias[i]]
+
+
+class CircuitBreaker:
+    """
+    Per-bank circuit breaker.
+
+    closed:    traffic flows; trips to open when failures within the sliding
+               window reach failure_threshold and make up at least
+               failure_rate_threshold of the window's requests.
+    open:      no traffic; moves to half_open after cooldown_seconds.
+    half_open: at most half_open_max_probes probe requests in flight; closes
+               after probe_successes successes, re-opens on any failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, window_seconds: float = 30,
+                 failure_rate_threshold: float = 0.5, cooldown_seconds: float = 15,
+                 half_open_max_probes: int = 3, probe_successes: int = 2):
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.failure_rate_threshold = failure_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_max_probes = half_open_max_probes
+        self.probe_successes = probe_successes
+
+        self.state = 'closed'
+        self.failures = deque()  # monotonic timestamps of failures in the window
+        self.requests = deque()  # monotonic timestamps of all outcomes in the window
+        self.opened_at = 0.0
+        self.last_failure_time = None  # ISO wall-clock time, for persistence
+        self.probes_in_flight = 0
+        self.probe_success_count = 0
+        self.generation = 0  # bumped on every transition; probe slots belong to one half-open period
+
+    def _expire(self, now: float) -> None:
+        for events in (self.failures, self.requests):
+            while events and now - events[0] > self.window_seconds:
+                events.popleft()
+
+    def _transition(self, state: str, now: float) -> None:
+        self.state = state
+        self.generation += 1
+        self.probes_in_flight = 0
+        self.probe_success_count = 0
+        if state == 'open':
+            self.opened_at = now
+        elif state == 'closed':
+            self.failures.clear()
+            self.requests.clear()
+
+    def current_state(self, now: float = None) -> str:
+        """State after applying the open -> half_open cooldown."""
+        now = time.monotonic() if now is None else now
+        if self.state == 'open' and now - self.opened_at >= self.cooldown_seconds:
+            self._transition('half_open', now)
+        return self.state
+
+    def allow_request(self, now: float = None) -> bool:
+        """Whether a request may be sent now. Reserves a probe slot when half-open."""
+        state = self.current_state(now)
+        if state == 'closed':
+            return True
+        if state == 'half_open' and self.probes_in_flight < self.half_open_max_probes:
+            self.probes_in_flight += 1
+            return True
+        return False
+
+    def is_available(self, now: float = None) -> bool:
+        """Like allow_request() but without reserving a probe slot."""
+        state = self.current_state(now)
+        return state == 'closed' or (state == 'half_open' and self.probes_in_flight < self.half_open_max_probes)
+
+    def cancel_probe(self, generation: int) -> None:
+        """Give back a probe slot reserved in half-open period `generation` that never recorded an outcome."""
+        if self.state == 'half_open' and self.generation == generation:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+
+    def record(self, success: bool, now: float = None) -> None:
+        """Feed one transaction outcome into the state machine."""
+        now = time.monotonic() if now is None else now
+        state = self.current_state(now)
+
+        if not success:
+            self.last_failure_time = datetime.now().isoformat()
+
+        if state == 'half_open':
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if not success:
+                self._transition('open', now)
+            else:
+                self.probe_success_count += 1
+                if self.probe_success_count >= self.probe_successes:
+                    self._transition('closed', now)
+            return
+
+        if state == 'closed':
+            self.requests.append(now)
+            if not success:
+                self.failures.append(now)
+            self._expire(now)
+            if (not success and len(self.failures) >= self.failure_threshold
+                    and len(self.failures) >= self.failure_rate_threshold * len(self.requests)):
+                self._transition('open', now)
+
+    def force(self, state: str, now: float = None) -> None:
+        """Apply an externally set state (e.g. update_bank_health or another process)."""
+        now = time.monotonic() if now is None else now
+        if state in ('closed', 'open', 'half_open') and state != self.state:
+            self._transition(state, now)
+
+    @property
+    def failure_count(self) -> int:
+        self._expire(time.monotonic())
+        return len(self.failures)
+
+
+class ConcurrencyLimiter:
+    """
+    Adaptive per-bank in-flight limit (additive increase, multiplicative decrease).
+
+    A slow EWMA of latency is the bank's baseline and a fast EWMA tracks what it
+    is doing right now. Each good sample grows the limit by 1/limit (about +1
+    per limit's worth of requests); a timeout, or fast latency above
+    latency_tolerance x baseline, multiplies it by backoff_ratio (at most once
+    per decrease_cooldown_seconds so one spike is one decrease).
+    """
+
+    def __init__(self, baseline_ms: float = None, initial_limit: int = 20, min_limit: int = 1,
+                 max_limit: int = 100, backoff_ratio: float = 0.7, latency_tolerance: float = 2.0,
+                 baseline_alpha: float = 0.01, decrease_cooldown_seconds: float = 1.0,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.baseline_alpha = baseline_alpha
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+
+        self.limit = float(min(initial_limit, max_limit))
+        self.inflight = 0
+        self.baseline_ms = baseline_ms
+        self.recent_ms = baseline_ms
+        self._last_decrease = 0.0
+        self.stats = {'increases': 0, 'decreases': 0, 'rejected': 0}
+
+    def has_capacity(self) -> bool:
+        return not self.enabled or self.inflight < max(self.min_limit, int(self.limit))
+
+    def acquire(self) -> bool:
+        """Take an in-flight slot. False if the bank is at its limit."""
+        if not self.has_capacity():
+            self.stats['rejected'] += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self) -> None:
+        self.inflight = max(0, self.inflight - 1)
+
+    def on_sample(self, latency_ms: float, timeout: bool = False, now: float = None) -> None:
+        """Adjust the limit from one attempt's latency/outcome."""
+        now = time.monotonic() if now is None else now
+        if latency_ms is not None:
+            latency_ms = float(latency_ms)
+            if self.baseline_ms is None:
+                self.baseline_ms = self.recent_ms = latency_ms
+            self.baseline_ms += self.baseline_alpha * (latency_ms - self.baseline_ms)
+            self.recent_ms += 0.2 * (latency_ms - self.recent_ms)
+
+        congested = timeout or (
+            self.baseline_ms is not None and self.recent_ms > self.latency_tolerance * self.baseline_ms
+        )
+        if congested:
+            if now - self._last_decrease >= self.decrease_cooldown_seconds:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                self._last_decrease = now
+                self.stats['decreases'] += 1
+        elif self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+            self.stats['increases'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'limit': int(self.limit),
+            'inflight': self.inflight,
+            'baseline_ms': round(self.baseline_ms or 0, 1),
+            'recent_ms': round(self.recent_ms or 0, 1),
+            **self.stats
+        }
+
+
+class Router:
+    """Weighted bank router backed by shared_config.json."""
+
+    def __init__(self, config_file: str = CONFIG_FILE, rng: random.Random = None,
+                 refresh_interval: float = 0.25, source: str = 'router'):
+        self.config_file = config_file
+        self.source = source
+        self.rng = rng or random.Random()
+        self.refresh_interval = refresh_interval
+        self.lock = threading.RLock()
+
+        self.config = {"banks": [], "routing_rules": {}, "global_config": {}}
+        self.banks: List[Dict[str, Any]] = []
+        self.table: Optional[AliasTable] = None
+        self.version = None
+        self._last_check = 0.0
+
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+        self.inflight = 0
+        self.max_concurrent = 100
+        self.spillovers = 0
+        self.saturated = 0
+        # bank_id -> (breaker generation, probe slots taken by route/acquire and not yet recorded)
+        self._open_probes: Dict[str, tuple] = {}
+        self._persisted_states: Dict[str, str] = {}
+        self._last_persist = 0.0
+
+        # Success posteriors (thompson strategy)
+        self.bandit = bandit.ThompsonBandit(self.rng)
+
+        # Live EWMA latency per bank (p2c_ewma strategy)
+        self.ewma_ms: Dict[str, float] = {}
+
+        # Recent latencies per bank (for percentiles such as the hedge delay)
+        self.latencies: Dict[str, deque] = {}
+        self._latency_counts: Dict[str, int] = {}
+        self._percentile_cache: Dict[tuple, tuple] = {}
+
+        # name -> callable returning a dict, published to METRICS_FILE
+        self.metrics_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], rng: random.Random = None) -> 'Router':
+        """
+        Detached router over an in-memory config (no file reloads, no persistence).
+        Used to evaluate candidate configs without touching shared_config.json.
+        """
+        router = cls(config_file=None, rng=rng, refresh_interval=float('inf'), source=None)
+        router.load(config)
+        return router
+
+    # ==================== CONFIG ====================
+
+    def _config_version(self):
+        if self.config_file is None:
+            return None
+        try:
+            st = os.stat(self.config_file)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload and recompile if the config file changed. Returns True if recompiled."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.refresh_interval:
+            return False
+        self._last_check = now
+
+        version = self._config_version()
+        if not force and version == self.version and self.table is not None:
+            return False
+
+        with self.lock:
+            try:
+                with open(self.config_file, 'r') as f:
+                    config = json.load(f)
+            except Exception as e:
+                # Keep serving the last good table (e.g. while a writer is mid-save)
+                if self.table is None:
+                    print(f"Error loading config: {e}")
+                    self.load(self.config)
+                return False
+            self.load(config)
+            self.version = version
+            return True
+
+    def load(self, config: Dict[str, Any]) -> None:
+        """Compile a config dict into the routing table."""
+        with self.lock:
+            self.config = config
+            self.banks = config.get('banks', [])
+            self._sync_breakers()
+            self._sync_limiters()
+            self.bandit.configure(self.banks, self.routing_rules.get('bandit', {}))
+            self._compile()
+
+    def _sync_breakers(self) -> None:
+        """Create/update breakers from config; adopt states changed by other writers."""
+        rules = dict(BREAKER_DEFAULTS, **self.routing_rules.get('circuit_breaker', {}))
+        now = time.monotonic()
+        for bank in self.banks:
+            cb_config = bank.get('circuit_breaker', {})
+            config_state = cb_config.get('state', 'closed')
+            breaker = self.breakers.get(bank['id'])
+            if breaker is None:
+                breaker = self.breakers[bank['id']] = CircuitBreaker()
+                breaker.force(config_state, now)
+            elif config_state != self._persisted_states.get(bank['id']):
+                # Someone else (agent, update_bank_health, another process) changed it
+                breaker.force(config_state, now)
+            self._persisted_states[bank['id']] = config_state
+
+            breaker.failure_threshold = cb_config.get('failure_threshold', 5)
+            breaker.window_seconds = rules['window_seconds']
+            breaker.failure_rate_threshold = rules['failure_rate_threshold']
+            breaker.cooldown_seconds = rules['cooldown_seconds']
+            breaker.half_open_max_probes = rules['half_open_max_probes']
+            breaker.probe_successes = rules['probe_successes']
+
+    def _sync_limiters(self) -> None:
+        """Create/update concurrency limiters; live limits and in-flight counts are kept."""
+        rules = dict(CONCURRENCY_DEFAULTS, **self.routing_rules.get('concurrency', {}))
+        self.max_concurrent = int(self.config.get('global_config', {}).get('max_concurrent_requests', 100))
+        for bank in self.banks:
+            limiter = self.limiters.get(bank['id'])
+            if limiter is None:
+                limiter = self.limiters[bank['id']] = ConcurrencyLimiter(
+                    baseline_ms=bank.get('metrics', {}).get('avg_latency_ms'),
+                    initial_limit=rules['initial_limit'],
+                    max_limit=self.max_concurrent
+                )
+            limiter.enabled = rules['enabled']
+            limiter.min_limit = rules['min_limit']
+            limiter.max_limit = self.max_concurrent
+            limiter.limit = min(limiter.limit, self.max_concurrent)
+            limiter.backoff_ratio = rules['backoff_ratio']
+            limiter.latency_tolerance = rules['latency_tolerance']
+            limiter.baseline_alpha = rules['baseline_alpha']
+            limiter.decrease_cooldown_seconds = rules['decrease_cooldown_seconds']
+
+    def _compile(self) -> None:
+        enabled = [b for b in self.banks if b.get('enabled', True)]
+        candidates = [b for b in enabled if b.get('weight', 0) > 0] or enabled
+        if not candidates:
+            # Use first bank if none enabled
+            candidates = self.banks[:1] or [DEFAULT_BANK]
+        self.table = AliasTable(candidates, [max(0, b.get('weight', 0)) for b in candidates])
+
+    # ==================== ROUTING ====================
+
+    @property
+    def routing_rules(self) -> Dict[str, Any]:
+        return self.config.get('routing_rules', {})
+
+    def route(self, method: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Pick a bank for the next transaction (O(1) unless breakers are open or
+        the sampled bank is at its concurrency limit).
+
+        Takes an in-flight slot on the returned bank; the caller must call
+        release(bank_id) when the payment completes.
+
+        Args:
+            method: Payment method (used by the thompson strategy's per-method posteriors)
+
+        Returns:
+            Bank config, or None if no bank can take the payment: every bank
+            is at its in-flight limit or has its breaker open (or the global
+            max_concurrent_requests is reached)
+        """
+        self.refresh()
+        with self.lock:
+            now = time.monotonic()
+            if self.inflight >= self.max_concurrent:
+                self.saturated += 1
+                return None
+            bank = self._pick(method, now)
+            if self._limiter(bank).has_capacity() and self._admit(bank, now):
+                self._acquire(bank)
+                return bank
+
+            # Sampled bank is tripped or full: spill over to banks with spare concurrency
+            spare = [
+                (b, w) for b, w in zip(self.table.items, self.table.weights)
+                if self._limiter(b).has_capacity()
+            ]
+            if not spare:
+                self._limiter(bank).stats['rejected'] += 1
+                self.saturated += 1
+                return None
+            # Only banks whose breaker admits traffic; with every breaker open, shed the payment
+            allowed = [(b, w) for b, w in spare if self._breaker(b).is_available(now)]
+            if not allowed:
+                self.saturated += 1
+                return None
+            bank = self.rng.choices([b for b, _ in allowed], weights=[w or 1 for _, w in allowed])[0]
+            if not self._admit(bank, now):
+                self.saturated += 1
+                return None
+            self._acquire(bank)
+            self.spillovers += 1
+            return bank
+
+    def acquire(self, bank_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Take an in-flight slot on a specific bank (e.g. the one a shopper picked).
+
+        Returns:
+            Bank config, or None if the bank is not routable, its breaker is
+            open, or it (or the global max_concurrent_requests) is at its limit
+        """
+        self.refresh()
+        with self.lock:
+            now = time.monotonic()
+            if self.inflight >= self.max_concurrent:
+                self.saturated += 1
+                return None
+            bank = next((b for b in self.table.items if b.get('id') == bank_id), None)
+            if bank is None or not self._limiter(bank).has_capacity() or not self._admit(bank, now):
+                return None
+            self._acquire(bank)
+            return bank
+
+    def _pick(self, method: str, now: float) -> Dict[str, Any]:
+        """Draw the candidate bank according to routing_rules.strategy."""
+        strategy = self.routing_rules.get('strategy', 'weighted')
+        if strategy == 'thompson':
+            candidates = [b for b in self.table.items
+                          if self._breaker(b).is_available(now) and self._limiter(b).has_capacity()]
+            return self.bandit.choose(candidates, method, self.ewma_ms) or self.table.sample(self.rng)
+
+        first = self.table.sample(self.rng)
+        if strategy != 'p2c_ewma' or len(self.table.items) < 2:
+            return first
+        second = self.table.sample(self.rng)
+        for _ in range(3):
+            if second is not first:
+                break
+            second = self.table.sample(self.rng)
+        return min((first, second), key=self._cost)
+
+    def _cost(self, bank: Dict[str, Any]) -> float:
+        """p2c cost: EWMA latency scaled by in-flight load. Unavailable banks cost infinity."""
+        if not self._breaker(bank).is_available() or not self._limiter(bank).has_capacity():
+            return float('inf')
+        rules = dict(P2C_DEFAULTS, **self.routing_rules.get('p2c', {}))
+        latency = self.ewma_ms.get(bank.get('id'))
+        if latency is None:
+            latency = bank.get('metrics', {}).get('avg_latency_ms', 150)
+        return latency * (1 + rules['inflight_weight'] * self._limiter(bank).inflight)
+
+    def release(self, bank_id: str) -> None:
+        """
+        Return the in-flight slot taken by route(), acquire() or
+        next_best(acquire=True), and the breaker's half-open probe slot if
+        the payment never recorded an outcome on this bank.
+        """
+        with self.lock:
+            limiter = self.limiters.get(bank_id)
+            if limiter is not None:
+                limiter.release()
+            self.inflight = max(0, self.inflight - 1)
+            generation, count = self._open_probes.get(bank_id, (None, 0))
+            if count:
+                self._open_probes[bank_id] = (generation, count - 1)
+                self.breakers[bank_id].cancel_probe(generation)
+
+    def _limiter(self, bank: Dict[str, Any]) -> ConcurrencyLimiter:
+        limiter = self.limiters.get(bank.get('id'))
+        if limiter is None:
+            limiter = self.limiters[bank.get('id')] = ConcurrencyLimiter(
+                max_limit=self.max_concurrent, enabled=False)
+        return limiter
+
+    def _acquire(self, bank: Dict[str, Any]) -> None:
+        self._limiter(bank).acquire()
+        self.inflight += 1
+
+    def is_available(self, bank_id: str) -> bool:
+        """Whether the bank's circuit breaker currently admits traffic."""
+        with self.lock:
+            breaker = self.breakers.get(bank_id)
+            return breaker is None or breaker.is_available()
+
+    def _breaker(self, bank: Dict[str, Any]) -> CircuitBreaker:
+        breaker = self.breakers.get(bank.get('id'))
+        if breaker is None:
+            breaker = self.breakers[bank.get('id')] = CircuitBreaker()
+        return breaker
+
+    def _admit(self, bank: Dict[str, Any], now: float) -> bool:
+        """Ask the bank's breaker to admit a request, noting any half-open probe slot it reserves."""
+        breaker = self._breaker(bank)
+        probing = breaker.current_state(now) == 'half_open'
+        if not breaker.allow_request(now):
+            return False
+        if probing:
+            generation, count = self._open_probes.get(bank.get('id'), (breaker.generation, 0))
+            count = count + 1 if generation == breaker.generation else 1
+            self._open_probes[bank.get('id')] = (breaker.generation, count)
+        return True
+
+    def record(self, bank_id: str, success: bool, latency_ms: float = None,
+               error_code: str = None, method: str = None) -> None:
+        """Feed a transaction (attempt) outcome back into the routing state."""
+        with self.lock:
+            now = time.monotonic()
+            self.bandit.update(bank_id, success, method)
+            limiter = self.limiters.get(bank_id)
+            if limiter is not None and (latency_ms is not None or error_code in TIMEOUT_ERRORS):
+                limiter.on_sample(latency_ms, timeout=error_code in TIMEOUT_ERRORS, now=now)
+            breaker = self.breakers.get(bank_id)
+            if breaker is not None:
+                generation, count = self._open_probes.get(bank_id, (None, 0))
+                if count:
+                    # The outcome returns the probe slot; release() must not return it again
+                    self._open_probes[bank_id] = (generation, count - 1)
+                before = breaker.state
+                breaker.record(success, now)
+                if breaker.state != before:
+                    print(f"  ⚡ Circuit breaker {bank_id}: {before} -> {breaker.state}")
+            if latency_ms is not None or not success:
+                p2c = dict(P2C_DEFAULTS, **self.routing_rules.get('p2c', {}))
+                sample = float(latency_ms or 0)
+                if not success:
+                    sample = max(sample, p2c['failure_penalty_ms'])
+                previous = self.ewma_ms.get(bank_id)
+                self.ewma_ms[bank_id] = sample if previous is None else (
+                    previous + p2c['ewma_alpha'] * (sample - previous))
+            if latency_ms is not None:
+                window = self.latencies.get(bank_id)
+                if window is None:
+                    window = self.latencies[bank_id] = deque(maxlen=200)
+                window.append(float(latency_ms))
+                self._latency_counts[bank_id] = self._latency_counts.get(bank_id, 0) + 1
+            self._maybe_persist(now)
+
+    def latency_percentile(self, bank_id: str, q: float = 0.95) -> Optional[float]:
+        """
+        Observed latency percentile (q in 0-1) over the bank's recent transactions.
+
+        Falls back to the bank's configured avg_latency_ms until enough samples
+        exist. Recomputed at most every 10 samples.
+        """
+        with self.lock:
+            window = self.latencies.get(bank_id)
+            if not window or len(window) < 10:
+                bank = self.get_bank(bank_id) or {}
+                return bank.get('metrics', {}).get('avg_latency_ms')
+            seen = self._latency_counts.get(bank_id, 0)
+            cached = self._percentile_cache.get((bank_id, q))
+            if cached is None or seen - cached[0] >= 10:
+                ordered = sorted(window)
+                cached = (seen, ordered[min(len(ordered) - 1, int(q * len(ordered)))])
+                self._percentile_cache[(bank_id, q)] = cached
+            return cached[1]
+
+    def next_best(self, exclude_id: str = None, acquire: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Highest-weight healthy bank with an available breaker and spare
+        concurrency, other than exclude_id.
+
+        Args:
+            acquire: Take an in-flight slot on the bank (release() it when done)
+        """
+        self.refresh()
+        with self.lock:
+            now = time.monotonic()
+            if acquire and self.inflight >= self.max_concurrent:
+                return None
+            candidates = [
+                b for b in self.table.items
+                if b.get('id') != exclude_id and b.get('health_status', 'healthy') == 'healthy'
+                and self._breaker(b).is_available(now) and self._limiter(b).has_capacity()
+            ]
+            if not candidates:
+                return None
+            bank = max(candidates, key=lambda b: b.get('weight', 0))
+            if acquire:
+                if not self._admit(bank, now):
+                    return None
+                self._acquire(bank)
+            return bank
+
+    # ==================== PERSISTENCE ====================
+
+    def _maybe_persist(self, now: float) -> None:
+        if self.config_file is None:
+            return
+        interval = self.routing_rules.get('circuit_breaker', {}).get(
+            'persist_interval_seconds', BREAKER_DEFAULTS['persist_interval_seconds'])
+        if now - self._last_persist < interval:
+            return
+        self._last_persist = now
+        changed = any(
+            b.current_state(now) != self._persisted_states.get(bank_id)
+            for bank_id, b in self.breakers.items()
+        )
+        if changed:
+            self.persist()
+        self.publish_metrics()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of this router's live metrics."""
+        with self.lock:
+            snapshot = {
+                'updated_at': datetime.now().isoformat(),
+                'breakers': self.breaker_states(),
+                'concurrency': self.concurrency_states(),
+                'strategy': self.routing_rules.get('strategy', 'weighted'),
+                'ewma_ms': {bank_id: round(v, 1) for bank_id, v in self.ewma_ms.items()},
+                'bandit': self.bandit.snapshot(),
+            }
+        for name, provider in list(self.metrics_providers.items()):
+            try:
+                snapshot[name] = provider()
+            except Exception as e:
+                snapshot[name] = {'error': str(e)}
+        return snapshot
+
+    def publish_metrics(self) -> None:
+        """Write this process's metrics under its source key in METRICS_FILE."""
+        try:
+            metrics = self.metrics()
+            # Other processes publish under their own keys; hold the lock across
+            # the read-modify-write so none of their entries are dropped.
+            with config_lock.locked(METRICS_FILE):
+                data = read_metrics()
+                data[self.source] = metrics
+                tmp_path = f"{METRICS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, METRICS_FILE)
+        except Exception as e:
+            print(f"Error publishing routing metrics: {e}")
+
+    def persist(self) -> None:
+        """
+        Write breaker states into the banks' circuit_breaker blocks.
+
+        Holds the config lock across the read and the write, so a concurrent
+        commit by the agent, the feedback rollback or another router is never
+        reverted; only the breaker fields of the fresh file are changed.
+        """
+        with self.lock:
+            try:
+                with config_lock.locked(self.config_file):
+                    with open(self.config_file, 'r') as f:
+                        config = json.load(f)
+                    for bank in config.get('banks', []):
+                        breaker = self.breakers.get(bank['id'])
+                        if breaker is None:
+                            continue
+                        cb = bank.setdefault('circuit_breaker', {})
+                        cb['state'] = breaker.state
+                        cb['failure_count'] = breaker.failure_count
+                        cb['last_failure_time'] = breaker.last_failure_time or cb.get('last_failure_time')
+
+                    tmp_path = f"{self.config_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    with open(tmp_path, 'w') as f:
+                        json.dump(config, f, indent=2)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.config_file)
+
+                self._persisted_states = {b['id']: b.get('circuit_breaker', {}).get('state', 'closed')
+                                          for b in config.get('banks', [])}
+                self.config = config
+                self.banks = config.get('banks', [])
+                self._compile()
+                self.version = self._config_version()
+            except Exception as e:
+                print(f"Error persisting circuit breakers: {e}")
+
+    def breaker_states(self) -> Dict[str, Dict[str, Any]]:
+        """Current breaker state per bank (for dashboards and the agent)."""
+        with self.lock:
+            now = time.monotonic()
+            return {
+                bank_id: {'state': b.current_state(now), 'failure_count': b.failure_count}
+                for bank_id, b in self.breakers.items()
+            }
+
+    def concurrency_states(self) -> Dict[str, Any]:
+        """Adaptive limits and in-flight counts per bank, plus global totals."""
+        with self.lock:
+            return {
+                'inflight': self.inflight,
+                'max_concurrent_requests': self.max_concurrent,
+                'spillovers': self.spillovers,
+                'saturated': self.saturated,
+                'banks': {bank_id: l.snapshot() for bank_id, l in self.limiters.items()},
+            }
+
+    def recommend(self) -> Optional[str]:
+        """
+        Bank id to highlight at checkout: the highest-weight routable bank that
+        is healthy. Uses the same candidate set as route().
+        """
+        self.refresh()
+        now = time.monotonic()
+        healthy = [b for b in self.table.items if b.get('health_status', 'healthy') == 'healthy'
+                   and b.get('enabled', True) and self._breaker(b).is_available(now)]
+        if not healthy:
+            return None
+        return max(healthy, key=lambda b: b.get('weight', 0))['id']
+
+    def get_bank(self, bank_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a bank's config by id or display name."""
+        self.refresh()
+        return next((b for b in self.banks if b['id'] == bank_id or b.get('name') == bank_id), None)
+
+
+_routers: Dict[str, Router] = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(config_file: str = CONFIG_FILE, source: str = 'router') -> Router:
+    """Return the process-wide router for a config file."""
+    router = _routers.get(config_file)
+    if router is None:
+        with _routers_lock:
+            router = _routers.setdefault(config_file, Router(config_file, source=source))
+    return router
+
+
+def read_metrics() -> Dict[str, Any]:
+    """Live routing metrics published by each process, keyed by source."""
+    try:
+        with open(METRICS_FILE, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
@@ -0,0 +1,256 @@
+"""
+Shadow - Evaluates proposed agent actions before they are applied
+
+The last N minutes of traffic (method and amount of each payment) are replayed
+through a detached Router under the current config and under each candidate
+config, using the simulator's bank model (simulator.simulate_attempt) and the
+retry executor. Bank models are calibrated from the replay window's observed
+success rates and latencies.
+
+Candidates are replayed in parallel in a process pool with common random
+numbers: transaction i gets the same random draws under every config, so the
+difference between candidates is the effect of the action, not noise.
+
+A candidate is rejected if it predicts a lower success rate or higher latency
+than the current config (beyond a small tolerance). The whole evaluation runs
+under a sub-second budget; candidates that do not finish in time are reported
+as unevaluated and handled by `on_timeout` ("accept" or "reject").
+
+Configured in shared_config.json under global_config.shadow_eval.
+"""
+
+import copy
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from typing import Dict, List, Any, Optional
+
+import retries
+import routing
+import simulator
+import tools
+import txn_store
+
+# Defaults for global_config.shadow_eval
+SHADOW_DEFAULTS = {
+    'enabled': True,
+    'window_minutes': 10,
+    'max_transactions': 1500,
+    'budget_ms': 800,
+    'sr_tolerance': 0.005,         # allowed SR drop (fraction, 0.005 = 0.5 points)
+    'latency_tolerance_ms': 10,    # allowed avg latency increase
+    'workers': 4,
+    'on_timeout': 'accept',
+    'min_calibration_samples': 20,
+}
+
+_pool = None
+_pool_workers = 0
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Persistent worker pool (forkserver, so forking never copies held locks from app threads)."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        try:
+            context = multiprocessing.get_context('forkserver')
+        except ValueError:
+            context = None
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        _pool_workers = workers
+    return _pool
+
+
+def _ping() -> bool:
+    return True
+
+
+def warm_up(workers: int = None) -> None:
+    """Start the worker pool in the background so the first evaluation fits its budget."""
+    workers = workers or SHADOW_DEFAULTS['workers']
+    if _pool is not None and _pool_workers == workers:
+        return
+    try:
+        pool = _get_pool(workers)
+        for _ in range(workers):
+            pool.submit(_ping)
+    except Exception as e:
+        print(f"  ⚠️ Shadow pool warm-up failed: {e}")
+
+
+def shutdown() -> None:
+    """Stop the worker pool (lets a short-lived process that evaluated actions exit)."""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool, _pool_workers = None, 0
+
+
+def calibrate(config: Dict[str, Any], transactions: List[Dict[str, Any]],
+              min_samples: int = 20) -> Dict[str, Any]:
+    """
+    Set each bank's metrics.success_rate / avg_latency_ms (in place) from the
+    observed window, for banks with at least `min_samples` first-attempt rows.
+    """
+    by_bank: Dict[str, List[Dict[str, Any]]] = {}
+    for t in transactions:
+        try:
+            if int(float(t.get('retry_count') or 0)) == 0:
+                by_bank.setdefault(t.get('bank'), []).append(t)
+        except (TypeError, ValueError):
+            continue
+
+    for bank in config.get('banks', []):
+        rows = by_bank.get(bank.get('name'), [])
+        if len(rows) < min_samples:
+            continue
+        successes = [r for r in rows if r.get('status') == 'Success']
+        metrics = bank.setdefault('metrics', {})
+        metrics['success_rate'] = len(successes) / len(rows)
+        if successes:
+            metrics['avg_latency_ms'] = sum(float(r.get('latency_ms') or 0) for r in successes) / len(successes)
+    return config
+
+
+def replay(config: Dict[str, Any], workload: List[tuple], seed: int) -> Dict[str, Any]:
+    """
+    Replay a workload of (method, amount) payments under a config.
+
+    Returns:
+        {'transactions', 'success_rate', 'avg_latency_ms', 'p95_latency_ms', 'shed'}
+    """
+    router = routing.Router.from_config(config, random.Random(seed))
+    rules = router.routing_rules
+    executor = retries.RetryExecutor(rng=random.Random(seed + 1), sleep=lambda s: None,
+                                     is_available=router.is_available)
+    executor.configure(rules)
+
+    successes = 0
+    shed = 0
+    latencies = []
+    for i, (method, _amount) in enumerate(workload):
+        bank = router.route(method)
+        if bank is None:
+            shed += 1
+            continue
+        # Common random numbers: payment i sees the same draws under every config
+        draws = random.Random(seed * 1000003 + i)
+        attempt_latencies = []
+
+        def attempt(b, n):
+            outcome = simulator.simulate_attempt(b, rules, draws)
+            attempt_latencies.append(outcome['latency_ms'])
+            return outcome
+
+        def on_attempt(b, outcome):
+            router.record(b.get('id'), outcome['status'] == 'Success', outcome['latency_ms'],
+                          outcome.get('error_code'), method)
+
+        try:
+            result = executor.execute(bank, attempt, on_attempt)
+        finally:
+            router.release(bank.get('id'))
+        successes += result['status'] == 'Success'
+        latencies.append(sum(attempt_latencies) + result.get('backoff_ms', 0))
+
+    total = len(workload)
+    latencies.sort()
+    return {
+        'transactions': total,
+        'success_rate': successes / total if total else 0.0,
+        'avg_latency_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+        'p95_latency_ms': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+        'shed': shed,
+    }
+
+
+def evaluate(candidates: Dict[str, List[Dict[str, Any]]],
+             config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Predict the effect of candidate action lists against the current config.
+
+    Args:
+        candidates: name -> list of agent actions ({'type': ..., 'params': {...}})
+        config: Current config (read from shared_config.json if omitted)
+
+    Returns:
+        {'success': True, 'baseline': {...}, 'verdicts': {name: {'accepted': bool,
+         'reason': str, 'predicted': {...}}}, 'elapsed_ms': float}
+    """
+    start = time.monotonic()
+    config = config or tools.get_config()
+    rules = dict(SHADOW_DEFAULTS, **config.get('global_config', {}).get('shadow_eval', {}))
+    deadline = start + rules['budget_ms'] / 1000.0
+
+    transactions = txn_store.query_transactions(
+        since_minutes=rules['window_minutes'], limit=rules['max_transactions'])
+    if not transactions:
+        return {
+            'success': True, 'baseline': None, 'elapsed_ms': 0.0,
+            'verdicts': {name: {'accepted': True, 'reason': 'no recent traffic to replay', 'predicted': None}
+                         for name in candidates}
+        }
+
+    base = calibrate(copy.deepcopy(config), transactions, rules['min_calibration_samples'])
+    workload = [(t.get('method'), t.get('amount')) for t in transactions]
+
+    verdicts: Dict[str, Dict[str, Any]] = {}
+    configs = {'__current__': base}
+    for name, actions in candidates.items():
+        candidate = copy.deepcopy(base)
+        for action in actions:
+            result = tools.apply_action(candidate, action)
+            if not result.get('success'):
+                verdicts[name] = {'accepted': False, 'reason': f"invalid: {result.get('error')}", 'predicted': None}
+                break
+        else:
+            configs[name] = candidate
+
+    seed = random.randrange(2 ** 31)
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    try:
+        pool = _get_pool(rules['workers'])
+        futures = {name: pool.submit(replay, cfg, workload, seed) for name, cfg in configs.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                future.cancel()
+                results[name] = None
+    except Exception as e:
+        # No worker processes available: replay inline, still within the budget
+        print(f"  ⚠️ Shadow pool unavailable ({e}), replaying inline")
+        for name, cfg in configs.items():
+            results[name] = replay(cfg, workload, seed) if time.monotonic() < deadline else None
+
+    baseline = results.get('__current__')
+    for name in candidates:
+        if name in verdicts:
+            continue
+        predicted = results.get(name)
+        if baseline is None or predicted is None:
+            verdicts[name] = {
+                'accepted': rules['on_timeout'] == 'accept',
+                'reason': f"not evaluated within {rules['budget_ms']}ms budget",
+                'predicted': predicted
+            }
+            continue
+        sr_delta = predicted['success_rate'] - baseline['success_rate']
+        latency_delta = predicted['avg_latency_ms'] - baseline['avg_latency_ms']
+        if sr_delta < -rules['sr_tolerance']:
+            accepted, reason = False, f"predicted SR {sr_delta * 100:+.1f} pts"
+        elif latency_delta > rules['latency_tolerance_ms']:
+            accepted, reason = False, f"predicted latency {latency_delta:+.0f}ms"
+        else:
+            accepted, reason = True, f"predicted SR {sr_delta * 100:+.1f} pts, latency {latency_delta:+.0f}ms"
+        verdicts[name] = {'accepted': accepted, 'reason': reason, 'predicted': predicted}
+
+    return {
+        'success': True,
+        'baseline': baseline,
+        'verdicts': verdicts,
+        'elapsed_ms': round((time.monotonic() - start) * 1000, 1),
+    }
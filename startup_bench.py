@@ -0,0 +1,196 @@
+"""
+Startup Bench - Cold-start import cost and time to first render of the Streamlit apps
+
+For each app (app.py, checkout_ui.py) every run uses a fresh interpreter in a
+sandbox directory (copy of the code and shared_config.json, empty transaction
+log) and reports:
+
+- import time per module: cumulative `python -X importtime` cost of each
+  module the app imports at top level
+- time to first render: one full script run under streamlit's AppTest, from
+  interpreter start and excluding the streamlit import itself
+- heavy modules loaded: which of pandas / plotly / langgraph / langchain /
+  agent_engine the first render imported (AppTest itself pulls in plotly, so
+  modules already loaded before the script ran are not counted)
+
+    python startup_bench.py
+    python startup_bench.py checkout_ui.py --runs 5 --json startup.json
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any
+
+APPS = ['app.py', 'checkout_ui.py']
+
+# Modules that should only be imported when a feature that needs them is used
+HEAVY_MODULES = ['pandas', 'numpy', 'plotly', 'langgraph', 'langchain_core', 'langchain_groq',
+                 'agent_engine', 'simulator']
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# Runs in the child: one AppTest script run, timings and loaded modules as JSON on stdout
+RENDER_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+before = set(sys.modules)
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({
+    'streamlit_import_ms': (t1 - t0) * 1000,
+    'render_ms': (t2 - t1) * 1000,
+    'exceptions': [e.value for e in at.exception],
+    'loaded': sorted(m for m in set(sys.modules) - before if m.split('.')[0] in sys.argv[2].split(',')),
+}))
+"""
+
+
+def top_level_imports(path: str) -> List[str]:
+    """Modules an app imports at module level (function-level imports are deferred)."""
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def _sandbox() -> str:
+    """Fresh directory with the code and config, and no transaction data."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    sandbox = tempfile.mkdtemp(prefix='startup_bench_')
+    for path in glob.glob(os.path.join(here, '*.py')):
+        shutil.copy(path, sandbox)
+    shutil.copy(os.path.join(here, 'shared_config.json'), sandbox)
+    return sandbox
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    # Keep the dashboard from reaching a real agent worker
+    env['AGENT_WORKER_ADDRESS'] = '127.0.0.1:1'
+    return env
+
+
+def measure_imports(modules: List[str], cwd: str) -> Dict[str, float]:
+    """
+    Cumulative import time (ms) of each module, in import order, in one fresh interpreter.
+
+    A module already pulled in by an earlier one costs ~0 here, matching what
+    the app pays for it.
+    """
+    code = '\n'.join(f'import {m}' for m in modules)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, env=_env(),
+                          capture_output=True, text=True, timeout=120)
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and match.group(4) in modules and match.group(4) not in times:
+            times[match.group(4)] = int(match.group(2)) / 1000
+    return {m: times.get(m, 0.0) for m in modules}
+
+
+def measure_render(app: str, cwd: str) -> Dict[str, Any]:
+    """One cold first render of an app in a fresh interpreter."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', RENDER_SCRIPT, app, ','.join(HEAVY_MODULES)], cwd=cwd,
+                          env=_env(), capture_output=True, text=True, timeout=300)
+    total_ms = (time.perf_counter() - start) * 1000
+    try:
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+    except Exception:
+        return {'success': False, 'error': (proc.stderr or proc.stdout).strip()[-500:]}
+    result['success'] = True
+    result['process_ms'] = total_ms
+    result['loaded'] = sorted({m.split('.')[0] for m in result['loaded']})
+    return result
+
+
+def bench_app(app: str, runs: int = 3) -> Dict[str, Any]:
+    """
+    Benchmark the cold start of one app.
+
+    Args:
+        app: Script file name (app.py or checkout_ui.py)
+        runs: Fresh-process runs per measurement; medians are reported
+
+    Returns:
+        {'app', 'imports': {module: ms}, 'render_ms', 'process_ms',
+         'heavy_loaded', 'exceptions'}
+    """
+    modules = top_level_imports(app)
+    sandbox = _sandbox()
+    try:
+        import_runs = [measure_imports(modules, sandbox) for _ in range(runs)]
+        renders = [measure_render(app, sandbox) for _ in range(runs)]
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    failed = [r for r in renders if not r['success']]
+    if failed:
+        return {'app': app, 'success': False, 'error': failed[0]['error']}
+    return {
+        'app': app,
+        'success': True,
+        'imports': {m: statistics.median(r[m] for r in import_runs) for m in modules},
+        'streamlit_import_ms': statistics.median(r['streamlit_import_ms'] for r in renders),
+        'render_ms': statistics.median(r['render_ms'] for r in renders),
+        'process_ms': statistics.median(r['process_ms'] for r in renders),
+        'heavy_loaded': renders[-1]['loaded'],
+        'exceptions': renders[-1]['exceptions'],
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"\n=== {result['app']} ===")
+    if not result['success']:
+        print(f"❌ First render failed: {result['error']}")
+        return
+    print(f"{'module':<28}{'import ms':>10}")
+    for module, ms in sorted(result['imports'].items(), key=lambda kv: -kv[1]):
+        print(f"{module:<28}{ms:>10.1f}")
+    print(f"{'total (top-level imports)':<28}{sum(result['imports'].values()):>10.1f}")
+    print(f"\nFirst render:   {result['render_ms']:.0f}ms (script run, streamlit already imported)")
+    print(f"Cold start:     {result['process_ms']:.0f}ms (interpreter start -> first render)")
+    print(f"Heavy modules:  {', '.join(result['heavy_loaded']) or 'none'}")
+    if result['exceptions']:
+        print(f"⚠️ Exceptions during render: {result['exceptions']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the Streamlit apps")
+    parser.add_argument('apps', nargs='*', default=APPS, help='Apps to benchmark')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh-process runs per measurement (median)')
+    parser.add_argument('--json', help='Also write results to this file')
+    args = parser.parse_args()
+
+    results = []
+    for app in args.apps:
+        result = bench_app(app, args.runs)
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Tests for agent_engine.py."""
+
+import os
+import shutil
+import time
+from types import SimpleNamespace
+
+import agent_engine
+import tools
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class _FakeLLM:
+    """Answers every call with the same content and records the request timeouts."""
+
+    def __init__(self, content):
+        self.content = content
+        self.timeouts = []
+
+    def invoke(self, messages, timeout=None):
+        self.timeouts.append(timeout)
+        return SimpleNamespace(content=self.content, usage_metadata=None, response_metadata={})
+
+
+def _state(monkeypatch, tmp_path, llm):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('TXN_STORE', 'csv')
+    shutil.copy(os.path.join(HERE, 'shared_config.json'), tools.CONFIG_FILE)
+    monkeypatch.setattr(agent_engine, 'get_llm', lambda: llm)
+    state = {'observations': {}, 'memory': [], 'structured_response': {}, 'reasoning': '',
+             'reasoning_details': None, 'actions': [], 'feedback': {},
+             'deadline': time.monotonic() + 30}
+    return agent_engine.observe_node(state)
+
+
+def test_malformed_json_on_every_attempt_uses_fallback(tmp_path, monkeypatch):
+    llm = _FakeLLM("I think you should reroute traffic")
+    state = agent_engine.reason_node(_state(monkeypatch, tmp_path, llm))
+
+    assert len(llm.timeouts) == 3
+    assert state['reasoning'].startswith('**FALLBACK (LLM gave no usable answer')
+    assert state['structured_response'].get('decision') in ('INTERVENE', 'NO_ACTION')
+
+
+def test_llm_call_carries_remaining_budget_as_timeout(tmp_path, monkeypatch):
+    llm = _FakeLLM('{"decision": "NO_ACTION", "actions": [], "confidence_score": 0.9}')
+    state = agent_engine.reason_node(_state(monkeypatch, tmp_path, llm))
+
+    assert state['structured_response']['decision'] == 'NO_ACTION'
+    assert len(llm.timeouts) == 1 and 0 < llm.timeouts[0] <= 30
+
+
+def _fake_shadow(monkeypatch, rejected_combinations, predicted):
+    """shadow.evaluate stand-in: candidates listed in rejected_combinations are worse, the rest are not."""
+    evaluated = []
+
+    def evaluate(candidates, config=None):
+        verdicts = {}
+        for name, actions in candidates.items():
+            types = tuple(a['type'] for a in actions)
+            evaluated.append(types)
+            accepted = types not in rejected_combinations
+            verdicts[name] = {'accepted': accepted, 'reason': 'ok' if accepted else 'predicted SR -5.0 pts',
+                              'predicted': predicted.get(types)}
+        return {'success': True, 'verdicts': verdicts, 'elapsed_ms': 1.0}
+
+    monkeypatch.setattr(agent_engine.shadow, 'evaluate', evaluate)
+    return evaluated
+
+
+def test_actions_rejected_together_fall_back_to_the_best_single_action(monkeypatch):
+    actions = [{'type': 'reroute_traffic', 'params': {'bank': 'sbi', 'target': 'icici'}},
+               {'type': 'optimize_weights', 'params': {}}]
+    _fake_shadow(monkeypatch, {('reroute_traffic', 'optimize_weights')}, {
+        ('reroute_traffic',): {'success_rate': 0.91, 'avg_latency_ms': 300},
+        ('optimize_weights',): {'success_rate': 0.93, 'avg_latency_ms': 320},
+    })
+
+    keep, rejected = agent_engine.shadow_filter(actions, {})
+
+    assert keep == [actions[1]]
+    assert len(rejected) == 1 and 'worse in combination' in rejected[0]
+
+
+def test_remaining_subset_is_re_evaluated_before_it_is_applied(monkeypatch):
+    actions = [{'type': 'reroute_traffic', 'params': {'bank': 'sbi', 'target': 'icici'}},
+               {'type': 'optimize_weights', 'params': {}},
+               {'type': 'toggle_chaos', 'params': {'enabled': True}}]
+    evaluated = _fake_shadow(monkeypatch, {
+        ('reroute_traffic', 'optimize_weights', 'toggle_chaos'), ('toggle_chaos',)}, {
+        ('reroute_traffic',): {'success_rate': 0.95, 'avg_latency_ms': 300},
+        ('optimize_weights',): {'success_rate': 0.93, 'avg_latency_ms': 320},
+    })
+
+    keep, rejected = agent_engine.shadow_filter(actions, {})
+
+    assert keep == actions[:2]
+    assert ('reroute_traffic', 'optimize_weights') in evaluated
+    assert len(rejected) == 1 and 'toggle_chaos' in rejected[0]
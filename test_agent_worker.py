@@ -0,0 +1,78 @@
+"""Tests for agent_worker.py's IPC channel."""
+
+import os
+import pickle
+import socket
+import stat
+import threading
+import time
+
+import pytest
+
+import agent_worker
+
+
+class _Engine:
+    def __init__(self):
+        self.cycles = 0
+
+    def run_agent_cycle(self):
+        self.cycles += 1
+        return {'timestamp': 't', 'reasoning': 'ok', 'actions': [], 'feedback': {}}
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('AGENT_WORKER_AUTHKEY', raising=False)
+    engine = _Engine()
+    monkeypatch.setattr(agent_worker.AgentWorker, 'warm_up', lambda self: setattr(self, 'engine', engine))
+    w = agent_worker.AgentWorker(address=('127.0.0.1', 0))
+    threading.Thread(target=w.start, daemon=True).start()
+    for _ in range(100):
+        if w.listener is not None:
+            break
+        time.sleep(0.01)
+    host, port = w.listener.getsockname()[:2]
+    monkeypatch.setenv('AGENT_WORKER_ADDRESS', f'{host}:{port}')
+    yield w, engine
+    w.stop()
+
+
+def _raw(payload: bytes) -> bytes:
+    host, _, port = os.environ['AGENT_WORKER_ADDRESS'].rpartition(':')
+    with socket.create_connection((host, int(port)), timeout=2) as conn:
+        conn.sendall(payload)
+        conn.shutdown(socket.SHUT_WR)
+        return conn.recv(65536)
+
+
+def test_key_file_is_private_and_shared(worker, tmp_path):
+    mode = os.stat(tmp_path / agent_worker.KEY_FILE).st_mode
+    assert not mode & (stat.S_IRWXG | stat.S_IRWXO)
+    assert agent_worker.ping()['success']
+
+
+def test_rejects_wrong_key_and_non_json(worker):
+    _, engine = worker
+    assert b'Invalid agent worker key' in _raw(b'{"cmd": "run", "key": "guess"}\n')
+    assert _raw(pickle.dumps({'cmd': 'run'}) + b'\n') == b''
+    time.sleep(0.1)
+    assert engine.cycles == 0
+
+
+def test_trigger_and_wait(worker):
+    _, engine = worker
+    status = agent_worker.trigger(wait=True, timeout=5)
+    assert status['success'] and status['result']['reasoning'] == 'ok'
+    assert engine.cycles == 1
+
+
+def test_refuses_key_file_readable_by_others(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('AGENT_WORKER_AUTHKEY', raising=False)
+    (tmp_path / agent_worker.KEY_FILE).write_text('secret')
+    os.chmod(tmp_path / agent_worker.KEY_FILE, 0o644)
+    with pytest.raises(PermissionError):
+        agent_worker._authkey()
+    assert agent_worker.ping() is None
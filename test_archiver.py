@@ -0,0 +1,42 @@
+"""Tests for archiver.py log trimming under concurrent writers."""
+
+import multiprocessing
+import os
+
+import archiver
+import txn_store
+
+
+def _append_rows(path, prefix, count):
+    store = txn_store.CsvStore(path)
+    for i in range(count):
+        store.append({'timestamp': f'2099-01-01T00:00:{i % 60:02d}', 'txn_id': f'{prefix}{i}',
+                      'bank': 'HDFC Bank', 'status': 'Success'})
+
+
+def test_trim_keeps_rows_appended_by_other_processes(tmp_path):
+    path = str(tmp_path / 'transactions.csv')
+    store = txn_store.CsvStore(path)
+    store.append_many({'timestamp': f'2000-01-01T00:00:{i % 60:02d}', 'txn_id': f'old{i}'} for i in range(2000))
+
+    ctx = multiprocessing.get_context('fork')
+    writers = [ctx.Process(target=_append_rows, args=(path, f'w{n}_', 300)) for n in range(3)]
+    for w in writers:
+        w.start()
+
+    trimmed = 0
+    while any(w.is_alive() for w in writers) and trimmed < 1900:
+        rows, header, prefix_end = archiver._aged_prefix(path, '2001-01-01', 50)
+        if not rows:
+            break
+        archiver._trim_log(store, header, prefix_end)
+        trimmed += len(rows)
+    for w in writers:
+        w.join()
+
+    ids = [r['txn_id'] for r in store.query()]
+    assert len(ids) == len(set(ids))
+    assert sum(1 for i in ids if i.startswith('old')) == 2000 - trimmed
+    for n in range(3):
+        assert sum(1 for i in ids if i.startswith(f'w{n}_')) == 300
+    assert not os.path.exists(path + '.archiving')
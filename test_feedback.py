@@ -0,0 +1,81 @@
+"""Tests for feedback.py."""
+
+import os
+import shutil
+from datetime import timedelta
+
+import clock
+import feedback
+import tools
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+GOOD = [{'timestamp': '', 'bank': 'HDFC', 'status': 'Success', 'latency_ms': 200}] * 50
+BAD = [{'timestamp': '', 'bank': 'HDFC', 'status': 'Fail', 'latency_ms': 900}] * 50
+
+
+def _queue(actions):
+    """Commit `actions` and queue their evaluation against a healthy baseline."""
+    batch = tools.apply_actions(actions)
+    assert batch['success']
+    config = tools.get_config()
+    feedback.begin(config, actions, feedback.summarize(GOOD), batch['changes'])
+    tools.save_config(config)
+    return batch['changes']
+
+
+def _evaluate_worse(monkeypatch):
+    monkeypatch.setattr(feedback.txn_store, 'query_transactions',
+                        lambda since_minutes=None: [dict(t, timestamp='9999') for t in BAD])
+    return feedback.evaluate_due(clock.now() + timedelta(minutes=5))
+
+
+def _sandbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(HERE, 'shared_config.json'), tools.CONFIG_FILE)
+    config = tools.get_config()
+    config['pending_feedback'] = []
+    config['routing_rules']['chaos_mode'] = False
+    tools.save_config(config)
+    return config
+
+
+def test_rollback_reverts_only_what_the_commit_changed(tmp_path, monkeypatch):
+    original = _sandbox(tmp_path, monkeypatch)
+    changes = _queue([{'type': 'reroute_traffic', 'params': {'bank': 'icici', 'target': 'axis'}},
+                      {'type': 'toggle_chaos', 'params': {'enabled': True}}])
+    assert {tuple(c['field']) for c in changes} >= {('banks', 'icici', 'weight'),
+                                                    ('routing_rules', 'chaos_mode')}
+
+    # An unrelated operator change after the commit is kept
+    config = tools.get_config()
+    next(b for b in config['banks'] if b['id'] == 'pnb')['health_status'] = 'degraded'
+    tools.save_config(config)
+
+    [entry] = _evaluate_worse(monkeypatch)
+    assert entry['details']['verdict'] == 'worse'
+    assert entry['details']['rolled_back']
+
+    config = tools.get_config()
+    weights = {b['id']: b['weight'] for b in config['banks']}
+    assert weights == {b['id']: b['weight'] for b in original['banks']}
+    assert config['routing_rules']['chaos_mode'] is False
+    assert next(b for b in config['banks'] if b['id'] == 'pnb')['health_status'] == 'degraded'
+    assert config['pending_feedback'] == []
+
+
+def test_rollback_after_a_later_commit_is_skipped_as_stale(tmp_path, monkeypatch):
+    _sandbox(tmp_path, monkeypatch)
+    _queue([{'type': 'reroute_traffic', 'params': {'bank': 'icici', 'target': 'axis'}}])
+    after_first = {b['id']: b['weight'] for b in tools.get_config()['banks']}
+    # A later commit moves the same weights again
+    _queue([{'type': 'reroute_traffic', 'params': {'bank': 'axis', 'target': 'hdfc'}}])
+
+    first, second = _evaluate_worse(monkeypatch)
+    assert first['details']['stale'] and not first['details']['rolled_back']
+    assert 'banks.axis.weight' in first['details']['changed_since']
+    # The newest commit still holds its values, so it is the one rolled back
+    assert second['details']['rolled_back'] and 'stale' not in second['details']
+
+    assert {b['id']: b['weight'] for b in tools.get_config()['banks']} == after_first
+    assert any('not rolled back' in line for line in feedback.recent_effects())
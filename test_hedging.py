@@ -0,0 +1,64 @@
+"""Tests for hedging.py."""
+
+import threading
+import time
+
+import hedging
+
+
+class _Router:
+    """Just enough of routing.Router for Hedger: a fixed hedge bank and no latency history."""
+
+    def __init__(self, hedge_bank):
+        self.hedge_bank = hedge_bank
+
+    def latency_percentile(self, bank_id, q=0.95):
+        return None
+
+    def next_best(self, exclude_id=None, acquire=False):
+        return self.hedge_bank
+
+    def release(self, bank_id):
+        pass
+
+
+class _SlowLedger(hedging.IdempotencyLedger):
+    """Ledger whose first settle from the caller's thread stalls, as under a descheduled thread."""
+
+    def __init__(self, stall_s):
+        super().__init__()
+        self.stall_s = stall_s
+        self.caller = threading.get_ident()
+
+    def settle(self, key, leg):
+        if threading.get_ident() == self.caller and self.stall_s:
+            time.sleep(self.stall_s)
+            self.stall_s = 0
+        return super().settle(key, leg)
+
+
+def test_reported_winner_is_the_leg_the_ledger_settled():
+    hedger = hedging.Hedger(_Router({'id': 'icici'}), ledger=_SlowLedger(0.3))
+    durations = {'hdfc': 0.2, 'icici': 0.2}  # the hedge (sent at 50ms) finishes while settle stalls
+
+    def run_leg(bank):
+        time.sleep(durations[bank['id']])
+        return {'status': 'Success', 'latency_ms': int(durations[bank['id']] * 1000), 'error_code': ''}
+
+    result = hedger.execute('txn_1', {'id': 'hdfc'}, 'UPI', 100, {'hedging': {'min_delay_ms': 50}}, run_leg)
+    time.sleep(0.3)  # let the losing leg finish and be voided
+
+    assert result['status'] == 'Success'
+    assert result['bank_id'] == hedger.ledger.winner('txn_1') == 'hdfc'
+    assert hedger.stats['duplicates_voided'] == 1
+    hedger.executor.shutdown(wait=True)
+
+
+def test_success_on_an_already_settled_key_is_not_reported_as_settled():
+    hedger = hedging.Hedger(_Router(None))
+    hedger.ledger.settle('txn_1', 'sbi')
+    run_leg = lambda bank: {'status': 'Success', 'latency_ms': 10, 'error_code': ''}
+
+    result = hedger.simulate('txn_1', {'id': 'hdfc'}, 'UPI', 100, {'hedging': {'enabled': False}}, run_leg)
+
+    assert result['status'] == 'Fail' and result['error_code'] == 'ALREADY_SETTLED'
@@ -0,0 +1,52 @@
+"""Tests for importer.py."""
+
+import json
+import os
+import shutil
+
+import importer
+import txn_store
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _import(tmp_path, monkeypatch, lines, workers=1, chunk_mb=32):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(HERE, 'shared_config.json'), importer.CONFIG_FILE)
+    with open('export.jsonl', 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    store = txn_store.CsvStore(str(tmp_path / 'transactions.csv'))
+    return importer.import_file('export.jsonl', workers=workers, chunk_mb=chunk_mb, store=store), store
+
+
+def test_columns_are_detected_beyond_the_first_record(tmp_path, monkeypatch):
+    lines = [json.dumps({'created_at': '2026-01-01T10:00:00', 'bank': 'hdfc', 'status': 'success'})]
+    # Later records carry fields the first one lacks, or name them differently
+    lines += [json.dumps({'created_at': f'2026-01-01T10:00:{i:02d}', 'bank': 'sbi', 'status': 'failed',
+                          'latency_ms': 900, 'error_code': 'timeout'}) for i in range(1, 4)]
+    lines += [json.dumps({'timestamp': '2026-01-01T10:01:00', 'issuer': 'UTIB0000001', 'state': 'captured'})]
+
+    result, store = _import(tmp_path, monkeypatch, lines)
+
+    assert result['success'] and result['rows'] == 5 and result['rejected'] == 0
+    rows = store.recent(10)
+    assert [r['latency_ms'] for r in rows if r['status'] == 'Fail'] == ['900'] * 3
+    assert rows[-1]['bank'] == 'AXIS Bank'
+
+
+def test_first_record_not_an_object_is_a_clean_error(tmp_path, monkeypatch):
+    result, _ = _import(tmp_path, monkeypatch, ['[1, 2, 3]', json.dumps({'bank': 'hdfc'})])
+
+    assert result == {'success': False, 'error': "First JSONL record is not a JSON object: '[1, 2, 3]'"}
+
+
+def test_records_without_a_txn_id_get_distinct_ids(tmp_path, monkeypatch):
+    record = json.dumps({'created_at': '2026-01-01T10:00:00', 'bank': 'hdfc', 'status': 'success'})
+
+    # Small chunks, so ids must also stay distinct across byte ranges
+    result, store = _import(tmp_path, monkeypatch, [record] * 200, workers=2, chunk_mb=0.001)
+
+    assert result['success'] and result['rows'] == 200
+    txn_ids = [r['txn_id'] for r in store.recent(200)]
+    assert len(set(txn_ids)) == 200
+    assert txn_ids[1] == f'imp_2026-01-01T10:00:00_{len(record) + 1}'
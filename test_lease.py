@@ -0,0 +1,30 @@
+"""Tests for lease.py."""
+
+import lease
+
+
+def test_unusable_db_skips_the_run(tmp_path):
+    calls = []
+    # A directory where the database file should be: sqlite cannot open it
+    result = lease.single_flight('agent_cycle', lambda: calls.append(1) or {'success': True},
+                                 {'db_path': str(tmp_path)})
+
+    assert result['success'] is False and 'coordination db unavailable' in result['error']
+    assert calls == []
+
+
+def test_db_failing_after_the_run_still_returns_its_result(tmp_path, monkeypatch):
+    connect = lease._connect
+    opened = []
+
+    def flaky_connect(db_path):
+        opened.append(db_path)
+        if len(opened) > 2:  # the initial read and acquire work, publish and release fail
+            raise lease.sqlite3.OperationalError('database is locked')
+        return connect(db_path)
+
+    monkeypatch.setattr(lease, '_connect', flaky_connect)
+    result = lease.single_flight('agent_cycle', lambda: {'success': True, 'actions': ['NONE']},
+                                 {'db_path': str(tmp_path / 'coordination.db')})
+
+    assert result == {'success': True, 'actions': ['NONE']}
@@ -0,0 +1,23 @@
+"""Tests for optimizer.py."""
+
+import optimizer
+
+
+def test_overflow_beyond_the_caps_is_spread_in_proportion_to_them():
+    scores = {'a': 0.9, 'b': 0.8, 'c': 0.7}
+    caps = {'a': 0.2, 'b': 0.2, 'c': 0.1}
+    shares = optimizer.solve_shares(scores, {b: 0.0 for b in scores}, caps)
+
+    assert abs(sum(shares.values()) - 1.0) < 1e-9
+    # Caps sum to 0.5: every bank takes twice its cap, the best one no more than the others
+    assert {b: round(v, 6) for b, v in shares.items()} == {'a': 0.4, 'b': 0.4, 'c': 0.2}
+
+
+def test_capacity_shares_follow_littles_law():
+    # 600 samples over 1 minute = 10 payments/s offered
+    stats = {'fast': {'samples': 300, 'p95_ms': 100}, 'slow': {'samples': 300, 'p95_ms': 1000}}
+    caps = optimizer.capacity_shares({'fast': 2, 'slow': 2}, stats, window_minutes=1)
+
+    # 2 in flight at 0.1s -> 20/s (more than all traffic); at 1s -> 2/s = 20% of traffic
+    assert caps == {'fast': 2.0, 'slow': 0.2}
+    assert optimizer.capacity_shares({'fast': 2}, {'fast': {'samples': 0}}, 1) == {}
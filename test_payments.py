@@ -0,0 +1,44 @@
+"""Tests for payments.py."""
+
+import json
+import os
+
+import payments
+import routing
+import txn_store
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _processor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = json.load(open(os.path.join(HERE, 'shared_config.json')))
+    router = routing.Router.from_config(config)
+    store = txn_store.CsvStore(str(tmp_path / 'transactions.csv'))
+    return payments.PaymentProcessor(router=router, workers=1, latency_scale=0, store=store), store
+
+
+def test_open_breaker_fails_the_payment_on_the_chosen_bank(tmp_path, monkeypatch):
+    processor, store = _processor(tmp_path, monkeypatch)
+    processor.router.breakers['icici']._transition('open', routing.time.monotonic())
+
+    txn = processor.process('icici', 500, 'UPI')
+    processor.shutdown()
+
+    assert txn['status'] == 'Fail' and txn['error_code'] == 'BANK_UNAVAILABLE'
+    assert txn['bank'] == processor.router.get_bank('icici')['name']
+    # Nothing was sent to, or logged against, a bank the shopper did not pick
+    assert [r['bank'] for r in store.recent(10)] == [txn['bank']]
+    assert processor.router.inflight == 0
+
+
+def test_chosen_bank_at_its_limit_is_busy(tmp_path, monkeypatch):
+    processor, _ = _processor(tmp_path, monkeypatch)
+    limiter = processor.router._limiter(processor.router.get_bank('icici'))
+    limiter.inflight = int(limiter.limit)
+
+    txn = processor.process('icici', 500, 'UPI')
+    processor.shutdown()
+
+    assert txn['status'] == 'Fail' and txn['error_code'] == 'BANK_BUSY'
+    assert processor.stats['rejected'] == 1
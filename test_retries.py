@@ -0,0 +1,11 @@
+"""Tests for retries.py."""
+
+import retries
+
+
+def test_request_window_stays_bounded_without_retries():
+    budget = retries.RetryBudget(window_seconds=10)
+    for i in range(10000):
+        budget.record_request(now=i * 0.01)  # 100 requests/s for 100s, budget never checked
+
+    assert len(budget.requests) <= 1001
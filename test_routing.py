@@ -0,0 +1,116 @@
+"""Tests for routing.py."""
+
+import json
+import multiprocessing
+import shutil
+import os
+
+import routing
+import tools
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _commit_actions(count):
+    for i in range(count):
+        result = tools.apply_actions([{'type': 'toggle_chaos', 'params': {'enabled': i % 2 == 0}}])
+        assert result['success']
+
+
+def _persist_breakers(count):
+    router = routing.Router()
+    router.refresh(force=True)
+    for i in range(count):
+        router.breakers['sbi'].state = 'open' if i % 2 else 'closed'
+        router.persist()
+
+
+def test_persist_does_not_revert_concurrent_commits(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(HERE, 'shared_config.json'), routing.CONFIG_FILE)
+    config = tools.get_config()
+    config['agent_history'] = []
+    tools.save_config(config)
+
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_commit_actions, args=(40,))] + \
+            [ctx.Process(target=_persist_breakers, args=(40,)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+
+    with open(routing.CONFIG_FILE) as f:
+        history = json.load(f)['agent_history']
+    assert len([h for h in history if h['action'] == 'toggle_chaos_mode']) == 40
+    assert not [name for name in os.listdir('.') if name.endswith('.tmp')]
+
+
+def _publish_metrics(worker, count):
+    router = routing.Router()
+    for i in range(count):
+        # A fresh key per publish, so any lost update stays lost
+        router.source = f'{worker}-{i}'
+        router.publish_metrics()
+
+
+def test_concurrent_publishers_keep_each_others_metrics(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(HERE, 'shared_config.json'), routing.CONFIG_FILE)
+
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_publish_metrics, args=(f'worker{w}', 30)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+
+    assert len(routing.read_metrics()) == 4 * 30
+    assert not [name for name in os.listdir('.') if name.endswith('.tmp')]
+
+
+def test_acquire_takes_slot_on_the_chosen_bank():
+    config = json.load(open(os.path.join(HERE, 'shared_config.json')))
+    router = routing.Router.from_config(config)
+    bank = router.acquire('icici')
+    assert bank['id'] == 'icici'
+    assert router.limiters['icici'].inflight == 1 and router.inflight == 1
+    router.release('icici')
+    assert router.inflight == 0
+    assert router.acquire('no-such-bank') is None
+
+
+def _open_every_breaker(router, now):
+    for bank in router.table.items:
+        breaker = router._breaker(bank)
+        breaker._transition('open', now)
+
+
+def test_route_sheds_when_every_breaker_is_open():
+    config = json.load(open(os.path.join(HERE, 'shared_config.json')))
+    router = routing.Router.from_config(config)
+    _open_every_breaker(router, routing.time.monotonic())
+
+    assert [router.route('UPI') for _ in range(20)] == [None] * 20
+    assert router.inflight == 0
+
+
+def test_release_without_record_returns_the_probe_slot():
+    config = json.load(open(os.path.join(HERE, 'shared_config.json')))
+    router = routing.Router.from_config(config)
+    _open_every_breaker(router, routing.time.monotonic() - 3600)  # cooled down: half-open on next look
+    breaker = router.breakers['icici']
+    breaker.half_open_max_probes = 1
+
+    assert router.acquire('icici')['id'] == 'icici'
+    assert breaker.probes_in_flight == 1
+    router.release('icici')  # e.g. the payment was abandoned before any attempt
+    assert breaker.probes_in_flight == 0
+
+    # A recorded probe returns its slot through record(), not twice
+    assert router.acquire('icici') is not None
+    router.record('icici', True, 100)
+    router.release('icici')
+    assert breaker.probes_in_flight == 0 and breaker.probe_success_count == 1
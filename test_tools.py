@@ -0,0 +1,64 @@
+"""Tests for tools.py."""
+
+import multiprocessing
+import os
+import shutil
+
+import tools
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _sandbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(HERE, 'shared_config.json'), tools.CONFIG_FILE)
+
+
+def test_apply_actions_reports_a_failed_write(tmp_path, monkeypatch):
+    _sandbox(tmp_path, monkeypatch)
+    before = tools.get_config()
+
+    def replace(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(tools.os, 'replace', replace)
+    result = tools.apply_actions([{'type': 'reroute_traffic', 'params': {'bank': 'icici', 'target': 'axis'}}])
+
+    assert result['success'] is False and 'changes' not in result
+    assert tools.get_config() == before
+    assert not [name for name in os.listdir('.') if name.endswith('.tmp')]
+
+
+def _toggle_chaos(count):
+    for i in range(count):
+        assert tools.toggle_chaos_mode(i % 2 == 0)['success']
+
+
+def test_standalone_tools_do_not_lose_concurrent_updates(tmp_path, monkeypatch):
+    _sandbox(tmp_path, monkeypatch)
+    config = tools.get_config()
+    config['agent_history'] = []
+    tools.save_config(config)
+
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_toggle_chaos, args=(30,)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+        assert p.exitcode == 0
+
+    history = tools.get_config()['agent_history']
+    assert len([h for h in history if h['action'] == 'toggle_chaos_mode']) == 60
+
+
+def test_set_routing_strategy_parses_per_method_strings(tmp_path, monkeypatch):
+    _sandbox(tmp_path, monkeypatch)
+
+    result = tools.apply_actions([{'type': 'set_routing_strategy',
+                                   'params': {'strategy': 'thompson', 'params': {'per_method': 'false'}}}])
+    assert result['success']
+    assert tools.get_config()['routing_rules']['bandit']['per_method'] is False
+
+    result = tools.set_routing_strategy('thompson', {'per_method': 'maybe'})
+    assert result['success'] is False and 'per_method' in result['error']
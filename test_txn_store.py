@@ -0,0 +1,71 @@
+"""Tests for txn_store.py."""
+
+import archiver
+import txn_store
+
+
+def _rows(start, count):
+    return [{'timestamp': f'2026-01-01T{(start + i) // 3600:02d}:{(start + i) // 60 % 60:02d}:{(start + i) % 60:02d}',
+             'txn_id': f't{start + i}', 'bank': 'HDFC Bank', 'status': 'Success'} for i in range(count)]
+
+
+def _drain(store, cursor, max_rows):
+    """Read until the cursor stops moving (a batch can be all skipped rows)."""
+    delivered = []
+    while True:
+        rows, new_cursor = store.changes_since(cursor, max_rows)
+        delivered.extend(rows)
+        if new_cursor == cursor:
+            return delivered, cursor
+        cursor = new_cursor
+
+
+def _trim(path, count):
+    with open(path, 'r') as f:
+        lines = f.readlines()
+    with open(path, 'w') as f:
+        f.writelines(lines[:1] + lines[1 + count:])
+
+
+def test_csv_changes_since_resumes_after_trim_without_replaying(tmp_path):
+    store = txn_store.CsvStore(str(tmp_path / 'transactions.csv'))
+    store.append_many(_rows(0, 1000))
+
+    delivered, cursor = _drain(store, '', 300)
+    assert len(delivered) == 1000
+
+    _trim(store.path, 100)
+    store.append_many(_rows(1000, 1))
+
+    delivered, cursor = _drain(store, cursor, 300)
+    assert [r['txn_id'] for r in delivered] == ['t1000']
+
+    store.append_many(_rows(1001, 2))
+    delivered, _ = _drain(store, cursor, 300)
+    assert [r['txn_id'] for r in delivered] == ['t1001', 't1002']
+
+
+def test_csv_changes_since_after_archive_trim_then_larger_append(tmp_path):
+    store = txn_store.CsvStore(str(tmp_path / 'transactions.csv'))
+    store.append_many(_rows(0, 10))
+    delivered, cursor = _drain(store, '', 100)
+    assert len(delivered) == 10
+
+    # The archiver swaps in a trimmed copy; more is appended than was removed,
+    # so the new file is larger than the old cursor offset
+    _, header, prefix_end = archiver._aged_prefix(store.path, '2100-01-01', 5)
+    archiver._trim_log(store, header, prefix_end)
+    store.append_many(_rows(10, 20))
+
+    delivered, _ = _drain(store, cursor, 7)
+    assert [r['txn_id'] for r in delivered] == [f't{i}' for i in range(10, 30)]
+
+
+def test_csv_changes_since_in_batches(tmp_path):
+    store = txn_store.CsvStore(str(tmp_path / 'transactions.csv'))
+    store.append_many(_rows(0, 10))
+    rows, cursor = store.changes_since('', 4)
+    assert [r['txn_id'] for r in rows] == ['t0', 't1', 't2', 't3']
+    rows, cursor = store.changes_since(cursor, 100)
+    assert len(rows) == 6
+    assert store.changes_since(cursor, 100)[0] == []
@@ -4,14 +4,24 @@ Tools - Functions to modify shared_config.json
 Provides deterministic action functions for the agent to update routing rules and bank health.
 """
 
+import copy
 import json
 import os
+import threading
 import time
-from typing import Dict, Any, List
-from datetime import datetime
+from typing import Dict, Any, Callable, List
+
+import bandit
+import clock
+import config_lock
+import optimizer
+import routing
+import tracing
 
 CONFIG_FILE = "shared_config.json"
 
+_MISSING = object()
+
 
 def get_config() -> Dict[str, Any]:
     """Load current configuration from shared_config.json."""
@@ -20,6 +30,7 @@ def get_config() -> Dict[str, Any]:
             if os.path.exists(CONFIG_FILE):
                 with open(CONFIG_FILE, 'r') as f:
                     content = f.read()
+                    tracing.add('config_read_bytes', len(content))
                     if content.strip():
                         return json.loads(content)
             time.sleep(0.1)
@@ -38,32 +49,56 @@ def get_config() -> Dict[str, Any]:
     }
 
 
-def save_config(config: Dict[str, Any]) -> None:
-    """Save configuration to shared_config.json."""
+def save_config(config: Dict[str, Any]) -> bool:
+    """
+    Save configuration to shared_config.json atomically.
+    
+    Written to a temp file and renamed over the config, so readers (simulator,
+    checkout, router) never see a partially written file. The write holds the
+    config lock; callers that read-modify-write should hold it from the read
+    (see apply_actions).
+    
+    Returns:
+        True if written; False if every attempt failed (the config on disk is unchanged)
+    """
+    tmp_path = f"{CONFIG_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
     for attempt in range(3):
         try:
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(config, f, indent=2)
-            return
+            with config_lock.locked(CONFIG_FILE):
+                with open(tmp_path, 'w') as f:
+                    json.dump(config, f, indent=2)
+                    tracing.add('config_write_bytes', f.tell())
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, CONFIG_FILE)
+            return True
         except Exception as e:
             if attempt < 2:
                 time.sleep(0.1)
                 continue
             print(f"Error saving config: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return False
 
 
-def reroute_traffic(bank: str, target: str) -> Dict[str, Any]:
+def _commit(apply: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
     """
-    Reroute traffic from one bank to another by shifting 50% of the source bank's weight.
-    
-    Args:
-        bank: Source bank ID (e.g., 'hdfc', 'sbi')
-        target: Destination bank ID
-    
-    Returns:
-        Result of the operation
+    Apply one in-memory applier to the config and write it, holding the
+    config lock from the read to the write (as apply_actions does).
     """
-    config = get_config()
+    with config_lock.locked(CONFIG_FILE):
+        config = get_config()
+        result = apply(config, *args)
+        if result.get('success') and not save_config(config):
+            return {'success': False, 'error': 'Could not write config'}
+    return result
+
+
+def _apply_reroute_traffic(config: Dict[str, Any], bank: str, target: str) -> Dict[str, Any]:
+    """In-memory variant of reroute_traffic(): mutates `config`, no file I/O."""
     banks_list = config.get('banks', [])
     
     source_bank = next((b for b in banks_list if b['id'] == bank), None)
@@ -80,16 +115,15 @@ def reroute_traffic(bank: str, target: str) -> Dict[str, Any]:
     source_bank['weight'] = max(5, source_bank['weight'] - shift_amount)  # Min 5% weight
     target_bank['weight'] += shift_amount
     
-    # Normalize weights to sum to 100
+    # Normalize weights to sum to exactly 100 (largest remainder, no truncation drift)
     enabled_banks = [b for b in banks_list if b.get('enabled', True)]
-    total_weight = sum(b['weight'] for b in enabled_banks)
-    if total_weight > 0:
-        for b in enabled_banks:
-            b['weight'] = int((b['weight'] / total_weight) * 100)
+    normalized = optimizer.largest_remainder({b['id']: b['weight'] for b in enabled_banks})
+    for b in enabled_banks:
+        b['weight'] = normalized[b['id']]
     
     # Log action
     config.setdefault('agent_history', []).append({
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': clock.now().isoformat(),
         'action': 'reroute_traffic',
         'details': {
             'from': bank,
@@ -99,8 +133,6 @@ def reroute_traffic(bank: str, target: str) -> Dict[str, Any]:
     })
     config['agent_history'] = config['agent_history'][-100:]
     
-    save_config(config)
-    
     return {
         'success': True,
         'source_bank': bank,
@@ -110,18 +142,85 @@ def reroute_traffic(bank: str, target: str) -> Dict[str, Any]:
     }
 
 
-def set_retry_policy(bank: str, level: str) -> Dict[str, Any]:
+def reroute_traffic(bank: str, target: str) -> Dict[str, Any]:
     """
-    Set retry policy for a specific bank.
+    Reroute traffic from one bank to another by shifting 50% of the source bank's weight.
     
     Args:
-        bank: Target bank ID (e.g., 'hdfc', 'sbi')
-        level: Retry level - 'low' (1 retry), 'normal' (3 retries), 'high' (5 retries)
+        bank: Source bank ID (e.g., 'hdfc', 'sbi')
+        target: Destination bank ID
     
     Returns:
         Result of the operation
     """
-    config = get_config()
+    return _commit(_apply_reroute_traffic, bank, target)
+
+
+def _apply_optimize_weights(config: Dict[str, Any], min_share: float = None,
+                            max_share: float = None, latency_weight: float = None) -> Dict[str, Any]:
+    """In-memory variant of optimize_weights(): mutates `config`, no file I/O."""
+    banks_list = config.get('banks', [])
+    rules = dict(config.get('routing_rules', {}).get('optimizer', {}))
+    overrides = {'min_share': min_share, 'max_share': max_share, 'latency_weight': latency_weight}
+    try:
+        rules.update({k: float(v) for k, v in overrides.items() if v is not None})
+    except (TypeError, ValueError):
+        return {'success': False, 'error': f'Optimizer params must be numbers: {overrides}'}
+    for k in ('min_share', 'max_share'):
+        if k in rules and not 0 <= rules[k] <= 1:
+            return {'success': False, 'error': f'{k} must be between 0 and 1'}
+    
+    # Live concurrency limits cap how much traffic a bank can absorb (see optimizer.capacity_shares)
+    concurrency = routing.read_metrics().get('simulator', {}).get('concurrency', {})
+    limits = {bank_id: c['limit'] for bank_id, c in concurrency.get('banks', {}).items() if c.get('limit')}
+    
+    plan = optimizer.optimize(banks_list, rules, concurrency_limits=limits)
+    old_weights = {b['id']: b.get('weight', 0) for b in banks_list}
+    for b in banks_list:
+        b['weight'] = plan['weights'][b['id']]
+    
+    # Log action
+    config.setdefault('agent_history', []).append({
+        'timestamp': clock.now().isoformat(),
+        'action': 'optimize_weights',
+        'details': {
+            'old_weights': old_weights,
+            'new_weights': plan['weights'],
+            'scores': plan['scores']
+        }
+    })
+    config['agent_history'] = config['agent_history'][-100:]
+    
+    return {
+        'success': True,
+        'weights': plan['weights'],
+        'shares': plan['shares'],
+        'scores': plan['scores']
+    }
+
+
+def optimize_weights(min_share: float = None, max_share: float = None,
+                     latency_weight: float = None) -> Dict[str, Any]:
+    """
+    Replace all bank weights with the optimal vector for recent traffic.
+    
+    Maximises expected success minus a latency penalty subject to per-bank
+    min/max share (and live concurrency capacity), rounded to integer weights
+    summing to 100. See optimizer.py.
+    
+    Args:
+        min_share: Minimum traffic share per enabled bank (0-1)
+        max_share: Maximum traffic share per bank (0-1)
+        latency_weight: Success-rate points traded per second of p95 latency
+    
+    Returns:
+        Result of the operation
+    """
+    return _commit(_apply_optimize_weights, min_share, max_share, latency_weight)
+
+
+def _apply_set_retry_policy(config: Dict[str, Any], bank: str, level: str) -> Dict[str, Any]:
+    """In-memory variant of set_retry_policy(): mutates `config`, no file I/O."""
     banks_list = config.get('banks', [])
     
     target_bank = next((b for b in banks_list if b['id'] == bank), None)
@@ -145,7 +244,7 @@ def set_retry_policy(bank: str, level: str) -> Dict[str, Any]:
     
     # Log action
     config.setdefault('agent_history', []).append({
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': clock.now().isoformat(),
         'action': 'set_retry_policy',
         'details': {
             'bank': bank,
@@ -156,8 +255,6 @@ def set_retry_policy(bank: str, level: str) -> Dict[str, Any]:
     })
     config['agent_history'] = config['agent_history'][-100:]
     
-    save_config(config)
-    
     return {
         'success': True,
         'bank': bank,
@@ -166,19 +263,23 @@ def set_retry_policy(bank: str, level: str) -> Dict[str, Any]:
     }
 
 
-def update_bank_health(bank: str, health_status: str, enabled: bool = None) -> Dict[str, Any]:
+def set_retry_policy(bank: str, level: str) -> Dict[str, Any]:
     """
-    Update bank health status. If set to "degraded", simulator will use 600ms latency and 30% failure rate.
+    Set retry policy for a specific bank.
     
     Args:
-        bank: Target bank ID
-        health_status: Health status ('healthy', 'degraded', 'down')
-        enabled: Whether bank should be enabled (optional)
+        bank: Target bank ID (e.g., 'hdfc', 'sbi')
+        level: Retry level - 'low' (1 retry), 'normal' (3 retries), 'high' (5 retries)
     
     Returns:
         Result of the operation
     """
-    config = get_config()
+    return _commit(_apply_set_retry_policy, bank, level)
+
+
+def _apply_update_bank_health(config: Dict[str, Any], bank: str, health_status: str,
+                              enabled: bool = None) -> Dict[str, Any]:
+    """In-memory variant of update_bank_health(): mutates `config`, no file I/O."""
     banks_list = config.get('banks', [])
     
     target_bank = next((b for b in banks_list if b['id'] == bank), None)
@@ -198,14 +299,12 @@ def update_bank_health(bank: str, health_status: str, enabled: bool = None) -> D
     
     # Log action
     config.setdefault('agent_history', []).append({
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': clock.now().isoformat(),
         'action': 'update_bank_health',
         'details': {'bank': bank, 'health_status': health_status, 'enabled': enabled}
     })
     config['agent_history'] = config['agent_history'][-100:]
     
-    save_config(config)
-    
     return {
         'success': True,
         'bank': bank,
@@ -214,18 +313,23 @@ def update_bank_health(bank: str, health_status: str, enabled: bool = None) -> D
     }
 
 
-def toggle_chaos_mode(enabled: bool, failure_rate: float = 0.3) -> Dict[str, Any]:
+def update_bank_health(bank: str, health_status: str, enabled: bool = None) -> Dict[str, Any]:
     """
-    Toggle chaos mode in routing rules.
+    Update bank health status. If set to "degraded", simulator will use 600ms latency and 30% failure rate.
     
     Args:
-        enabled: Whether to enable chaos mode
-        failure_rate: Failure injection rate (0-1)
+        bank: Target bank ID
+        health_status: Health status ('healthy', 'degraded', 'down')
+        enabled: Whether bank should be enabled (optional)
     
     Returns:
         Result of the operation
     """
-    config = get_config()
+    return _commit(_apply_update_bank_health, bank, health_status, enabled)
+
+
+def _apply_toggle_chaos_mode(config: Dict[str, Any], enabled: bool, failure_rate: float = 0.3) -> Dict[str, Any]:
+    """In-memory variant of toggle_chaos_mode(): mutates `config`, no file I/O."""
     
     if 'routing_rules' not in config:
         config['routing_rules'] = {}
@@ -235,14 +339,12 @@ def toggle_chaos_mode(enabled: bool, failure_rate: float = 0.3) -> Dict[str, Any
     
     # Log action
     config.setdefault('agent_history', []).append({
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': clock.now().isoformat(),
         'action': 'toggle_chaos_mode',
         'details': {'enabled': enabled, 'failure_rate': failure_rate}
     })
     config['agent_history'] = config['agent_history'][-100:]
     
-    save_config(config)
-    
     return {
         'success': True,
         'chaos_mode': enabled,
@@ -250,6 +352,231 @@ def toggle_chaos_mode(enabled: bool, failure_rate: float = 0.3) -> Dict[str, Any
     }
 
 
+def toggle_chaos_mode(enabled: bool, failure_rate: float = 0.3) -> Dict[str, Any]:
+    """
+    Toggle chaos mode in routing rules.
+    
+    Args:
+        enabled: Whether to enable chaos mode
+        failure_rate: Failure injection rate (0-1)
+    
+    Returns:
+        Result of the operation
+    """
+    return _commit(_apply_toggle_chaos_mode, enabled, failure_rate)
+
+
+def _apply_set_routing_strategy(config: Dict[str, Any], strategy: str,
+                                params: Dict[str, Any] = None) -> Dict[str, Any]:
+    """In-memory variant of set_routing_strategy(): mutates `config`, no file I/O."""
+    if strategy not in routing.STRATEGIES:
+        return {'success': False, 'error': f'Invalid strategy: {strategy}. Use {"/".join(routing.STRATEGIES)}'}
+    
+    params = dict(params or {})
+    section, defaults = {
+        'weighted': (None, {}),
+        'p2c_ewma': ('p2c', routing.P2C_DEFAULTS),
+        'thompson': ('bandit', bandit.BANDIT_DEFAULTS),
+    }[strategy]
+    
+    unknown = set(params) - set(defaults)
+    if unknown:
+        return {'success': False, 'error': f'Unknown {strategy} params: {sorted(unknown)}'}
+    if 'weights_as' in params and params['weights_as'] not in bandit.WEIGHT_MODES:
+        return {'success': False, 'error': f'weights_as must be one of {"/".join(bandit.WEIGHT_MODES)}'}
+    if 'per_method' in params:
+        # LLM tool calls often send booleans as strings; bool("false") would be True
+        flag = str(params['per_method']).strip().lower()
+        if flag not in ('true', '1', 'yes', 'false', '0', 'no'):
+            return {'success': False, 'error': f"per_method must be true or false, got {params['per_method']!r}"}
+        params['per_method'] = flag in ('true', '1', 'yes')
+    try:
+        for k, v in params.items():
+            if k not in ('weights_as', 'per_method'):
+                params[k] = float(v)
+    except (TypeError, ValueError):
+        return {'success': False, 'error': f'{strategy} params must be numbers: {params}'}
+    for k in ('ewma_alpha', 'decay'):
+        if k in params and not 0 < params[k] <= 1:
+            return {'success': False, 'error': f'{k} must be in (0, 1]'}
+    if any(isinstance(v, float) and v < 0 for v in params.values()):
+        return {'success': False, 'error': f'{strategy} params must be non-negative'}
+    
+    rules = config.setdefault('routing_rules', {})
+    previous = rules.get('strategy', 'weighted')
+    rules['strategy'] = strategy
+    result = {'success': True, 'strategy': strategy}
+    if section:
+        block = dict(defaults, **rules.get(section, {}))
+        block.update(params)
+        rules[section] = block
+        result[section] = block
+    
+    # Log action
+    config.setdefault('agent_history', []).append({
+        'timestamp': clock.now().isoformat(),
+        'action': 'set_routing_strategy',
+        'details': {'strategy': strategy, 'previous': previous, 'params': params}
+    })
+    config['agent_history'] = config['agent_history'][-100:]
+    
+    return result
+
+
+def set_routing_strategy(strategy: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Select the router's bank selection strategy and tune its parameters.
+    
+    Args:
+        strategy: 'weighted' (static weights), 'p2c_ewma' (power of two
+                  choices on live EWMA latency and in-flight count) or
+                  'thompson' (success-rate bandit, see bandit.py)
+        params: Optional strategy parameters.
+                p2c_ewma: ewma_alpha (0-1), failure_penalty_ms, inflight_weight
+                thompson: per_method, weights_as (prior/cap/none), prior_strength,
+                          latency_penalty_per_s, decay (0-1)
+    
+    Returns:
+        Result of the operation
+    """
+    return _commit(_apply_set_routing_strategy, strategy, params)
+
+
+# Agent action type -> in-memory applier (config, params)
+ACTIONS = {
+    'reroute_traffic': lambda c, p: _apply_reroute_traffic(c, p.get('bank'), p.get('target')),
+    'optimize_weights': lambda c, p: _apply_optimize_weights(
+        c, p.get('min_share'), p.get('max_share'), p.get('latency_weight')),
+    'set_retry_policy': lambda c, p: _apply_set_retry_policy(c, p.get('bank'), p.get('level')),
+    'set_routing_strategy': lambda c, p: _apply_set_routing_strategy(c, p.get('strategy'), p.get('params')),
+    'toggle_chaos': lambda c, p: _apply_toggle_chaos_mode(c, p.get('enabled'), 0.3),
+}
+
+
+def apply_action(config: Dict[str, Any], action: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply one agent action ({'type': ..., 'params': {...}}) to an in-memory config.
+    
+    Returns:
+        Result of the operation ({'success': False, 'error': ...} for unknown types)
+    """
+    handler = ACTIONS.get(action.get('type'))
+    if handler is None:
+        return {'success': False, 'error': f"Unknown action type: {action.get('type')}"}
+    return handler(config, action.get('params') or {})
+
+
+# Bank fields an agent action can change (circuit_breaker state belongs to the router)
+ROUTING_BANK_FIELDS = ('weight', 'enabled', 'health_status', 'retry_policy')
+
+
+def _routing_fields(config: Dict[str, Any]) -> Dict[tuple, Any]:
+    """Flatten the routing state of a config to {field path: value}."""
+    fields = {}
+    for bank in config.get('banks', []):
+        for key in ROUTING_BANK_FIELDS:
+            if key in bank:
+                fields[('banks', bank['id'], key)] = bank[key]
+    for key, value in config.get('routing_rules', {}).items():
+        fields[('routing_rules', key)] = value
+    return fields
+
+
+def config_changes(before: Dict[str, Any], after: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Routing fields that differ between two configs.
+    
+    Returns:
+        [{'field': ['banks', bank_id, key] | ['routing_rules', key],
+          'before': old, 'after': new}, ...]; 'before' / 'after' is omitted
+        when the field did not exist on that side
+    """
+    old, new = _routing_fields(before), _routing_fields(after)
+    changes = []
+    for field in list(old) + [f for f in new if f not in old]:
+        if old.get(field, _MISSING) == new.get(field, _MISSING):
+            continue
+        change = {'field': list(field)}
+        if field in old:
+            change['before'] = copy.deepcopy(old[field])
+        if field in new:
+            change['after'] = copy.deepcopy(new[field])
+        changes.append(change)
+    return changes
+
+
+def revert_changes(config: Dict[str, Any], changes: List[Dict[str, Any]]) -> List[str]:
+    """
+    Undo a commit's changes in an in-memory config, all or nothing.
+    
+    A field is only reverted if it still holds the value the commit wrote;
+    if any field was changed since (by a later commit or the operator),
+    nothing is reverted.
+    
+    Returns:
+        Fields ('banks.hdfc.weight', ...) changed since the commit; empty if
+        the revert was applied
+    """
+    current = _routing_fields(config)
+    conflicts = ['.'.join(c['field']) for c in changes
+                 if current.get(tuple(c['field']), _MISSING) != c.get('after', _MISSING)]
+    if conflicts:
+        return conflicts
+    
+    for change in changes:
+        section, *path = change['field']
+        if section == 'banks':
+            target = next(b for b in config['banks'] if b['id'] == path[0])
+        else:
+            target = config.setdefault('routing_rules', {})
+        if 'before' in change:
+            target[path[-1]] = copy.deepcopy(change['before'])
+        else:
+            target.pop(path[-1], None)
+    return []
+
+
+def apply_actions(actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apply a list of agent actions as one atomic config commit.
+    
+    Every action is validated and applied, in order, to a single in-memory
+    copy of the config; the file is written once, and only if all of them
+    succeed. Readers see either the old routing state or the complete new one,
+    and the config lock is held from the read to the write so no concurrent
+    writer's change is reverted.
+    
+    Args:
+        actions: [{'type': ..., 'params': {...}}, ...]
+    
+    Returns:
+        {'success': True, 'results': [...], 'changes': config_changes(old, new)} or
+        {'success': False, 'error': ..., 'failed_action': index, 'results': [...]}
+        ('failed_action' is absent if every action applied but the write failed)
+    """
+    with config_lock.locked(CONFIG_FILE):
+        config = get_config()
+        staged = copy.deepcopy(config)
+        results = []
+        for i, action in enumerate(actions):
+            try:
+                result = apply_action(staged, action)
+            except Exception as e:
+                result = {'success': False, 'error': f'{type(e).__name__}: {e}'}
+            results.append(result)
+            if not result.get('success'):
+                return {
+                    'success': False,
+                    'error': f"{action.get('type')}: {result.get('error')}",
+                    'failed_action': i,
+                    'results': results
+                }
+        
+        if actions and not save_config(staged):
+            return {'success': False, 'error': 'Could not write config; nothing applied', 'results': results}
+    return {'success': True, 'results': results, 'changes': config_changes(config, staged)}
+
+
 def get_agent_history(limit: int = 10) -> List[Dict[str, Any]]:
     """Get recent agent history actions."""
     config = get_config()
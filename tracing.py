@@ -0,0 +1,201 @@
+"""
+Tracing - Per-node spans for the agent cycle
+
+Each LangGraph node is wrapped with traced(); every run appends one JSON span
+per node (plus one for the whole cycle) to agent_trace.jsonl:
+
+    {"cycle": "...", "node": "reason", "start": "...", "wall_ms": 812.4,
+     "cpu_ms": 35.1, "rows_scanned": 0, "prompt_tokens": 1450,
+     "completion_tokens": 210, "retries": 1, "sleep_ms": 10000,
+     "config_read_bytes": 9120, "config_write_bytes": 0, "error": null}
+
+Code inside a node reports work with tracing.add(counter, n) (txn_store counts
+rows scanned, tools counts config bytes, reason counts tokens and retries);
+outside a traced node add() is a no-op.
+
+Summarise p50/p99 per node across cycles:
+
+    python tracing.py summary [--file agent_trace.jsonl] [--last 100]
+"""
+
+import argparse
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Any, Callable, Optional
+
+TRACE_FILE = "agent_trace.jsonl"
+
+COUNTERS = ('rows_scanned', 'prompt_tokens', 'completion_tokens', 'retries', 'sleep_ms',
+            'fallbacks', 'config_read_bytes', 'config_write_bytes')
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('tracing_span', default=None)
+_current_cycle: contextvars.ContextVar = contextvars.ContextVar('tracing_cycle', default=None)
+_write_lock = threading.Lock()
+
+
+def add(counter: str, amount: float = 1) -> None:
+    """Add to a counter of the active span(s). No-op outside a traced node."""
+    for span in (_current_span.get(), _current_cycle.get()):
+        if span is not None:
+            span[counter] = span.get(counter, 0) + amount
+
+
+def _write(span: Dict[str, Any], trace_file: str) -> None:
+    try:
+        line = json.dumps(span)
+        with _write_lock:
+            with open(trace_file, 'a') as f:
+                f.write(line + '\n')
+    except Exception as e:
+        print(f"Error writing trace span: {e}")
+
+
+def _new_span(node: str, cycle_id: Optional[str]) -> Dict[str, Any]:
+    span = {'cycle': cycle_id, 'node': node, 'start': datetime.now().isoformat()}
+    span.update({c: 0 for c in COUNTERS})
+    return span
+
+
+def _finish(span: Dict[str, Any], wall_start: float, cpu_start: float, error: Optional[str]) -> None:
+    span['wall_ms'] = round((time.perf_counter() - wall_start) * 1000, 2)
+    span['cpu_ms'] = round((time.thread_time() - cpu_start) * 1000, 2)
+    span['error'] = error
+
+
+@contextmanager
+def cycle(trace_file: str = TRACE_FILE):
+    """
+    Group the node spans of one agent cycle and record a span for the whole cycle.
+
+    Counters added inside any node also accumulate on the cycle span. Its CPU
+    time covers the calling thread only; nodes run on worker threads report
+    their own.
+    """
+    span = _new_span('cycle', uuid.uuid4().hex[:12])
+    token = _current_cycle.set(span)
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        yield span
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _finish(span, wall_start, cpu_start, error)
+        _current_cycle.reset(token)
+        _write(span, trace_file)
+
+
+def traced(node: str, trace_file: str = TRACE_FILE) -> Callable:
+    """Decorator: record a span for every call of a graph node."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cycle_span = _current_cycle.get()
+            span = _new_span(node, cycle_span['cycle'] if cycle_span else None)
+            token = _current_span.set(span)
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            error = None
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _finish(span, wall_start, cpu_start, error)
+                _current_span.reset(token)
+                _write(span, trace_file)
+        return wrapper
+    return decorator
+
+
+def load_spans(trace_file: str = TRACE_FILE, last_cycles: int = None) -> List[Dict[str, Any]]:
+    """Read spans, optionally limited to the most recent `last_cycles` cycles."""
+    spans = []
+    try:
+        with open(trace_file, 'r') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return []
+    if last_cycles:
+        cycles = []
+        for s in spans:
+            if s.get('cycle') not in cycles:
+                cycles.append(s.get('cycle'))
+        keep = set(cycles[-last_cycles:])
+        spans = [s for s in spans if s.get('cycle') in keep]
+    return spans
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per node: count, errors, p50/p99 wall and CPU ms, and mean of each counter.
+    """
+    by_node: Dict[str, List[Dict[str, Any]]] = {}
+    for s in spans:
+        by_node.setdefault(s.get('node', '?'), []).append(s)
+
+    summary = {}
+    for node, rows in by_node.items():
+        wall = [r.get('wall_ms', 0) for r in rows]
+        cpu = [r.get('cpu_ms', 0) for r in rows]
+        summary[node] = {
+            'count': len(rows),
+            'errors': sum(1 for r in rows if r.get('error')),
+            'wall_p50_ms': _percentile(wall, 0.50),
+            'wall_p99_ms': _percentile(wall, 0.99),
+            'cpu_p50_ms': _percentile(cpu, 0.50),
+            'cpu_p99_ms': _percentile(cpu, 0.99),
+            **{f'avg_{c}': round(sum(r.get(c, 0) for r in rows) / len(rows), 1) for c in COUNTERS},
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent cycle trace tools")
+    sub = parser.add_subparsers(dest='command')
+    summary = sub.add_parser('summary', help='p50/p99 per node across cycles')
+    summary.add_argument('--file', default=TRACE_FILE)
+    summary.add_argument('--last', type=int, help='Only the last N cycles')
+    args = parser.parse_args()
+
+    if args.command != 'summary':
+        parser.print_help()
+        return
+
+    spans = load_spans(args.file, args.last)
+    if not spans:
+        print(f"No spans in {args.file}")
+        return
+    order = ['cycle', 'observe', 'reason', 'act', 'feedback']
+    stats = summarize(spans)
+    nodes = sorted(stats, key=lambda n: (order.index(n) if n in order else len(order), n))
+
+    print(f"{'node':10} {'n':>5} {'err':>4} {'wall p50':>10} {'wall p99':>10} {'cpu p50':>9} {'cpu p99':>9} "
+          f"{'rows':>8} {'tok in':>7} {'tok out':>7} {'retries':>7} {'sleep':>8} {'fallbk':>6} {'cfg rd':>8} {'cfg wr':>8}")
+    for node in nodes:
+        s = stats[node]
+        print(f"{node:10} {s['count']:>5} {s['errors']:>4} {s['wall_p50_ms']:>8.1f}ms {s['wall_p99_ms']:>8.1f}ms "
+              f"{s['cpu_p50_ms']:>7.1f}ms {s['cpu_p99_ms']:>7.1f}ms {s['avg_rows_scanned']:>8.0f} "
+              f"{s['avg_prompt_tokens']:>7.0f} {s['avg_completion_tokens']:>7.0f} {s['avg_retries']:>7.1f} "
+              f"{s['avg_sleep_ms']:>6.0f}ms {s['avg_fallbacks']:>6.1f} {s['avg_config_read_bytes']:>8.0f} {s['avg_config_write_bytes']:>8.0f}")
+    print("(rows, tokens, retries, sleep, fallbacks and config bytes are averages per span)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""
+Transaction Store - Pluggable storage for the transaction log
+
+All writers (simulator, checkout) and readers (agent, dashboard, rollups) go
+through a TransactionStore instead of opening transactions.csv directly.
+
+Backends:
+- csv:    transactions.csv (default). Recent/time-window reads scan the file
+          backwards from the end, so they only touch the tail.
+- sqlite: transactions.db in WAL mode with indexes on (timestamp),
+          (bank, timestamp) and (status, timestamp) for ad-hoc incident queries.
+
+Select the backend with `global_config.transaction_store` in shared_config.json
+or the TXN_STORE environment variable (env wins).
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: in-process locking only
+    fcntl = None
+
+import clock
+import tracing
+
+CONFIG_FILE = "shared_config.json"
+
+FIELDNAMES = [
+    'timestamp', 'txn_id', 'bank', 'method', 'status',
+    'latency_ms', 'amount', 'error_code', 'retry_count'
+]
+
+# Writers are separate processes, so timestamps are only roughly ordered.
+# Backward scans keep reading this far past the cutoff before stopping.
+CLOCK_SKEW_SECONDS = 60
+
+
+def _normalize(txn: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'timestamp': txn.get('timestamp') or clock.now().isoformat(),
+        'txn_id': txn.get('txn_id', ''),
+        'bank': txn.get('bank', 'Unknown'),
+        'method': txn.get('method', ''),
+        'status': txn.get('status', ''),
+        'latency_ms': txn.get('latency_ms', 0),
+        'amount': txn.get('amount', 0),
+        'error_code': txn.get('error_code', '') or '',
+        'retry_count': txn.get('retry_count', 0),
+    }
+
+
+def _cutoff(since_minutes: Optional[float]) -> Optional[str]:
+    if since_minutes is None:
+        return None
+    return (clock.now() - timedelta(minutes=since_minutes)).isoformat()
+
+
+def _matches(row: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Apply query filters to a row (used by backends without an index)."""
+    cutoff = filters.get('cutoff')
+    if cutoff and (row.get('timestamp') or '') < cutoff:
+        return False
+    for key in ('bank', 'method', 'status', 'error_code'):
+        wanted = filters.get(key)
+        if wanted is not None and row.get(key) != wanted:
+            return False
+    min_amount = filters.get('min_amount')
+    if min_amount is not None:
+        try:
+            if float(row.get('amount') or 0) < min_amount:
+                return False
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
+class TransactionStore:
+    """Interface for transaction log backends."""
+
+    name = 'base'
+
+    def append(self, txn: Dict[str, Any]) -> None:
+        """Append a single transaction."""
+        self.append_many([txn])
+
+    def append_many(self, txns: Iterable[Dict[str, Any]]) -> int:
+        """Append many transactions. Returns the number written."""
+        raise NotImplementedError
+
+    def recent(self, count: int = 100) -> List[Dict[str, Any]]:
+        """Most recent `count` transactions, oldest first."""
+        raise NotImplementedError
+
+    def query(self, since_minutes: float = None, bank: str = None, method: str = None,
+              status: str = None, error_code: str = None, min_amount: float = None,
+              limit: int = None) -> List[Dict[str, Any]]:
+        """Transactions matching all given filters, oldest first."""
+        raise NotImplementedError
+
+    def changes_since(self, cursor: str, max_rows: int = 100000) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Rows appended after `cursor` (opaque string, '' for the beginning).
+
+        Returns:
+            (rows, new_cursor)
+        """
+        raise NotImplementedError
+
+
+class CsvStore(TransactionStore):
+    """Append-only CSV log (transactions.csv)."""
+
+    name = 'csv'
+
+    def __init__(self, path: str = "transactions.csv"):
+        self.path = path
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold off every writer of the log, in this and other processes.
+
+        The simulator, checkout, replay and importer append from separate
+        processes, so the thread lock alone does not cover the archiver's
+        rewrite. The flock is taken on a sidecar file because the archiver
+        replaces the log itself.
+        """
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def append_many(self, txns: Iterable[Dict[str, Any]]) -> int:
+        rows = [_normalize(t) for t in txns]
+        if not rows:
+            return 0
+        with self.locked():
+            write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(rows)
+        return len(rows)
+
+    def _header(self, f) -> List[str]:
+        f.seek(0)
+        line = f.readline().decode('utf-8', errors='replace').strip()
+        return next(csv.reader([line])) if line else list(FIELDNAMES)
+
+    def _lines_reversed(self, f, block_size: int = 65536):
+        """Yield complete data lines from the end of the file backwards."""
+        f.seek(0)
+        f.readline()
+        data_start = f.tell()
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        remainder = b''
+        while pos > data_start:
+            read = min(block_size, pos - data_start)
+            pos -= read
+            f.seek(pos)
+            block = f.read(read) + remainder
+            lines = block.split(b'\n')
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+    def _parse(self, fieldnames: List[str], lines: List[bytes]) -> List[Dict[str, Any]]:
+        text = '\n'.join(l.decode('utf-8', errors='replace') for l in lines)
+        rows = [r for r in csv.DictReader(io.StringIO(text), fieldnames=fieldnames)]
+        tracing.add('rows_scanned', len(rows))
+        return rows
+
+    def recent(self, count: int = 100) -> List[Dict[str, Any]]:
+        try:
+            if not os.path.exists(self.path):
+                return []
+            with open(self.path, 'rb') as f:
+                fieldnames = self._header(f)
+                lines = []
+                for line in self._lines_reversed(f):
+                    lines.append(line)
+                    if len(lines) >= count:
+                        break
+            lines.reverse()
+            return self._parse(fieldnames, lines)
+        except Exception as e:
+            print(f"Error reading transactions: {e}")
+            return []
+
+    def query(self, since_minutes: float = None, bank: str = None, method: str = None,
+              status: str = None, error_code: str = None, min_amount: float = None,
+              limit: int = None) -> List[Dict[str, Any]]:
+        filters = {
+            'cutoff': _cutoff(since_minutes), 'bank': bank, 'method': method,
+            'status': status, 'error_code': error_code, 'min_amount': min_amount
+        }
+        try:
+            if not os.path.exists(self.path):
+                return []
+            with open(self.path, 'rb') as f:
+                fieldnames = self._header(f)
+                if filters['cutoff'] is None:
+                    f.seek(0)
+                    rows = list(csv.DictReader(io.TextIOWrapper(f, encoding='utf-8', errors='replace')))
+                    tracing.add('rows_scanned', len(rows))
+                else:
+                    # Time-bounded: scan the tail only
+                    stop = (datetime.fromisoformat(filters['cutoff'])
+                            - timedelta(seconds=CLOCK_SKEW_SECONDS)).isoformat()
+                    lines = []
+                    for line in self._lines_reversed(f):
+                        lines.append(line)
+                        if line[:26].decode('utf-8', errors='replace') < stop:
+                            break
+                    lines.reverse()
+                    rows = self._parse(fieldnames, lines)
+            rows = [r for r in rows if _matches(r, filters)]
+            return rows[-limit:] if limit else rows
+        except Exception as e:
+            print(f"Error querying transactions: {e}")
+            return []
+
+    def changes_since(self, cursor: str, max_rows: int = 100000) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Cursor is {'offset': bytes consumed, 'last_timestamp': newest row seen,
+        'inode' / 'data_start': identity of the file the offset belongs to,
+        'skip_until': replay guard after a rewrite}.
+
+        Only complete lines are consumed. If the file was replaced (archived
+        or rotated: new inode or header) or shrank, the old offset means
+        nothing in it - even if it has since grown past that offset - so
+        reading restarts from the top and rows at or before the last seen
+        timestamp are skipped. The guard stays in the cursor across batches
+        until a row newer than it has been read.
+        """
+        state = json.loads(cursor) if cursor else {}
+        offset = state.get('offset', 0)
+        last_ts = state.get('last_timestamp', '')
+        skip_until = state.get('skip_until', '')
+
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return [], cursor
+        with f:
+            stat = os.fstat(f.fileno())
+            fieldnames = self._header(f)
+            data_start = f.tell()
+            replaced = (state.get('inode', stat.st_ino) != stat.st_ino
+                        or state.get('data_start', data_start) != data_start)
+            if replaced or stat.st_size < offset:
+                offset = 0
+                skip_until = last_ts
+            if offset == 0:
+                offset = data_start
+            if stat.st_size == offset and not replaced:
+                return [], cursor
+            f.seek(offset)
+            lines = []
+            consumed = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                consumed += len(line)
+                lines.append(line.rstrip(b'\r\n'))
+                if len(lines) >= max_rows:
+                    break
+
+        rows = [r for r in self._parse(fieldnames, lines) if r.get('timestamp') and r['timestamp'] > skip_until]
+        if rows:
+            last_ts = max(last_ts, max(r['timestamp'] for r in rows))
+            skip_until = ''  # caught up past the rows delivered before the shrink
+        new_state = {'offset': offset + consumed, 'last_timestamp': last_ts,
+                     'inode': stat.st_ino, 'data_start': data_start}
+        if skip_until:
+            new_state['skip_until'] = skip_until
+        return rows, json.dumps(new_state)
+
+
+class SqliteStore(TransactionStore):
+    """Embedded SQLite log with indexes for time/bank/status queries."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS transactions (
+        timestamp TEXT NOT NULL,
+        txn_id TEXT,
+        bank TEXT,
+        method TEXT,
+        status TEXT,
+        latency_ms INTEGER,
+        amount REAL,
+        error_code TEXT,
+        retry_count INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_txn_ts ON transactions (timestamp);
+    CREATE INDEX IF NOT EXISTS idx_txn_bank_ts ON transactions (bank, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_txn_status_ts ON transactions (status, timestamp);
+    """
+
+    def __init__(self, path: str = "transactions.db"):
+        self.path = path
+        self.local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+
+    def append_many(self, txns: Iterable[Dict[str, Any]]) -> int:
+        rows = [tuple(_normalize(t)[k] for k in FIELDNAMES) for t in txns]
+        if not rows:
+            return 0
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO transactions ({', '.join(FIELDNAMES)}) "
+                f"VALUES ({', '.join('?' * len(FIELDNAMES))})",
+                rows
+            )
+        return len(rows)
+
+    def recent(self, count: int = 100) -> List[Dict[str, Any]]:
+        try:
+            rows = self._conn().execute(
+                f"SELECT {', '.join(FIELDNAMES)} FROM transactions ORDER BY timestamp DESC LIMIT ?",
+                (count,)
+            ).fetchall()
+            tracing.add('rows_scanned', len(rows))
+            return [dict(r) for r in reversed(rows)]
+        except Exception as e:
+            print(f"Error reading transactions: {e}")
+            return []
+
+    def query(self, since_minutes: float = None, bank: str = None, method: str = None,
+              status: str = None, error_code: str = None, min_amount: float = None,
+              limit: int = None) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        cutoff = _cutoff(since_minutes)
+        if cutoff:
+            clauses.append("timestamp >= ?")
+            params.append(cutoff)
+        for column, value in (('bank', bank), ('method', method), ('status', status), ('error_code', error_code)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if min_amount is not None:
+            clauses.append("amount >= ?")
+            params.append(min_amount)
+
+        sql = f"SELECT {', '.join(FIELDNAMES)} FROM transactions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        try:
+            rows = self._conn().execute(sql, params).fetchall()
+            tracing.add('rows_scanned', len(rows))
+            return [dict(r) for r in reversed(rows)]
+        except Exception as e:
+            print(f"Error querying transactions: {e}")
+            return []
+
+    def changes_since(self, cursor: str, max_rows: int = 100000) -> Tuple[List[Dict[str, Any]], str]:
+        last_rowid = int(cursor) if cursor and cursor.isdigit() else 0
+        rows = self._conn().execute(
+            f"SELECT rowid, {', '.join(FIELDNAMES)} FROM transactions WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, max_rows)
+        ).fetchall()
+        if not rows:
+            return [], cursor
+        new_cursor = str(rows[-1]['rowid'])
+        return [{k: r[k] for k in FIELDNAMES} for r in rows], new_cursor
+
+
+BACKENDS = {
+    'csv': CsvStore,
+    'sqlite': SqliteStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _configured_backend() -> str:
+    backend = os.getenv("TXN_STORE")
+    if backend:
+        return backend.lower()
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            return json.load(f).get('global_config', {}).get('transaction_store', 'csv')
+    except Exception:
+        return 'csv'
+
+
+def get_store() -> TransactionStore:
+    """Return the process-wide transaction store for the configured backend."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = _configured_backend()
+                if backend not in BACKENDS:
+                    print(f"Unknown transaction store '{backend}', falling back to csv")
+                    backend = 'csv'
+                _store = BACKENDS[backend]()
+    return _store
+
+
+# ==================== QUERY HELPERS ====================
+
+def query_transactions(**filters) -> List[Dict[str, Any]]:
+    """Run a filtered query against the configured store (see TransactionStore.query)."""
+    return get_store().query(**filters)
+
+
+def failure_breakdown(since_minutes: float = 60, error_code: str = None, min_amount: float = None,
+                      group_by: Tuple[str, ...] = ('bank', 'method')) -> List[Dict[str, Any]]:
+    """
+    Failed transactions grouped by the given columns, largest groups first.
+
+    Example: which bank/method combos failed with TIMEOUT above ₹2500 in the last hour
+        failure_breakdown(60, error_code='TIMEOUT', min_amount=2500)
+
+    Returns:
+        [{'bank': ..., 'method': ..., 'count': n, 'amount': total}, ...]
+    """
+    rows = get_store().query(since_minutes=since_minutes, status='Fail',
+                             error_code=error_code, min_amount=min_amount)
+    groups = {}
+    for r in rows:
+        key = tuple(r.get(c) for c in group_by)
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = dict(zip(group_by, key), count=0, amount=0.0)
+        g['count'] += 1
+        try:
+            g['amount'] += float(r.get('amount') or 0)
+        except (TypeError, ValueError):
+            pass
+    return sorted(groups.values(), key=lambda g: -g['count'])